@@ -1,47 +1,845 @@
-from flask import Flask, request, jsonify
+from flask import Flask, Request, Response, current_app, g, request, jsonify, stream_with_context
 from flask_sqlalchemy import SQLAlchemy
 from uuid import uuid4
-from werkzeug.utils import secure_filename
+import base64
+import binascii
+import click
+import gzip
+import json
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
 import os
-from datetime import datetime
+import sys
+import threading
+import time
+from bisect import bisect_right
+from datetime import datetime, timedelta
 from flasgger import Swagger, swag_from
+from flask.cli import AppGroup
 from flask_cors import CORS
+from sqlalchemy import event
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.exc import SQLAlchemyError
 
-app = Flask(__name__)
+# Make the shared inference package in ../Model importable
+MODEL_SRC_DIR = os.environ.get('MODEL_SRC_DIR', os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'Model'))
+sys.path.insert(0, MODEL_SRC_DIR)
+
+from cache import SummaryCache, cache_key
+from inference import ModelRegistry, ModelSpec
+from inference.extractive import ExtractiveSummarizer
+from inference.metrics import REGISTRY, profiling, profiling_active, record_stage, timed
+from inference.runtime import STATE_READY, STREAM_MODES
+from ingest import HashingSpooledFile, UnreadableFile, UploadStore
+from jobs import JobQueue, PeriodicJob, QueueFull, STATUS_QUEUED, STATUS_RUNNING, STATUS_DONE, STATUS_FAILED
+from storage import CompressedText, compress_text, database_bytes, exclusive_lock, full_vacuum, incremental_vacuum
+
+# Uploads are received into hashing spooled files: the size cap is enforced while reading
+# and the content hash is known once the form is parsed
+class UploadRequest(Request):
+    def _get_file_stream(self, total_content_length, content_type, filename=None, content_length=None):
+        return HashingSpooledFile(current_app.config['MAX_UPLOAD_BYTES'])
+
+# INSTANCE_PATH (absolute) relocates the SQLite database, e.g. for benchmarks
+app = Flask(__name__, instance_path=os.environ.get('INSTANCE_PATH'))
+app.request_class = UploadRequest
 CORS(app)  # This allows all origins. You can customize it if needed.
 # Configuring the SQLite database path
 app.config['UPLOAD_FOLDER'] = 'uploads'
+# Largest accepted upload, and processes extracting the pages of large PDFs
+app.config['MAX_UPLOAD_BYTES'] = int(os.environ.get('MAX_UPLOAD_MB', 20)) * 1024 * 1024
+app.config['PDF_WORKERS'] = int(os.environ.get('PDF_WORKERS', 2))
 app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///' + os.path.join(app.instance_path, 'app.db')
 app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+# Size of the inference worker pool and of the backlog it absorbs before rejecting
+app.config['INFERENCE_WORKERS'] = int(os.environ.get('INFERENCE_WORKERS', 8))
+app.config['JOB_QUEUE_SIZE'] = int(os.environ.get('JOB_QUEUE_SIZE', 256))
+# Fine-tuned model served by the API, the backend running it and its micro-batching settings
+app.config['SUMMARIZER_MODEL_PATH'] = os.environ.get('SUMMARIZER_MODEL_PATH', os.path.join(MODEL_SRC_DIR, 'results', 'model'))
+app.config['INFERENCE_BACKEND'] = os.environ.get('INFERENCE_BACKEND', 'torch')
+app.config['MAX_BATCH_SIZE'] = int(os.environ.get('MAX_BATCH_SIZE', 8))
+app.config['BATCH_WAIT_MS'] = float(os.environ.get('BATCH_WAIT_MS', 20))
+# Inputs longer than this many tokens are cut down to their most salient sentences before the model sees them (0: off)
+app.config['PRECOMPRESS_TOKENS'] = int(os.environ.get('PRECOMPRESS_TOKENS', 0))
+# Encoder outputs of recent texts, so asking for another summary length of the same text only runs the decoder
+app.config['ENCODER_CACHE_BYTES'] = int(os.environ.get('ENCODER_CACHE_BYTES', 128 * 1024 * 1024))
+# /process_batch: items in flight per request, rows per transaction, how long finished rows may wait
+# for more before they are committed, and size limit of one JSONL line
+app.config['BATCH_WINDOW'] = int(os.environ.get('BATCH_WINDOW', 64))
+app.config['BATCH_COMMIT_SIZE'] = int(os.environ.get('BATCH_COMMIT_SIZE', 500))
+app.config['BATCH_COMMIT_INTERVAL_MS'] = float(os.environ.get('BATCH_COMMIT_INTERVAL_MS', 250))
+app.config['BATCH_MAX_ITEM_BYTES'] = int(os.environ.get('BATCH_MAX_ITEM_BYTES', 1024 * 1024))
+# Concurrent /process_text_stream generations; streams don't share micro-batches
+app.config['STREAM_WORKERS'] = int(os.environ.get('STREAM_WORKERS', 4))
+# Load the model at startup instead of on the first request: '1' in a background thread,
+# 'sync' before serving (used by the pre-forking server so workers share the parent's weights), '0' lazily
+app.config['PRELOAD_MODEL'] = os.environ.get('PRELOAD_MODEL', '1')
+# JSON config of several models to route requests between (see inference.registry.load_config); without it
+# the single SUMMARIZER_MODEL_PATH model is served. The config and the model files are checked for changes
+# every MODEL_POLL_SECONDS, and all the models together must fit in MODEL_MEMORY_MB (0: no limit)
+app.config['MODEL_REGISTRY'] = os.environ.get('MODEL_REGISTRY')
+app.config['MODEL_POLL_SECONDS'] = float(os.environ.get('MODEL_POLL_SECONDS', 5))
+app.config['MODEL_MEMORY_MB'] = int(os.environ.get('MODEL_MEMORY_MB', 0))
+
+# Settings of every model the registry config leaves out
+model_defaults = {
+    'backend': app.config['INFERENCE_BACKEND'],
+    'workers': app.config['INFERENCE_WORKERS'],
+    'max_batch_size': app.config['MAX_BATCH_SIZE'],
+    'max_wait_ms': app.config['BATCH_WAIT_MS'],
+    'precompress_tokens': app.config['PRECOMPRESS_TOKENS'],
+    'encoder_cache_bytes': app.config['ENCODER_CACHE_BYTES'],
+}
+if app.config['MODEL_REGISTRY']:
+    model_registry = ModelRegistry.from_config(app.config['MODEL_REGISTRY'], model_defaults,
+                                               memory_budget=app.config['MODEL_MEMORY_MB'] * 1024 * 1024,
+                                               poll_seconds=app.config['MODEL_POLL_SECONDS'])
+else:
+    # MODEL_VERSION replaces the version derived from the model files in the summary cache keys
+    model_registry = ModelRegistry([ModelSpec('default', app.config['SUMMARIZER_MODEL_PATH'],
+                                              version=os.environ.get('MODEL_VERSION'), **model_defaults)],
+                                   memory_budget=app.config['MODEL_MEMORY_MB'] * 1024 * 1024)
+
+# Byte budget of the in-process summary cache
+app.config['SUMMARY_CACHE_BYTES'] = int(os.environ.get('SUMMARY_CACHE_BYTES', 64 * 1024 * 1024))
+# Storage compaction, every COMPACTION_INTERVAL_MINUTES in the background (0: only with `flask compact`): unrated
+# summaries finished more than RETENTION_DAYS ago (0: kept forever) are archived to instance/archive or deleted
+# (RETENTION_POLICY), uploads no summary refers to are removed and free database pages are released
+app.config['COMPACTION_INTERVAL_MINUTES'] = float(os.environ.get('COMPACTION_INTERVAL_MINUTES', 60))
+app.config['RETENTION_DAYS'] = float(os.environ.get('RETENTION_DAYS', 0))
+app.config['RETENTION_POLICY'] = os.environ.get('RETENTION_POLICY', 'archive')
+app.config['ARCHIVE_FOLDER'] = os.path.join(app.instance_path, 'archive')
 
 # Ensure instance folder exists
 os.makedirs(app.instance_path, exist_ok=True)
 db = SQLAlchemy(app)
 swagger = Swagger(app)
 
+# Applied to every SQLite connection. WAL lets readers run while a writer commits, and
+# synchronous=NORMAL only syncs at checkpoints, which is still crash-safe in WAL mode
+SQLITE_PRAGMAS = {
+    # Only takes effect on a new database (or after `flask compact --full-vacuum`): lets compaction
+    # release free pages a few at a time instead of rewriting the whole file
+    'auto_vacuum': 'INCREMENTAL',
+    'journal_mode': 'WAL',
+    'synchronous': 'NORMAL',
+    'busy_timeout': 5000,  # ms to wait for the write lock instead of failing with "database is locked"
+    'cache_size': -16000,  # KiB of page cache per connection
+    'temp_store': 'MEMORY',
+    'mmap_size': 256 * 1024 * 1024,
+    'foreign_keys': 'ON',
+}
+
+def set_sqlite_pragmas(dbapi_connection, connection_record):
+    cursor = dbapi_connection.cursor()
+    for name, value in SQLITE_PRAGMAS.items():
+        cursor.execute(f'PRAGMA {name}={value}')
+    cursor.close()
+
+with app.app_context():
+    event.listen(db.engine, 'connect', set_sqlite_pragmas)
+
+# Length of the original text kept in summary_model for listings
+PREVIEW_LENGTH = 200
+
+# Longest summary the model may be asked for, in tokens, and most lengths one /process_text request may ask for
+MAX_SUMMARY_TOKENS = 1024
+MAX_SIZES = 8
+
+# Summaries generated by the model, or extracted from the text; bump the version when extraction changes
+SUMMARY_MODES = ('abstractive', 'extractive')
+EXTRACTIVE_VERSION = 'extractive-2'
+
 # Define the Model
 class SummaryModel(db.Model):
+    # Keyset pagination of the history walks this index newest first
+    __table_args__ = (db.Index('ix_summary_model_created_date_id', 'created_date', 'id'),)
+
     id = db.Column(db.String(36), primary_key=True, default=lambda: str(uuid4()))
-    original_text = db.Column(db.Text, nullable=False)
+    preview = db.Column(db.String(PREVIEW_LENGTH))
     is_file = db.Column(db.Boolean, nullable=False, default=False)
     file_path = db.Column(db.String(255))
-    summarized = db.Column(db.Text)
-    score = db.Column(db.Float)
+    score = db.Column(db.Float, index=True)
     created_date:datetime = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
     minsize = db.Column(db.Integer, nullable=False)
     maxsize = db.Column(db.Integer, nullable=False)
+    status = db.Column(db.String(16), nullable=False, default=STATUS_QUEUED)
+    content_hash = db.Column(db.String(64), index=True)
+    # Name of the registry model that produced the summary, or the extractive summarizer version
+    model = db.Column(db.String(64))
+    # Characters of the original text, for the rating statistics
+    input_length = db.Column(db.Integer)
+    # Stage breakdown in milliseconds (JSON), only recorded for requests sent with the profiling header
+    profile = db.Column(db.Text)
+    # The text bodies live in summary_text and are only read when accessed
+    body = db.relationship('SummaryText', uselist=False, lazy='select', cascade='all, delete-orphan')
+
+    @property
+    def original_text(self):
+        return self.body.original_text if self.body else None
+
+    @original_text.setter
+    def original_text(self, value):
+        if self.body is None:
+            self.body = SummaryText()
+        self.body.original_text = value
+        self.preview = value[:PREVIEW_LENGTH]
+        self.input_length = len(value)
+
+    @property
+    def summarized(self):
+        return self.body.summarized if self.body else None
+
+    @summarized.setter
+    def summarized(self, value):
+        if self.body is None:
+            self.body = SummaryText()
+        self.body.summarized = value
+
+# The text bodies are stored zlib-compressed; rows written before are read as they are
+class SummaryText(db.Model):
+    id = db.Column(db.String(36), db.ForeignKey('summary_model.id', ondelete='CASCADE'), primary_key=True)
+    original_text = db.Column(CompressedText, nullable=False)
+    summarized = db.Column(CompressedText)
+
+# Columns added after the first release, with the DDL used to add them to existing databases
+SCHEMA_UPGRADES = {
+    'status': "VARCHAR(16) NOT NULL DEFAULT '%s'" % STATUS_DONE,
+    'content_hash': 'VARCHAR(64)',
+    'profile': 'TEXT',
+    'preview': 'VARCHAR(%d)' % PREVIEW_LENGTH,
+    'model': 'VARCHAR(64)',
+    'input_length': 'INTEGER',
+}
+
+def upgrade_schema():
+    existing = {column['name'] for column in db.inspect(db.engine).get_columns(SummaryModel.__tablename__)}
+    with db.engine.begin() as connection:
+        for name, ddl in SCHEMA_UPGRADES.items():
+            if name not in existing:
+                connection.exec_driver_sql(f'ALTER TABLE {SummaryModel.__tablename__} ADD COLUMN {name} {ddl}')
+        if 'original_text' in existing:
+            # Databases created before summary_text stored the text bodies inline: move them out
+            connection.exec_driver_sql(
+                'INSERT OR IGNORE INTO summary_text (id, original_text, summarized) '
+                'SELECT id, original_text, summarized FROM summary_model')
+            connection.exec_driver_sql(
+                f'UPDATE summary_model SET preview = substr(original_text, 1, {PREVIEW_LENGTH}) WHERE preview IS NULL')
+            for name in ('original_text', 'summarized'):
+                connection.exec_driver_sql(f'ALTER TABLE summary_model DROP COLUMN {name}')
+    for index in SummaryModel.__table__.indexes:
+        index.create(db.engine, checkfirst=True)
+
+# Ratings are rolled up by creation day of the summary (UTC), model, input length and score as they are given,
+# so /stats never scans the summaries. Input lengths are bucketed by characters ([0, 1000), [1000, 4000), ...
+# [64000, inf), -1 when unknown) and scores by unit ([0, 1), [1, 2), ... [9, 10])
+LENGTH_BUCKETS = (0, 1000, 4000, 16000, 64000)
+SCORE_BUCKETS = 10
+# Rows whose input length is filled in per transaction by the backfill
+BACKFILL_BATCH_SIZE = 500
+
+class RatingRollup(db.Model):
+    day = db.Column(db.String(10), primary_key=True)
+    # '' for summaries recorded before models were
+    model = db.Column(db.String(64), primary_key=True)
+    length_bucket = db.Column(db.Integer, primary_key=True)
+    score_bucket = db.Column(db.Integer, primary_key=True)
+    count = db.Column(db.Integer, nullable=False)
+    total = db.Column(db.Float, nullable=False)
+
+ROLLUP_KEY = (RatingRollup.day, RatingRollup.model, RatingRollup.length_bucket, RatingRollup.score_bucket)
+
+def length_bucket(input_length):
+    return LENGTH_BUCKETS[bisect_right(LENGTH_BUCKETS, input_length) - 1]
+
+# (min_chars, max_chars) of a length bucket; max_chars is None for the last one, both are for unknown lengths
+def length_bounds(bucket):
+    if bucket not in LENGTH_BUCKETS:
+        return None, None
+    index = LENGTH_BUCKETS.index(bucket)
+    return bucket, LENGTH_BUCKETS[index + 1] if index + 1 < len(LENGTH_BUCKETS) else None
+
+def score_bucket(score):
+    return min(int(score), SCORE_BUCKETS - 1)
+
+# Helper function to add a rating to its rollup, in the transaction recording the score
+def record_rating(summary, input_length, score):
+    statement = sqlite_insert(RatingRollup).values(
+        day=summary.created_date.strftime('%Y-%m-%d'), model=summary.model or '',
+        length_bucket=length_bucket(input_length), score_bucket=score_bucket(score), count=1, total=score)
+    db.session.execute(statement.on_conflict_do_update(
+        index_elements=[column.name for column in ROLLUP_KEY],
+        set_={'count': RatingRollup.count + 1, 'total': RatingRollup.total + statement.excluded.total}))
+
+# The rollups computed by a full scan of the rated summaries, with the same buckets as record_rating
+def scan_ratings():
+    return (db.select(db.func.date(SummaryModel.created_date).label('day'),
+                      db.func.coalesce(SummaryModel.model, '').label('model'),
+                      db.case(*[(SummaryModel.input_length >= bucket, bucket) for bucket in reversed(LENGTH_BUCKETS)],
+                              else_=-1).label('length_bucket'),
+                      db.func.min(db.cast(SummaryModel.score, db.Integer), SCORE_BUCKETS - 1).label('score_bucket'),
+                      db.func.count().label('count'),
+                      db.func.sum(SummaryModel.score).label('total'))
+            .where(SummaryModel.score.is_not(None))
+            .group_by('day', 'model', 'length_bucket', 'score_bucket'))
+
+# Helper function to rebuild the rating rollups from the summaries. Input lengths missing from rows
+# written before they were recorded are filled in first. Returns the number of ratings and rollup rows
+def backfill_rating_rollups():
+    while True:
+        summaries = (SummaryModel.query.filter(SummaryModel.score.is_not(None), SummaryModel.input_length.is_(None))
+                     .limit(BACKFILL_BATCH_SIZE).all())
+        if not summaries:
+            break
+        for summary in summaries:
+            summary.input_length = len(summary.original_text or '')
+        db.session.commit()
+        db.session.expunge_all()
+    # One transaction: ratings given meanwhile wait for it, then land on the rebuilt rollups
+    with db.engine.begin() as connection:
+        connection.execute(db.delete(RatingRollup))
+        connection.execute(db.insert(RatingRollup).from_select(
+            [column.name for column in ROLLUP_KEY] + ['count', 'total'], scan_ratings()))
+        ratings, rows = connection.execute(
+            db.select(db.func.coalesce(db.func.sum(RatingRollup.count), 0), db.func.count())).one()
+    return ratings, rows
+
+# Helper function to compare the rating rollups with a full scan of the summaries, in a single statement
+# so both sides see the same ratings. Returns the differing buckets
+def check_rating_rollups():
+    stored = db.select(*ROLLUP_KEY, RatingRollup.count.label('stored_count'), RatingRollup.total.label('stored_total'),
+                       db.literal(0).label('scanned_count'), db.literal(0.0).label('scanned_total'))
+    scanned = scan_ratings().subquery()
+    scanned = db.select(scanned.c.day, scanned.c.model, scanned.c.length_bucket, scanned.c.score_bucket,
+                        db.literal(0), db.literal(0.0), scanned.c.count, scanned.c.total)
+    both = db.union_all(stored, scanned).subquery()
+    key = (both.c.day, both.c.model, both.c.length_bucket, both.c.score_bucket)
+    stored_count, stored_total = db.func.sum(both.c.stored_count), db.func.sum(both.c.stored_total)
+    scanned_count, scanned_total = db.func.sum(both.c.scanned_count), db.func.sum(both.c.scanned_total)
+    query = (db.select(*key, stored_count.label('stored_count'), scanned_count.label('scanned_count'),
+                       stored_total.label('stored_total'), scanned_total.label('scanned_total'))
+             .group_by(*key)
+             .having(db.or_(stored_count != scanned_count, db.func.abs(stored_total - scanned_total) > 1e-6))
+             .order_by(*key))
+    with db.engine.connect() as connection:
+        return [row._asdict() for row in connection.execute(query)]
 
 # Create the database tables
 with app.app_context():
+    new_tables = set(db.metadata.tables) - set(db.inspect(db.engine).get_table_names())
     db.create_all()
+    upgrade_schema()
+    if RatingRollup.__tablename__ in new_tables and SummaryModel.__tablename__ not in new_tables:
+        # Databases from before the rollups: compute them from the ratings given so far
+        app.logger.info("Rating rollups built from %d ratings", backfill_rating_rollups()[0])
+
+# Requests sent with this header get their stage breakdown back
+PROFILE_HEADER = 'X-Profile'
+
+REQUEST_SECONDS = 'api_request_seconds'
+requests_in_flight = REGISTRY.gauge('api_requests_in_flight', 'HTTP requests being handled')
+
+# Helper function to report stage durations in milliseconds
+def stage_breakdown(stages):
+    return {stage: round(seconds * 1000, 3) for stage, seconds in stages.items()}
+
+@app.before_request
+def start_request():
+    g.request_started = time.perf_counter()
+    requests_in_flight.inc()
+    if app.config['COMPACTION_INTERVAL_MINUTES'] > 0:
+        # Started by the first request of every server process; the file lock keeps one compaction running
+        compaction_job.ensure_started()
+    if request.headers.get(PROFILE_HEADER):
+        g.profiling = profiling()
+        g.stages = g.profiling.__enter__()
+
+@app.after_request
+def finish_request(response):
+    REGISTRY.histogram(REQUEST_SECONDS, 'HTTP request latency by endpoint',
+                       endpoint=request.endpoint or 'unknown').observe(time.perf_counter() - g.request_started)
+    if 'profiling' in g:
+        response.headers['Server-Timing'] = ', '.join(
+            f'{stage};dur={ms}' for stage, ms in stage_breakdown(g.stages).items())
+    return response
+
+@app.teardown_request
+def end_request(exc):
+    requests_in_flight.dec()
+    if 'profiling' in g:
+        g.profiling.__exit__(None, None, None)
+
+# Summarize with a registry model; blocks until the model is loaded
+def summarize(model, original_text, minsize, maxsize):
+    return model.summarize(original_text, **generation_lengths(minsize, maxsize))
+
+# minsize and maxsize bound the length of the generated summary, in tokens
+def generation_lengths(minsize, maxsize):
+    return {'min_length': minsize, 'max_length': maxsize}
+
+# Persistent cache tier: reuse any finished summary with the same content hash.
+# Runs on its own short-lived connection: callers go on to run inference, and a session
+# would keep its pooled connection checked out until then
+def lookup_summary(content_hash):
+    query = (db.select(SummaryText.summarized)
+             .join(SummaryModel, SummaryModel.id == SummaryText.id)
+             .where(SummaryModel.content_hash == content_hash, SummaryModel.status == STATUS_DONE)
+             .limit(1))
+    with db.engine.connect() as connection:
+        row = connection.execute(query).first()
+    return row[0] if row else None
+
+summary_cache = SummaryCache(app.config['SUMMARY_CACHE_BYTES'], lookup=lookup_summary)
+
+# Runs in an inference worker thread: fills in the summary of a queued row
+def run_summary_job(summary_id):
+    with app.app_context():
+        summary = db.session.get(SummaryModel, summary_id)
+        if summary is None:
+            return
+        with profiling() as stages:
+            record_stage('queue_wait', (datetime.utcnow() - summary.created_date).total_seconds())
+            summary.status = STATUS_RUNNING
+            with timed('db_commit'):
+                db.session.commit()
+            # A model removed from the registry since the row was queued is replaced by the routed one
+            model = model_registry.get(summary.model) or model_registry.route(summary.original_text)
+            summary.model = model.name
+            try:
+                compute = lambda: summarize(model, summary.original_text, summary.minsize, summary.maxsize)
+                # Identical requests running concurrently share a single computation
+                summary.summarized = summary_cache.get_or_compute(summary.content_hash, compute) if summary.content_hash else compute()
+                summary.status = STATUS_DONE
+            except Exception:
+                app.logger.exception("Summarization failed for %s", summary_id)
+                summary.status = STATUS_FAILED
+            if summary.profile is not None:
+                summary.profile = json.dumps(stage_breakdown(stages))
+            with timed('db_commit'):
+                db.session.commit()
+
+# One pool of inference workers per model, created on first use, so the backlog of a slow model
+# never holds up the requests routed to a fast one
+job_queues = {}
+job_queues_lock = threading.Lock()
+
+def job_queue_for(model_name):
+    model = model_registry.get(model_name)
+    workers = model.spec.workers if model else app.config['INFERENCE_WORKERS']
+    with job_queues_lock:
+        job_queue = job_queues.get(model_name)
+        if job_queue is not None:
+            # A reload or swap may have changed the number of workers of the model
+            if job_queue.workers != workers:
+                job_queue.resize(workers)
+        else:
+            job_queue = job_queues[model_name] = JobQueue(
+                run_summary_job, workers=workers, maxsize=app.config['JOB_QUEUE_SIZE'], name=f'summary-{model_name}')
+            REGISTRY.gauge('summarizer_queue_depth', 'Summaries waiting for an inference worker',
+                           fn=job_queue.depth, model=model_name)
+            REGISTRY.gauge('summarizer_jobs_in_flight', 'Summaries being generated',
+                           fn=job_queue.in_flight, model=model_name)
+        return job_queue
+
+# Summaries queued or being generated by a model, for the latency estimates of the router
+def model_backlog(model_name):
+    job_queue = job_queues.get(model_name)
+    return job_queue.depth() + job_queue.in_flight() if job_queue else 0
+
+# Helper function to pick the model of a request
+def route(text, latency_budget_ms=None):
+    return model_registry.route(text, latency_budget_ms, backlog=model_backlog)
+for counter in ('memory_hits', 'persistent_hits', 'misses', 'evictions', 'coalesced', 'computed'):
+    REGISTRY.counter(f'summary_cache_{counter}_total', f'Summary cache {counter.replace("_", " ")}',
+                     fn=lambda counter=counter: summary_cache.stats()[counter])
+REGISTRY.gauge('summary_cache_bytes', 'Bytes held by the in-memory summary cache', fn=lambda: summary_cache.stats()['bytes'])
+
+# Threads waiting on the micro-batcher for /process_batch items; they only block, the batcher does the work
+batch_executor = ThreadPoolExecutor(max_workers=app.config['BATCH_WINDOW'], thread_name_prefix='batch-item')
+batch_items = {outcome: REGISTRY.counter('api_batch_items_total', 'Items of /process_batch requests by outcome',
+                                         outcome=outcome)
+               for outcome in ('done', 'failed', 'invalid')}
+
+upload_store = UploadStore(app.config['UPLOAD_FOLDER'], pdf_workers=app.config['PDF_WORKERS'])
+uploads = {result: REGISTRY.counter('api_uploads_total', 'Uploaded files, new or identical to a stored one',
+                                    result=result)
+           for result in ('new', 'duplicate')}
+
+# Rows per transaction of a compaction, and seconds between two transactions so requests get the write lock in between
+COMPACTION_BATCH_SIZE = 500
+COMPACTION_PAUSE = 0.05
+# Uploads modified more recently may belong to a summary row that is not committed yet
+ORPHAN_MIN_AGE_SECONDS = 3600
+# Summaries read before and after a compaction to report its effect on get_summary
+PROBE_SIZE = 20
+RETENTION_POLICIES = ('archive', 'delete')
+if app.config['RETENTION_POLICY'] not in RETENTION_POLICIES:
+    raise ValueError(f"RETENTION_POLICY must be one of {', '.join(RETENTION_POLICIES)}")
+
+reclaimed_bytes = {kind: REGISTRY.counter('storage_reclaimed_bytes_total', 'Bytes released by storage compaction',
+                                          kind=kind)
+                   for kind in ('uploads', 'database')}
+expired_summaries = REGISTRY.counter('summaries_expired_total', 'Unrated summaries removed by the retention policy')
+
+# Helper function to time reading summaries the way get_summary does, in milliseconds per id. Every summary
+# is read once first, so the timings compare storage formats rather than cold and warm page caches
+def probe_get_summary(ids):
+    latencies = {}
+    for measure in (False, True):
+        for id in ids:
+            started = time.perf_counter()
+            summary = db.session.get(SummaryModel, id)
+            if summary is not None:
+                summary.original_text, summary.summarized
+                if measure:
+                    latencies[id] = (time.perf_counter() - started) * 1000
+            db.session.expunge_all()
+    return latencies
+
+def latency_summary(latencies):
+    ordered = sorted(latencies)
+    if not ordered:
+        return None
+    return {'p50_ms': round(ordered[len(ordered) // 2], 3),
+            'p95_ms': round(ordered[min(len(ordered) - 1, round(0.95 * (len(ordered) - 1)))], 3)}
+
+# Helper function to archive or delete the unrated summaries finished before cutoff, oldest first.
+# Returns the number of summaries removed and the archive file
+def expire_summaries(cutoff, policy):
+    expired, archive_path, position = 0, None, None
+    while True:
+        query = (db.select(SummaryModel.id, SummaryModel.created_date)
+                 .where(SummaryModel.score.is_(None), SummaryModel.status.in_((STATUS_DONE, STATUS_FAILED)),
+                        SummaryModel.created_date < cutoff)
+                 .order_by(SummaryModel.created_date, SummaryModel.id).limit(COMPACTION_BATCH_SIZE))
+        if position is not None:
+            # Keyset pagination skips the rows kept because they were rated in the meantime
+            query = query.where(db.tuple_(SummaryModel.created_date, SummaryModel.id) > position)
+        rows = db.session.execute(query).all()
+        if not rows:
+            break
+        position = (rows[-1].created_date, rows[-1].id)
+        ids = [row.id for row in rows]
+        if policy == 'archive':
+            if archive_path is None:
+                os.makedirs(app.config['ARCHIVE_FOLDER'], exist_ok=True)
+                archive_path = os.path.join(app.config['ARCHIVE_FOLDER'],
+                                            f'summaries-{datetime.utcnow():%Y%m%dT%H%M%S}.jsonl.gz')
+            with gzip.open(archive_path, 'at', encoding='utf-8') as file:
+                for summary in SummaryModel.query.filter(SummaryModel.id.in_(ids)):
+                    file.write(json.dumps({
+                        'id': summary.id, 'original_text': summary.original_text, 'summarized': summary.summarized,
+                        'is_file': summary.is_file, 'file_path': summary.file_path, 'status': summary.status,
+                        'model': summary.model, 'minsize': summary.minsize, 'maxsize': summary.maxsize,
+                        'content_hash': summary.content_hash, 'created_date': summary.created_date.isoformat(),
+                    }) + '\n')
+        # The texts go with the rows (ON DELETE CASCADE); summaries rated since they were selected stay
+        expired += db.session.execute(
+            db.delete(SummaryModel).where(SummaryModel.id.in_(ids), SummaryModel.score.is_(None)),
+            execution_options={'synchronize_session': False}).rowcount
+        db.session.commit()
+        db.session.expunge_all()
+        time.sleep(COMPACTION_PAUSE)
+    return expired, archive_path
+
+# Helper function to compress the text bodies written before compression was enabled.
+# Returns the number of rows rewritten and the bytes saved
+def recompress_texts():
+    rewritten = saved = 0
+    last_id = ''
+    while True:
+        with db.engine.connect() as connection:
+            rows = connection.exec_driver_sql(
+                "SELECT id, original_text, summarized FROM summary_text WHERE id > ? "
+                "AND (typeof(original_text) = 'text' OR typeof(summarized) = 'text') ORDER BY id LIMIT ?",
+                (last_id, COMPACTION_BATCH_SIZE)).fetchall()
+        if not rows:
+            break
+        last_id = rows[-1][0]
+        updates = []
+        for id, original_text, summarized in rows:
+            stored = [compress_text(value) if isinstance(value, str) else value for value in (original_text, summarized)]
+            if stored == [original_text, summarized]:
+                continue  # short or incompressible
+            saved += sum(len(old.encode('utf-8')) - len(new) for old, new in zip((original_text, summarized), stored)
+                         if isinstance(old, str) and isinstance(new, bytes))
+            # Unless a worker filled in the summary since it was read
+            updates.append((*stored, id, summarized))
+        if updates:
+            with db.engine.begin() as connection:
+                rewritten += sum(connection.exec_driver_sql(
+                    'UPDATE summary_text SET original_text = ?, summarized = ? WHERE id = ? AND summarized IS ?',
+                    update).rowcount for update in updates)
+            time.sleep(COMPACTION_PAUSE)
+    return rewritten, saved
+
+# Helper function to delete the stored uploads no summary refers to anymore
+def remove_orphaned_uploads():
+    referenced = {os.path.abspath(path) for path in db.session.execute(
+        db.select(SummaryModel.file_path).where(SummaryModel.file_path.is_not(None)).distinct()).scalars()}
+    return upload_store.remove_orphans(referenced, ORPHAN_MIN_AGE_SECONDS)
+
+# Expires old summaries, compresses old rows, removes orphaned uploads and releases free database pages, in short
+# transactions so requests keep being served. Returns a report of the bytes reclaimed and of get_summary timings
+def compact_storage(full=False):
+    started = time.perf_counter()
+    database_path = db.engine.url.database
+    report = {'database_bytes_before': database_bytes(database_path), 'expired': 0, 'archive': None}
+    probe_ids = db.session.execute(db.select(SummaryModel.id).where(SummaryModel.status == STATUS_DONE)
+                                   .order_by(db.func.random()).limit(PROBE_SIZE)).scalars().all()
+    before = probe_get_summary(probe_ids)
+
+    if app.config['RETENTION_DAYS'] > 0:
+        cutoff = datetime.utcnow() - timedelta(days=app.config['RETENTION_DAYS'])
+        report['expired'], report['archive'] = expire_summaries(cutoff, app.config['RETENTION_POLICY'])
+    report['recompressed'], report['compression_saved_bytes'] = recompress_texts()
+    report['uploads_removed'], report['uploads_reclaimed_bytes'] = remove_orphaned_uploads()
+    if full:
+        report['vacuum'], freed = 'full', full_vacuum(db.engine)
+    else:
+        freed = incremental_vacuum(db.engine)
+        # Databases created before incremental vacuums need one `flask compact --full-vacuum`
+        report['vacuum'] = 'incremental' if freed is not None else 'unavailable'
+    report['database_reclaimed_bytes'] = max(0, freed or 0)
+    report['database_bytes_after'] = database_bytes(database_path)
+    report['reclaimed_bytes'] = report['uploads_reclaimed_bytes'] + report['database_reclaimed_bytes']
+
+    after = probe_get_summary([id for id in probe_ids if id in before])
+    report['get_summary_before'] = latency_summary([before[id] for id in after])
+    report['get_summary_after'] = latency_summary(list(after.values()))
+    report['seconds'] = round(time.perf_counter() - started, 3)
+
+    expired_summaries.inc(report['expired'])
+    reclaimed_bytes['uploads'].inc(report['uploads_reclaimed_bytes'])
+    reclaimed_bytes['database'].inc(report['database_reclaimed_bytes'])
+    app.logger.info("Storage compaction: %s", json.dumps(report))
+    return report
+
+# One compaction at a time across the server processes; returns None when another one is running
+def run_compaction(full=False):
+    with exclusive_lock(os.path.join(app.instance_path, 'compaction.lock')) as acquired:
+        if not acquired:
+            return None
+        with app.app_context():
+            try:
+                return compact_storage(full)
+            finally:
+                db.session.remove()
+
+compaction_job = PeriodicJob(run_compaction, app.config['COMPACTION_INTERVAL_MINUTES'] * 60, name='storage-compaction')
+
+@app.cli.command('compact')
+@click.option('--full-vacuum', 'full', is_flag=True,
+              help='Rebuild the database with VACUUM, blocking writers meanwhile; needed once for databases '
+                   'created before incremental vacuums')
+def compact_command(full):
+    """Expire old unrated summaries, remove orphaned uploads and release free database pages."""
+    report = run_compaction(full)
+    if report is None:
+        raise click.ClickException('Another process is compacting the storage')
+    click.echo(json.dumps(report, indent=4))
+
+ratings_cli = AppGroup('ratings', help='Rating rollups served by /stats.')
+
+@ratings_cli.command('backfill')
+def backfill_ratings_command():
+    """Rebuild the rating rollups from the rated summaries."""
+    ratings, rows = backfill_rating_rollups()
+    click.echo(f'{ratings} ratings rolled up into {rows} rows')
+
+@ratings_cli.command('check')
+def check_ratings_command():
+    """Compare the rating rollups with a full scan of the rated summaries."""
+    mismatches = check_rating_rollups()
+    for mismatch in mismatches:
+        click.echo(json.dumps(mismatch))
+    if mismatches:
+        raise click.ClickException(f'{len(mismatches)} rollup bucket(s) differ from the summaries; '
+                                   'run `flask ratings backfill`')
+    click.echo('Rating rollups match the summaries')
+
+app.cli.add_command(ratings_cli)
+
+# Extractive summaries: sentences picked from the text itself, within maxsize words
+extractive = ExtractiveSummarizer()
+
+stream_slots = threading.BoundedSemaphore(app.config['STREAM_WORKERS'])
+stream_ttft = REGISTRY.histogram('summarizer_stream_ttft_seconds', 'Time from request to the first streamed fragment')
+stream_latency = REGISTRY.histogram('summarizer_stream_seconds', 'Time from request to the end of the stream')
+
+if app.config['PRELOAD_MODEL'] == 'sync':
+    model_registry.load()
+elif app.config['PRELOAD_MODEL'] == '1':
+    model_registry.start_loading()
+
+# Helper function to answer a new summary row from the cache, or queue it for the workers of the given model.
+# Returns 201 when the summary is done, 202 when it is queued; raises QueueFull (and drops the row) when the queue is full
+def submit_summary(summary, model):
+    summary.model = model.name
+    summary.content_hash = cache_key(summary.original_text, summary.minsize, summary.maxsize, model.version)
+    cached = summary_cache.get(summary.content_hash)
+    if cached is not None:
+        summary.summarized = cached
+        summary.status = STATUS_DONE
+        db.session.add(summary)
+        with timed('db_commit'):
+            db.session.commit()
+        return 201
+
+    if profiling_active():
+        # Ask the inference worker to record its stages too, returned by /get_summary
+        summary.profile = '{}'
+    db.session.add(summary)
+    with timed('db_commit'):
+        db.session.commit()
+    try:
+        job_queue_for(model.name).submit(summary.id)
+    except QueueFull:
+        db.session.delete(summary)
+        db.session.commit()
+        raise
+    return 202
+
+def enqueue_summary(summary, model):
+    try:
+        status_code = submit_summary(summary, model)
+    except QueueFull as e:
+        return jsonify({'error': str(e)}), 503, {'Retry-After': '5'}
+    return jsonify({'id': summary.id, 'status': summary.status}), status_code
+
+# Helper function to fill in a new summary row with the extractive summarizer, without the model
+def extract_summary(summary):
+    summary.model = EXTRACTIVE_VERSION
+    summary.content_hash = cache_key(summary.original_text, summary.minsize, summary.maxsize, EXTRACTIVE_VERSION)
+    summary.summarized = extractive.select(summary.original_text, summary.maxsize)
+    summary.status = STATUS_DONE
+    db.session.add(summary)
+    with timed('db_commit'):
+        db.session.commit()
+    return 201
+
+# Helper function to create and answer one summary row per requested length. The rows are queued together
+# for the same model, so the micro-batcher encodes the text once and every other length reuses the cached
+# encoder outputs. model is None in extractive mode
+def enqueue_sizes(original_text, sizes, mode, model):
+    summaries, status_code = [], 201
+    for minsize, maxsize in sizes:
+        summary = SummaryModel(
+            original_text=original_text,
+            minsize=minsize,
+            maxsize=maxsize,
+            is_file=False,
+            status=STATUS_QUEUED
+        )
+        try:
+            submitted = extract_summary(summary) if mode == 'extractive' else submit_summary(summary, model)
+        except QueueFull as e:
+            return jsonify({'error': str(e), 'summaries': summaries}), 503, {'Retry-After': '5'}
+        status_code = max(status_code, submitted)
+        result = {'id': summary.id, 'status': summary.status, 'minsize': minsize, 'maxsize': maxsize}
+        if mode == 'extractive':
+            result['summarized'] = summary.summarized
+        summaries.append(result)
+    return jsonify({'summaries': summaries}), status_code
 
 # Helper function to validate input data
 def validate_input(data, fields):
+    if not isinstance(data, dict):
+        return False, 'Request body must be a JSON object'
     missing_fields = [field for field in fields if field not in data]
     if missing_fields:
         return False, f"Missing fields: {', '.join(missing_fields)}"
     return True, None
 
+# Helper function to validate the text of a request
+def validate_text(text):
+    if not isinstance(text, str) or not text.strip():
+        return 'text must be a non-empty string'
+    return None
+
+# Helper function to validate the summary length limits of a request
+def validate_sizes(minsize, maxsize):
+    if not all(isinstance(size, int) and not isinstance(size, bool) for size in (minsize, maxsize)):
+        return 'minsize and maxsize must be integers'
+    if not 0 <= minsize <= maxsize <= MAX_SUMMARY_TOKENS or maxsize < 1:
+        return f'minsize and maxsize must satisfy 0 <= minsize <= maxsize <= {MAX_SUMMARY_TOKENS}'
+    return None
+
+# Helper function to validate the optional latency budget of a request
+def validate_latency_budget(latency_budget_ms):
+    if latency_budget_ms is None:
+        return None
+    if isinstance(latency_budget_ms, bool) or not isinstance(latency_budget_ms, (int, float)) or latency_budget_ms <= 0:
+        return 'latency_budget_ms must be a positive number'
+    return None
+
+# Helper function to validate the "sizes" list of /process_text
+def parse_sizes(sizes):
+    if not isinstance(sizes, list) or not 1 <= len(sizes) <= MAX_SIZES:
+        raise ValueError(f'sizes must be a list of 1 to {MAX_SIZES} {{"minsize", "maxsize"}} objects')
+    parsed = []
+    for size in sizes:
+        if not isinstance(size, dict) or 'minsize' not in size or 'maxsize' not in size:
+            raise ValueError('Each size must be an object with minsize and maxsize')
+        error_message = validate_sizes(size['minsize'], size['maxsize'])
+        if error_message:
+            raise ValueError(error_message)
+        if (size['minsize'], size['maxsize']) not in parsed:
+            parsed.append((size['minsize'], size['maxsize']))
+    return parsed
+
+# Helper function to read the lines of a JSONL body one at a time; oversized lines are skipped and yielded as None
+def iter_batch_lines(stream, max_bytes):
+    while True:
+        line = stream.readline(max_bytes + 1)
+        if not line:
+            return
+        if len(line) > max_bytes and not line.endswith(b'\n'):
+            while line and not line.endswith(b'\n'):
+                line = stream.readline(max_bytes)
+            yield None
+        else:
+            yield line
+
+# Helper function to validate one /process_batch item
+def parse_batch_item(line, max_bytes):
+    if line is None:
+        raise ValueError(f'Item larger than {max_bytes} bytes')
+    try:
+        data = json.loads(line)
+    except ValueError:
+        raise ValueError('Invalid JSON')
+    if not isinstance(data, dict):
+        raise ValueError('Each line must be a JSON object')
+    is_valid, error_message = validate_input(data, ['text','minsize','maxsize'])
+    if not is_valid:
+        raise ValueError(error_message)
+    error_message = (validate_text(data['text']) or validate_sizes(data['minsize'], data['maxsize'])
+                     or validate_latency_budget(data.get('latency_budget_ms')))
+    if error_message:
+        raise ValueError(error_message)
+    return data
+
+# Runs in a batch_executor thread: summarize one item through the cache and the micro-batcher of its model
+def summarize_batch_item(model, content_hash, item):
+    with app.app_context():
+        return summary_cache.get_or_compute(
+            content_hash, lambda: summarize(model, item['text'], item['minsize'], item['maxsize']))
+
+# Helper function to format a Server-Sent Event
+def sse(event, data):
+    return f'event: {event}\ndata: {json.dumps(data)}\n\n'
+
+# Helper functions to encode the position of the last listed row as an opaque cursor
+def encode_cursor(created_date, id):
+    return base64.urlsafe_b64encode(f'{created_date.isoformat()}|{id}'.encode('utf-8')).decode('ascii')
+
+def decode_cursor(cursor):
+    try:
+        created_date, id = base64.urlsafe_b64decode(cursor.encode('ascii')).decode('utf-8').split('|', 1)
+        return datetime.fromisoformat(created_date), id
+    except (ValueError, binascii.Error):
+        return None
+
 # Helper function to validate file type
 def allowed_file(filename):
     ALLOWED_EXTENSIONS = {'pdf', 'txt'}
@@ -50,7 +848,7 @@ def allowed_file(filename):
 
 @app.route('/process_text', methods=['POST'])
 @swag_from({
-    'summary': 'Process the provided text and return the ID of the created summary.',
+    'summary': 'Queue the provided text for summarization and return the ID of the created summary.',
     'parameters': [
         {
             'name': 'original_text',
@@ -60,46 +858,92 @@ def allowed_file(filename):
                 'type': 'object',
                 'properties': {
                     'original_text': {'type': 'string'},
-                    'minsize': {'type': 'integer'},
-                    'maxsize': {'type': 'integer'}
+                    'minsize': {'type': 'integer', 'description': 'Minimum summary length, in tokens'},
+                    'maxsize': {'type': 'integer', 'description': 'Maximum summary length, in tokens'},
+                    'sizes': {
+                        'type': 'array',
+                        'description': 'Several length limits at once, replacing minsize and maxsize: one summary '
+                                       'per entry, all computed from a single encoder pass. Answered with '
+                                       '{"summaries": [{"id", "status", "minsize", "maxsize"}]}',
+                        'items': {
+                            'type': 'object',
+                            'properties': {
+                                'minsize': {'type': 'integer'},
+                                'maxsize': {'type': 'integer'}
+                            }
+                        }
+                    },
+                    'mode': {
+                        'type': 'string',
+                        'enum': list(SUMMARY_MODES),
+                        'default': 'abstractive',
+                        'description': 'extractive picks up to maxsize words of the most salient sentences '
+                                       'without running the model, and returns them at once'
+                    },
+                    'latency_budget_ms': {
+                        'type': 'number',
+                        'description': 'Time the client is willing to wait: the summary is generated by the best '
+                                       'model expected to finish within it, or by the fastest one'
+                    }
                 }
             }
         }
     ],
     'responses': {
-        201: {'description': 'Summary created successfully'}
+        201: {'description': 'Summary served from the cache or extracted, status is done'},
+        202: {'description': 'Summary queued, poll /get_summary/<id> until status is done'},
+        400: {'description': 'Invalid input'},
+        503: {'description': 'Too many pending summaries, retry later'}
     }
 })
 def process_text():
-    data = request.json
-    is_valid, error_message = validate_input(data, ['text','minsize','maxsize'])
+    with timed('parse_request'):
+        data = request.json
+        sizes_given = isinstance(data, dict) and 'sizes' in data
+        is_valid, error_message = validate_input(data, ['text'] if sizes_given else ['text','minsize','maxsize'])
     
     if not is_valid:
         return jsonify({'error': error_message}), 400
+    mode = data.get('mode', 'abstractive')
+    if mode not in SUMMARY_MODES:
+        return jsonify({'error': f"mode must be one of {', '.join(SUMMARY_MODES)}"}), 400
+    error_message = validate_text(data['text']) or validate_latency_budget(data.get('latency_budget_ms'))
+    if error_message:
+        return jsonify({'error': error_message}), 400
 
     original_text = data['text']
+    model = route(original_text, data.get('latency_budget_ms')) if mode == 'abstractive' else None
+    if sizes_given:
+        try:
+            sizes = parse_sizes(data['sizes'])
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        return enqueue_sizes(original_text, sizes, mode, model)
+
     minsize = data['minsize']
     maxsize = data['maxsize']
-    # Simulate summarization (replace with actual logic)
-    summarized = original_text[:maxsize] + "..." if len(original_text) > 50 else original_text
+    error_message = validate_sizes(minsize, maxsize)
+    if error_message:
+        return jsonify({'error': error_message}), 400
 
     summary = SummaryModel(
         original_text=original_text,
         minsize=minsize,
         maxsize=maxsize,
         is_file=False,
-        summarized=summarized
+        status=STATUS_QUEUED
     )
-    
-    db.session.add(summary)
-    db.session.commit()
 
-    return jsonify({'id': summary.id})
+    if mode == 'extractive':
+        extract_summary(summary)
+        return jsonify({'id': summary.id, 'status': summary.status, 'summarized': summary.summarized}), 201
+    return enqueue_summary(summary, model)
 
 @app.route('/process_file', methods=['POST'])
 @swag_from({
     'tags': ['Summary'],
     'description': 'Process file to create a summary',
+    'consumes': ['multipart/form-data'],
     'parameters': [
         {
             'name': 'file',
@@ -107,23 +951,55 @@ def process_text():
             'type': 'file',
             'required': True,
             'description': 'PDF or text file to be summarized'
+        },
+        {
+            'name': 'minsize',
+            'in': 'formData',
+            'type': 'integer',
+            'required': True
+        },
+        {
+            'name': 'maxsize',
+            'in': 'formData',
+            'type': 'integer',
+            'required': True
+        },
+        {
+            'name': 'latency_budget_ms',
+            'in': 'formData',
+            'type': 'number',
+            'required': False,
+            'description': 'Time the client is willing to wait, to pick a faster model if needed'
         }
     ],
     'responses': {
-        200: {
-            'description': 'Summary created successfully',
+        201: {
+            'description': 'Summary served from the cache, status is done',
+        },
+        202: {
+            'description': 'Summary queued, poll /get_summary/<id> until status is done',
             'schema': {
                 'type': 'object',
                 'properties': {
                     'id': {
                         'type': 'string',
                         'example': 'd290f1ee-6c54-4b01-90e6-d701748f0851'
+                    },
+                    'status': {
+                        'type': 'string',
+                        'example': 'queued'
                     }
                 }
             }
         },
         400: {
-            'description': 'Invalid input or file not allowed',
+            'description': 'Invalid input, file not allowed or no text could be extracted',
+        },
+        413: {
+            'description': 'File larger than MAX_UPLOAD_MB',
+        },
+        503: {
+            'description': 'Too many pending summaries, retry later',
         }
     }
 })
@@ -132,42 +1008,297 @@ def process_file():
         return jsonify({'error': 'No file part in the request'}), 400
     
     file = request.files['file']
-    minsize = request.json['minsize']
-    maxsize = request.json['maxsize']
-    is_valid, error_message = validate_input(request.json, ['text','minsize','maxsize'])
+    with timed('parse_request'):
+        is_valid, error_message = validate_input(request.form, ['minsize','maxsize'])
     
     if not is_valid:
         return jsonify({'error': error_message}), 400
+    try:
+        minsize = int(request.form['minsize'])
+        maxsize = int(request.form['maxsize'])
+    except ValueError:
+        return jsonify({'error': 'minsize and maxsize must be integers'}), 400
+    try:
+        latency_budget_ms = float(request.form['latency_budget_ms']) if 'latency_budget_ms' in request.form else None
+    except ValueError:
+        return jsonify({'error': 'latency_budget_ms must be a positive number'}), 400
+    error_message = validate_sizes(minsize, maxsize) or validate_latency_budget(latency_budget_ms)
+    if error_message:
+        return jsonify({'error': error_message}), 400
     if file.filename == '':
         return jsonify({'error': 'No selected file'}), 400
 
     if not allowed_file(file.filename):
         return jsonify({'error': 'File type not allowed. Only PDF and text files are permitted.'}), 400
 
-    filename = secure_filename(file.filename)
-    file_path = os.path.join(app.config['UPLOAD_FOLDER'], filename)
-    
-    # Save the file locally
-    file.save(file_path)
+    # Save the file under its content hash; identical uploads share one file
+    with timed('file_save'):
+        file_path, created = upload_store.save(file.stream, '.' + file.filename.rsplit('.', 1)[1].lower())
+    uploads['new' if created else 'duplicate'].inc()
 
-    # Simulate summarization from file content (replace with actual logic)
-    with open(file_path, 'r') as f:
-        original_text = f.read()
+    # Reuse the text extracted from an identical upload, extract it otherwise
+    with timed('file_read'):
+        original_text = upload_store.cached_text(file_path)
+    if original_text is None:
+        try:
+            with timed('extract_text'):
+                original_text = upload_store.extract_text(file_path)
+        except UnreadableFile as e:
+            return jsonify({'error': str(e)}), 400
 
-    summarized = original_text[:50] + "..." if len(original_text) > 50 else original_text
-    
     summary = SummaryModel(
         original_text=original_text,
         minsize=minsize,
         maxsize=maxsize,
+        is_file=True,
+        file_path=file_path,
+        status=STATUS_QUEUED
+    )
+
+    return enqueue_summary(summary, route(original_text, latency_budget_ms))
+
+@app.route('/process_batch', methods=['POST'])
+@swag_from({
+    'tags': ['Summary'],
+    'description': 'Summarize a stream of texts. The body is JSONL, one {"text", "minsize", "maxsize"} object per line, '
+                   'optionally with a "latency_budget_ms"; results are streamed back as JSONL in completion order, '
+                   'each with the index of its input line and the model that produced it',
+    'consumes': ['application/x-ndjson'],
+    'produces': ['application/x-ndjson'],
+    'parameters': [
+        {
+            'name': 'body',
+            'in': 'body',
+            'required': True,
+            'schema': {
+                'type': 'string',
+                'example': '{"text": "First article...", "minsize": 30, "maxsize": 150}\n'
+                           '{"text": "Second article...", "minsize": 30, "maxsize": 150}\n'
+            }
+        }
+    ],
+    'responses': {
+        200: {
+            'description': 'One JSON object per input line: {"index", "id", "status", "model", "summarized"} on success, '
+                           '{"index", "error"} (plus "id" and "status": "failed" if inference failed) otherwise'
+        }
+    }
+})
+def process_batch():
+    stream = request.stream
+    window = app.config['BATCH_WINDOW']
+    commit_size = app.config['BATCH_COMMIT_SIZE']
+    commit_interval = app.config['BATCH_COMMIT_INTERVAL_MS'] / 1000.0
+    max_bytes = app.config['BATCH_MAX_ITEM_BYTES']
+
+    def results():
+        lines = enumerate(iter_batch_lines(stream, max_bytes))
+        inflight = {}
+        uncommitted = []
+        commit_at = None
+        exhausted = False
+
+        # Results are only sent once their rows are committed, so every returned id can be fetched
+        def flush():
+            try:
+                with timed('db_commit'):
+                    db.session.commit()
+            except SQLAlchemyError:
+                app.logger.exception("Failed to store %d batch items", len(uncommitted))
+                db.session.rollback()
+                failed = [{'index': result['index'], 'error': 'Failed to store the summary'} for result in uncommitted]
+                uncommitted.clear()
+                return failed
+            flushed = list(uncommitted)
+            uncommitted.clear()
+            return flushed
+
+        while True:
+            # Read only as far ahead as the window allows, so the body is never buffered whole
+            while not exhausted and len(inflight) < window:
+                index, line = next(lines, (None, None))
+                if index is None:
+                    exhausted = True
+                    break
+                if line is not None and not line.strip():
+                    continue
+                try:
+                    with timed('parse_request'):
+                        item = parse_batch_item(line, max_bytes)
+                except ValueError as e:
+                    batch_items['invalid'].inc()
+                    yield json.dumps({'index': index, 'error': str(e)}) + '\n'
+                    continue
+                model = route(item['text'], item.get('latency_budget_ms'))
+                content_hash = cache_key(item['text'], item['minsize'], item['maxsize'], model.version)
+                inflight[batch_executor.submit(summarize_batch_item, model, content_hash, item)] = (
+                    index, item, model.name, content_hash)
+            if not inflight:
+                break
+
+            done = [future for future in inflight if future.done()]
+            if not done:
+                # Nothing finished yet: commit the pending rows once they waited long enough for company
+                if uncommitted and time.monotonic() >= commit_at:
+                    for result in flush():
+                        yield json.dumps(result) + '\n'
+                timeout = max(0.0, commit_at - time.monotonic()) if uncommitted else None
+                done, _ = wait(inflight, timeout=timeout, return_when=FIRST_COMPLETED)
+            if done and not uncommitted:
+                commit_at = time.monotonic() + commit_interval
+            for future in done:
+                index, item, model_name, content_hash = inflight.pop(future)
+                summary = SummaryModel(id=str(uuid4()), original_text=item['text'], minsize=item['minsize'],
+                                       maxsize=item['maxsize'], is_file=False, content_hash=content_hash,
+                                       model=model_name)
+                result = {'index': index, 'id': summary.id, 'model': model_name}
+                try:
+                    summary.summarized = future.result()
+                    summary.status = STATUS_DONE
+                    result['summarized'] = summary.summarized
+                except Exception as e:
+                    app.logger.exception("Summarization failed for batch item %d", index)
+                    summary.status = STATUS_FAILED
+                    result['error'] = str(e)
+                batch_items[summary.status].inc()
+                result['status'] = summary.status
+                db.session.add(summary)
+                uncommitted.append(result)
+            if len(uncommitted) >= commit_size:
+                for result in flush():
+                    yield json.dumps(result) + '\n'
+
+        for result in flush():
+            yield json.dumps(result) + '\n'
+
+    return Response(stream_with_context(results()), mimetype='application/x-ndjson')
+
+@app.route('/process_text_stream', methods=['POST'])
+@swag_from({
+    'tags': ['Summary'],
+    'description': 'Summarize the provided text and stream the summary as Server-Sent Events while it is generated. '
+                   'Events: "token" ({"text"} fragments to append), then "done" ({"id", "status", "model", "summarized", '
+                   '"ttft_ms", "total_ms"}) once the summary is stored, or "error" ({"error"})',
+    'produces': ['text/event-stream'],
+    'parameters': [
+        {
+            'name': 'body',
+            'in': 'body',
+            'required': True,
+            'schema': {
+                'type': 'object',
+                'properties': {
+                    'text': {'type': 'string'},
+                    'minsize': {'type': 'integer'},
+                    'maxsize': {'type': 'integer'},
+                    'mode': {
+                        'type': 'string',
+                        'enum': list(STREAM_MODES),
+                        'default': 'greedy',
+                        'description': 'Decoding strategy; beam search cannot stream'
+                    },
+                    'latency_budget_ms': {
+                        'type': 'number',
+                        'description': 'Time the client is willing to wait, to pick a faster model if needed'
+                    }
+                }
+            }
+        }
+    ],
+    'responses': {
+        200: {'description': 'Event stream'},
+        400: {'description': 'Invalid input'},
+        503: {'description': 'Too many streams in progress, retry later'}
+    }
+})
+def process_text_stream():
+    started = time.perf_counter()
+    with timed('parse_request'):
+        data = request.json
+        is_valid, error_message = validate_input(data, ['text','minsize','maxsize'])
+    if not is_valid:
+        return jsonify({'error': error_message}), 400
+    mode = data.get('mode', 'greedy')
+    if mode not in STREAM_MODES:
+        return jsonify({'error': f"mode must be one of {', '.join(STREAM_MODES)}"}), 400
+    error_message = (validate_text(data['text']) or validate_sizes(data['minsize'], data['maxsize'])
+                     or validate_latency_budget(data.get('latency_budget_ms')))
+    if error_message:
+        return jsonify({'error': error_message}), 400
+
+    model = route(data['text'], data.get('latency_budget_ms'))
+    summary = SummaryModel(
+        original_text=data['text'],
+        minsize=data['minsize'],
+        maxsize=data['maxsize'],
         is_file=False,
-        summarized=summarized
+        status=STATUS_RUNNING,
+        model=model.name
     )
-    
-    db.session.add(summary)
-    db.session.commit()
+    # A finished beam-search summary is better than a streamed one and arrives at once
+    beam_key = cache_key(summary.original_text, summary.minsize, summary.maxsize, model.version)
+    cached = summary_cache.get(beam_key)
+    if cached is not None:
+        summary.content_hash = beam_key
+    elif mode == 'greedy':
+        # Greedy decoding is deterministic, so its result is cached under its own key; samples are not
+        summary.content_hash = cache_key(summary.original_text, summary.minsize, summary.maxsize,
+                                         f"{model.version}:{mode}")
+        cached = summary_cache.get(summary.content_hash)
+    if cached is None and not stream_slots.acquire(blocking=False):
+        return jsonify({'error': 'Too many streams in progress'}), 503, {'Retry-After': '5'}
+
+    def events():
+        fragments = []
+        ttft = None
+        try:
+            if cached is not None:
+                fragments.append(cached)
+                ttft = time.perf_counter() - started
+                yield sse('token', {'text': cached})
+            else:
+                stream = model.stream(summary.original_text, mode,
+                                      **generation_lengths(summary.minsize, summary.maxsize))
+                try:
+                    for fragment in stream:
+                        if ttft is None:
+                            ttft = time.perf_counter() - started
+                        fragments.append(fragment)
+                        yield sse('token', {'text': fragment})
+                finally:
+                    stream.close()
+            summary.summarized = ''.join(fragments)
+            summary.status = STATUS_DONE
+        except Exception as e:
+            app.logger.exception("Streaming summarization failed")
+            summary.status = STATUS_FAILED
+            yield sse('error', {'error': str(e)})
+        finally:
+            if cached is None:
+                stream_slots.release()
+
+        if ttft is not None:
+            stream_ttft.observe(ttft)
+        if summary.status == STATUS_DONE and cached is None and summary.content_hash:
+            summary_cache.put(summary.content_hash, summary.summarized)
+        db.session.add(summary)
+        with timed('db_commit'):
+            db.session.commit()
+        total = time.perf_counter() - started
+        stream_latency.observe(total)
+        if summary.status == STATUS_DONE:
+            yield sse('done', {
+                'id': summary.id,
+                'status': summary.status,
+                'model': summary.model,
+                'summarized': summary.summarized,
+                'ttft_ms': round(ttft * 1000, 3) if ttft is not None else None,
+                'total_ms': round(total * 1000, 3)
+            })
 
-    return jsonify({'id': summary.id})
+    # Disable proxy buffering so every event reaches the client as soon as it is generated
+    return Response(stream_with_context(events()), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
 
 @app.route('/rate_summary/<string:id>', methods=['PUT'])
 @swag_from({
@@ -239,13 +1370,26 @@ def rate_summary(id):
     if not summary:
         return jsonify({'error': 'Summary not found'}), 404
 
+    if summary.status != STATUS_DONE:
+        return jsonify({'error': 'Summary is not ready yet'}), 400
+
     if summary.score is not None:
         return jsonify({'error': 'Score has already been assigned and cannot be reassigned'}), 400
 
-    summary.score = score
-    db.session.commit()
+    input_length = summary.input_length if summary.input_length is not None else len(summary.original_text or '')
+    # Only scores a row that is still unrated, so two concurrent ratings can't both be counted
+    rated = db.session.execute(
+        db.update(SummaryModel).where(SummaryModel.id == id, SummaryModel.score.is_(None))
+        .values(score=score, input_length=input_length),
+        execution_options={'synchronize_session': False}).rowcount
+    if not rated:
+        db.session.rollback()
+        return jsonify({'error': 'Score has already been assigned and cannot be reassigned'}), 400
+    record_rating(summary, input_length, score)
+    with timed('db_commit'):
+        db.session.commit()
 
-    return jsonify({'id': summary.id, 'score': summary.score})
+    return jsonify({'id': id, 'score': score})
 
 @app.route('/get_summary/<string:id>', methods=['GET'])
 @swag_from({
@@ -258,6 +1402,13 @@ def rate_summary(id):
             'type': 'string',
             'required': True,
             'description': 'ID of the summary to retrieve'
+        },
+        {
+            'name': PROFILE_HEADER,
+            'in': 'header',
+            'type': 'string',
+            'required': False,
+            'description': 'Set to 1 to include the inference stage breakdown of a summary queued with the same header'
         }
     ],
     'responses': {
@@ -286,6 +1437,16 @@ def rate_summary(id):
                         'type': 'string',
                         'example': 'This is the summarized text...'
                     },
+                    'status': {
+                        'type': 'string',
+                        'enum': [STATUS_QUEUED, STATUS_RUNNING, STATUS_DONE, STATUS_FAILED],
+                        'example': 'done'
+                    },
+                    'model': {
+                        'type': 'string',
+                        'description': 'Registry model that produced the summary, or the extractive summarizer version',
+                        'example': 'default'
+                    },
                     'score': {
                         'type': 'float',
                         'example': 8.5
@@ -293,6 +1454,11 @@ def rate_summary(id):
                     'created_date': {
                         'type': 'string',
                         'example': '2024-08-04T12:34:56'
+                    },
+                    'profile': {
+                        'type': 'object',
+                        'description': 'Milliseconds per stage, only with the X-Profile header',
+                        'example': {'queue_wait': 2.1, 'tokenize': 0.8, 'encode': 41.5, 'beam_search': 610.2, 'decode': 0.3}
                     }
                 }
             }
@@ -308,17 +1474,355 @@ def get_summary(id):
     if not summary:
         return jsonify({'error': 'Summary not found'}), 404
 
-    return jsonify({
+    result = {
         'id': summary.id,
         'original_text': summary.original_text,
         'is_file': summary.is_file,
         'file_path': summary.file_path,
         'summarized': summary.summarized,
+        'status': summary.status,
+        'model': summary.model,
         'score': summary.score,
         'minsize': summary.minsize,
         'maxsize': summary.maxsize,
         'created_date': summary.created_date.isoformat()
+    }
+    if request.headers.get(PROFILE_HEADER) and summary.profile:
+        result['profile'] = json.loads(summary.profile)
+    return jsonify(result)
+
+# Columns of the history listing; the text bodies are never read
+LIST_COLUMNS = (SummaryModel.id, SummaryModel.preview, SummaryModel.is_file, SummaryModel.file_path,
+                SummaryModel.status, SummaryModel.model, SummaryModel.score, SummaryModel.minsize, SummaryModel.maxsize,
+                SummaryModel.created_date)
+MAX_PAGE_SIZE = 200
+
+@app.route('/summaries', methods=['GET'])
+@swag_from({
+    'tags': ['Summary'],
+    'description': 'List summaries, newest first, one page at a time',
+    'parameters': [
+        {
+            'name': 'limit',
+            'in': 'query',
+            'type': 'integer',
+            'required': False,
+            'description': f'Page size, at most {MAX_PAGE_SIZE} (default 50)'
+        },
+        {
+            'name': 'cursor',
+            'in': 'query',
+            'type': 'string',
+            'required': False,
+            'description': 'next_cursor of the previous page'
+        },
+        {
+            'name': 'status',
+            'in': 'query',
+            'type': 'string',
+            'required': False,
+            'enum': [STATUS_QUEUED, STATUS_RUNNING, STATUS_DONE, STATUS_FAILED],
+            'description': 'Only list summaries with this status'
+        }
+    ],
+    'responses': {
+        200: {
+            'description': 'One page of summaries without their text bodies',
+            'schema': {
+                'type': 'object',
+                'properties': {
+                    'summaries': {
+                        'type': 'array',
+                        'items': {
+                            'type': 'object',
+                            'properties': {
+                                'id': {'type': 'string'},
+                                'preview': {'type': 'string'},
+                                'is_file': {'type': 'boolean'},
+                                'file_path': {'type': 'string'},
+                                'status': {'type': 'string'},
+                                'score': {'type': 'number'},
+                                'minsize': {'type': 'integer'},
+                                'maxsize': {'type': 'integer'},
+                                'created_date': {'type': 'string'}
+                            }
+                        }
+                    },
+                    'next_cursor': {
+                        'type': 'string',
+                        'description': 'Pass as cursor to get the next page, null on the last page'
+                    }
+                }
+            }
+        },
+        400: {
+            'description': 'Invalid limit, cursor or status',
+        }
+    }
+})
+def list_summaries():
+    limit = request.args.get('limit', 50, type=int)
+    if limit is None or not (1 <= limit <= MAX_PAGE_SIZE):
+        return jsonify({'error': f'limit must be between 1 and {MAX_PAGE_SIZE}'}), 400
+
+    query = db.session.query(*LIST_COLUMNS)
+    status = request.args.get('status')
+    if status is not None:
+        if status not in (STATUS_QUEUED, STATUS_RUNNING, STATUS_DONE, STATUS_FAILED):
+            return jsonify({'error': f'Unknown status {status}'}), 400
+        query = query.filter(SummaryModel.status == status)
+    cursor = request.args.get('cursor')
+    if cursor:
+        position = decode_cursor(cursor)
+        if position is None:
+            return jsonify({'error': 'Invalid cursor'}), 400
+        # Keyset pagination: seek past the last row instead of counting an OFFSET
+        query = query.filter(db.tuple_(SummaryModel.created_date, SummaryModel.id) < position)
+
+    # One extra row tells whether there is a next page
+    rows = query.order_by(SummaryModel.created_date.desc(), SummaryModel.id.desc()).limit(limit + 1).all()
+    next_cursor = encode_cursor(rows[limit - 1].created_date, rows[limit - 1].id) if len(rows) > limit else None
+    return jsonify({
+        'summaries': [{**row._asdict(), 'created_date': row.created_date.isoformat()} for row in rows[:limit]],
+        'next_cursor': next_cursor
     })
 
+MAX_STATS_DAYS = 3660
+
+# Helper function to add rollup rows to a group of the /stats response
+def add_ratings(group, score_bucket, count, total):
+    group['count'] += count
+    group['total'] += total
+    group['histogram'][score_bucket] += count
+
+def rating_group(**fields):
+    return {**fields, 'count': 0, 'total': 0.0, 'histogram': [0] * SCORE_BUCKETS}
+
+def finish_group(group):
+    total = group.pop('total')
+    group['mean'] = total / group['count'] if group['count'] else None
+    return group
+
+@app.route('/stats', methods=['GET'])
+@swag_from({
+    'tags': ['Summary'],
+    'description': 'Rating statistics of the summaries created in the last days, overall and by day, model and '
+                   'input length. Served from rollups updated with every rating, so the cost does not depend on the '
+                   'number of summaries',
+    'parameters': [
+        {
+            'name': 'days',
+            'in': 'query',
+            'type': 'integer',
+            'required': False,
+            'description': f'Days of summaries to include, today (UTC) included, 1 to {MAX_STATS_DAYS} (default 30)'
+        },
+        {
+            'name': 'model',
+            'in': 'query',
+            'type': 'string',
+            'required': False,
+            'description': 'Only the summaries of this model'
+        }
+    ],
+    'responses': {
+        200: {
+            'description': 'Rating statistics. Every group has a count, a mean (null without ratings) and a '
+                           f'histogram of {SCORE_BUCKETS} counts: scores in [0, 1), [1, 2), ... [9, 10]',
+            'schema': {
+                'type': 'object',
+                'properties': {
+                    'since': {'type': 'string', 'example': '2024-08-01'},
+                    'count': {'type': 'integer', 'example': 120},
+                    'mean': {'type': 'number', 'example': 7.4},
+                    'histogram': {'type': 'array', 'items': {'type': 'integer'}},
+                    'by_day': {'type': 'array', 'items': {'type': 'object'},
+                               'description': 'Groups with a "day", by creation day of the summaries'},
+                    'by_model': {'type': 'array', 'items': {'type': 'object'},
+                                 'description': 'Groups with a "model", null for summaries older than models'},
+                    'by_length': {'type': 'array', 'items': {'type': 'object'},
+                                  'description': 'Groups with the "min_chars" and "max_chars" (null: unbounded) of '
+                                                 'the original texts; min_chars is null for unknown lengths'}
+                }
+            }
+        },
+        400: {
+            'description': 'Invalid days',
+        }
+    }
+})
+def rating_stats():
+    days = request.args.get('days', 30, type=int)
+    if days is None or not (1 <= days <= MAX_STATS_DAYS):
+        return jsonify({'error': f'days must be between 1 and {MAX_STATS_DAYS}'}), 400
+    since = (datetime.utcnow() - timedelta(days=days - 1)).strftime('%Y-%m-%d')
+
+    # A range of the rollup primary key: at most days x models x length buckets x score buckets rows
+    query = db.select(RatingRollup).where(RatingRollup.day >= since)
+    model = request.args.get('model')
+    if model is not None:
+        query = query.where(RatingRollup.model == model)
+    overall = rating_group(since=since)
+    by_day, by_model, by_length = {}, {}, {}
+    for rollup in db.session.execute(query).scalars():
+        bounds = length_bounds(rollup.length_bucket)
+        for group in (overall,
+                      by_day.setdefault(rollup.day, rating_group(day=rollup.day)),
+                      by_model.setdefault(rollup.model, rating_group(model=rollup.model or None)),
+                      by_length.setdefault(bounds, rating_group(min_chars=bounds[0], max_chars=bounds[1]))):
+            add_ratings(group, rollup.score_bucket, rollup.count, rollup.total)
+
+    result = finish_group(overall)
+    result['by_day'] = [finish_group(by_day[day]) for day in sorted(by_day)]
+    result['by_model'] = [finish_group(group) for _, group in sorted(by_model.items())]
+    result['by_length'] = [finish_group(by_length[bounds]) for bounds in
+                           sorted(by_length, key=lambda bounds: -1 if bounds[0] is None else bounds[0])]
+    return jsonify(result)
+
+@app.route('/healthz', methods=['GET'])
+@swag_from({
+    'tags': ['Monitoring'],
+    'description': 'Liveness probe: the process is up and serving requests',
+    'responses': {
+        200: {'description': 'Alive'}
+    }
+})
+def healthz():
+    return jsonify({'status': 'alive'})
+
+@app.route('/readyz', methods=['GET'])
+@swag_from({
+    'tags': ['Monitoring'],
+    'description': 'Readiness probe: a model is loaded and warmed up. The top-level fields describe the '
+                   'preferred model',
+    'responses': {
+        200: {
+            'description': 'Ready to summarize',
+            'schema': {
+                'type': 'object',
+                'properties': {
+                    'state': {'type': 'string', 'example': 'ready'},
+                    'version': {'type': 'string'},
+                    'load_seconds': {'type': 'number'},
+                    'warmup_seconds': {'type': 'number'},
+                    'cold_start_seconds': {'type': 'number'},
+                    'models': {'type': 'object', 'description': 'State of every registry model, by name'}
+                }
+            }
+        },
+        503: {'description': 'No model is loaded yet (state "loading") or they all failed to load'}
+    }
+})
+def readyz():
+    status = model_registry.default.runtime.status()
+    status['models'] = {model.name: model.runtime.state for model in model_registry.entries.values()}
+    ready = STATE_READY in status['models'].values()
+    return jsonify(status), 200 if ready else 503
+
+@app.route('/models', methods=['GET'])
+@swag_from({
+    'tags': ['Monitoring'],
+    'description': 'Registry models in order of preference, with their routing settings, measured latency '
+                   'and memory use',
+    'responses': {
+        200: {
+            'description': 'Model registry',
+            'schema': {
+                'type': 'object',
+                'properties': {
+                    'models': {
+                        'type': 'array',
+                        'items': {
+                            'type': 'object',
+                            'properties': {
+                                'name': {'type': 'string'},
+                                'state': {'type': 'string'},
+                                'version': {'type': 'string'},
+                                'backend': {'type': 'string'},
+                                'max_input_tokens': {'type': 'integer'},
+                                'workers': {'type': 'integer'},
+                                'latency_ms': {'type': 'number'},
+                                'memory_bytes': {'type': 'integer'},
+                                'swapping': {'type': 'boolean'},
+                                'backlog': {'type': 'integer'}
+                            }
+                        }
+                    },
+                    'memory_bytes': {'type': 'integer'},
+                    'memory_budget': {'type': 'integer'}
+                }
+            }
+        }
+    }
+})
+def list_models():
+    status = model_registry.status()
+    for model in status['models']:
+        model['backlog'] = model_backlog(model['name'])
+    return jsonify(status)
+
+@app.route('/models/reload', methods=['POST'])
+@swag_from({
+    'tags': ['Monitoring'],
+    'description': 'Read the MODEL_REGISTRY config again and swap the models whose entry or files changed, without '
+                   'interrupting requests: replacements load in the background and take over once warmed up. '
+                   'Only affects the worker process handling the request; every process also checks for changes '
+                   'on its own every MODEL_POLL_SECONDS',
+    'responses': {
+        200: {
+            'description': 'Changes applied: {"added", "swapped", "removed": [names], "rejected": {name: reason}}'
+        },
+        400: {'description': 'Invalid config, or no MODEL_REGISTRY config'}
+    }
+})
+def reload_models():
+    if not app.config['MODEL_REGISTRY']:
+        return jsonify({'error': 'No MODEL_REGISTRY config to reload'}), 400
+    try:
+        result = model_registry.reload()
+    except (OSError, ValueError) as e:
+        return jsonify({'error': str(e)}), 400
+    return jsonify(result)
+
+@app.route('/cache/stats', methods=['GET'])
+@swag_from({
+    'tags': ['Monitoring'],
+    'description': 'Hit, miss and eviction counters of the summary cache',
+    'responses': {
+        200: {
+            'description': 'Cache counters',
+            'schema': {
+                'type': 'object',
+                'properties': {
+                    'memory_hits': {'type': 'integer'},
+                    'persistent_hits': {'type': 'integer'},
+                    'misses': {'type': 'integer'},
+                    'evictions': {'type': 'integer'},
+                    'coalesced': {'type': 'integer'},
+                    'computed': {'type': 'integer'},
+                    'entries': {'type': 'integer'},
+                    'bytes': {'type': 'integer'},
+                    'max_bytes': {'type': 'integer'},
+                    'in_flight': {'type': 'integer'}
+                }
+            }
+        }
+    }
+})
+def cache_stats():
+    return jsonify(summary_cache.stats())
+
+@app.route('/metrics', methods=['GET'])
+@swag_from({
+    'tags': ['Monitoring'],
+    'description': 'Stage latency histograms, token counters, queue depth and in-flight gauges in the Prometheus text format',
+    'produces': ['text/plain'],
+    'responses': {
+        200: {'description': 'Metrics of this worker process'}
+    }
+})
+def metrics():
+    return Response(REGISTRY.render(), mimetype='text/plain; version=0.0.4')
+
 if __name__ == '__main__':
     app.run(host='0.0.0.0', port=5000, debug=False)
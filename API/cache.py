@@ -0,0 +1,131 @@
+import hashlib
+import threading
+import unicodedata
+from concurrent.futures import Future
+
+from inference import LRUCache
+
+
+def normalize_text(text):
+    """
+    Canonical form of a text used for cache keys: NFC, trimmed lines with
+    collapsed inner whitespace, and no blank lines.
+    """
+    text = unicodedata.normalize('NFC', text)
+    lines = (' '.join(line.split()) for line in text.splitlines())
+    return '\n'.join(line for line in lines if line)
+
+
+def cache_key(original_text, minsize, maxsize, model_version):
+    """
+    Content address of a summary request.
+
+    :return: Hex SHA-256 of the normalized text, the size limits and the model version.
+    """
+    digest = hashlib.sha256()
+    digest.update(f'{model_version}\0{minsize}\0{maxsize}\0'.encode('utf-8'))
+    digest.update(normalize_text(original_text).encode('utf-8'))
+    return digest.hexdigest()
+
+
+class SummaryCache:
+    """
+    Two-tier summary cache with request coalescing.
+
+    The first tier is an in-process LRU bounded by ``max_bytes``; the second is
+    an optional persistent lookup (e.g. an indexed hash column in the database)
+    whose hits are promoted to memory. Concurrent get_or_compute() calls for the
+    same key share a single computation.
+
+    :param max_bytes: Byte budget of the in-process tier.
+    :param lookup: Callable ``lookup(key) -> summary or None`` for the persistent tier.
+    """
+
+    def __init__(self, max_bytes, lookup=None):
+        self.memory = LRUCache(max_bytes)
+        self.lookup = lookup
+        self.memory_hits = 0
+        self.persistent_hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.computed = 0
+        self._inflight = {}
+        self._lock = threading.Lock()
+
+    def get(self, key, count_miss=True):
+        value = self.memory.get(key)
+        if value is not None:
+            with self._lock:
+                self.memory_hits += 1
+            return value
+        if self.lookup is not None:
+            value = self.lookup(key)
+            if value is not None:
+                with self._lock:
+                    self.persistent_hits += 1
+                self.memory.put(key, value)
+                return value
+        if count_miss:
+            with self._lock:
+                self.misses += 1
+        return None
+
+    def put(self, key, value):
+        self.memory.put(key, value)
+
+    def get_or_compute(self, key, compute):
+        """
+        Return the cached value for key, computing it at most once across threads.
+
+        :param key: Cache key, see cache_key().
+        :param compute: Zero-argument callable producing the value on a miss.
+        """
+        # The miss was already counted when the request was first looked up
+        value = self.get(key, count_miss=False)
+        if value is not None:
+            return value
+
+        with self._lock:
+            future = self._inflight.get(key)
+            owner = future is None
+            if owner:
+                future = Future()
+                self._inflight[key] = future
+            else:
+                self.coalesced += 1
+        if not owner:
+            return future.result()
+
+        try:
+            # An identical computation may have finished between the lookup and taking ownership
+            value = self.memory.get(key) if key in self.memory else None
+            if value is None:
+                value = compute()
+                with self._lock:
+                    self.computed += 1
+                self.memory.put(key, value)
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        else:
+            future.set_result(value)
+            return value
+        finally:
+            with self._lock:
+                self._inflight.pop(key, None)
+
+    def stats(self):
+        memory = self.memory.stats()
+        with self._lock:
+            return {
+                'memory_hits': self.memory_hits,
+                'persistent_hits': self.persistent_hits,
+                'misses': self.misses,
+                'evictions': memory['evictions'],
+                'coalesced': self.coalesced,
+                'computed': self.computed,
+                'entries': memory['entries'],
+                'bytes': memory['bytes'],
+                'max_bytes': memory['max_bytes'],
+                'in_flight': len(self._inflight),
+            }
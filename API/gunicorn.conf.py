@@ -0,0 +1,43 @@
+# Pre-forked production server: gunicorn -c gunicorn.conf.py app:app
+#
+# The app (and the model) is loaded once in the master process and the workers
+# are forked from it, so they share the weight pages copy-on-write instead of
+# each holding its own copy.
+import gc
+import os
+
+# Load the model synchronously while the master imports the app, before forking
+os.environ.setdefault('PRELOAD_MODEL', 'sync')
+
+bind = os.environ.get('BIND', '0.0.0.0:5000')
+workers = int(os.environ.get('WEB_WORKERS', 2))
+worker_class = 'gthread'
+threads = int(os.environ.get('WEB_THREADS', 8))
+preload_app = True
+timeout = int(os.environ.get('WEB_TIMEOUT', 120))
+accesslog = '-'
+
+
+def torch_threads_per_worker():
+    """Intra-op threads per worker so that all workers together use each core once."""
+    configured = os.environ.get('TORCH_THREADS')
+    if configured:
+        return int(configured)
+    return max(1, (os.cpu_count() or 1) // workers)
+
+
+def pre_fork(server, worker):
+    # Move everything allocated so far out of the GC's reach, so collections in the
+    # workers don't write to (and un-share) the pages inherited from the master
+    gc.freeze()
+
+
+def post_fork(server, worker):
+    import torch
+    import app as api
+
+    torch.set_num_threads(torch_threads_per_worker())
+    # SQLite connections must not be shared across processes
+    with api.app.app_context():
+        api.db.engine.dispose(close=False)
+    server.log.info("Worker %s using %d torch threads", worker.pid, torch.get_num_threads())
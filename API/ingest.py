@@ -0,0 +1,215 @@
+import hashlib
+import multiprocessing
+import os
+import re
+import shutil
+import tempfile
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from werkzeug.exceptions import RequestEntityTooLarge
+
+# Bump when extraction changes, so cached texts of earlier versions are re-extracted
+EXTRACTOR_VERSION = 1
+# Uploads up to this size stay in memory while they are received
+SPOOL_MAX_MEMORY = 1024 * 1024
+# PDFs with more pages are extracted in parallel by the PDF pool
+PARALLEL_PDF_PAGES = 16
+
+# Stored uploads and their extracted texts: <hash><ext> and <hash>.v<extractor version>.txt
+STORED_FILE = re.compile(r'^(?P<digest>[0-9a-f]{64})(?:\.v(?P<version>\d+)\.txt|\.[^.]+)$')
+
+
+class UnreadableFile(ValueError):
+    """The upload is not a valid PDF or text file, or contains no text."""
+
+
+class HashingSpooledFile(tempfile.SpooledTemporaryFile):
+    """
+    Spooled temporary file that hashes what is written to it and enforces a size limit.
+
+    Used as the upload stream of the request, so the content hash is known as
+    soon as the body is parsed, without reading the file a second time.
+
+    :param max_bytes: Largest accepted upload; larger ones abort the request with 413.
+    """
+
+    def __init__(self, max_bytes=None):
+        super().__init__(max_size=SPOOL_MAX_MEMORY)
+        self.max_bytes = max_bytes
+        self.size = 0
+        self._digest = hashlib.sha256()
+
+    def write(self, data):
+        self.size += len(data)
+        if self.max_bytes is not None and self.size > self.max_bytes:
+            raise RequestEntityTooLarge(f'Files are limited to {self.max_bytes // (1024 * 1024)} MB')
+        self._digest.update(data)
+        return super().write(data)
+
+    def hexdigest(self):
+        return self._digest.hexdigest()
+
+
+def _extract_pdf_pages(source, start, stop):
+    # Runs in the PDF pool: each worker opens its own reader
+    from pypdf import PdfReader
+
+    reader = PdfReader(source)
+    return [reader.pages[i].extract_text() or '' for i in range(start, stop)]
+
+
+class UploadStore:
+    """
+    Content-addressed upload storage with an extracted-text cache.
+
+    Files are stored as ``<root>/<hash[:2]>/<hash><ext>``, so identical uploads
+    share one file whatever their names, and the text extracted from each is
+    kept next to it and reused on re-upload.
+
+    :param root: Upload directory.
+    :param pdf_workers: Processes extracting the pages of large PDFs; 0 extracts in the request thread.
+    """
+
+    def __init__(self, root, pdf_workers=2):
+        self.root = root
+        self.pdf_workers = pdf_workers
+        self._pool = None
+        self._pool_pid = None
+        self._lock = threading.Lock()
+
+    def path_for(self, digest, extension):
+        return os.path.join(self.root, digest[:2], digest + extension)
+
+    def _text_path(self, path):
+        return f'{os.path.splitext(path)[0]}.v{EXTRACTOR_VERSION}.txt'
+
+    def save(self, upload, extension):
+        """
+        Stores an upload under its content hash.
+
+        :param upload: A HashingSpooledFile holding the uploaded bytes.
+        :param extension: File extension including the dot, e.g. '.pdf'.
+        :return: (path, created); created is False when an identical file was already stored.
+        """
+        path = self.path_for(upload.hexdigest(), extension)
+        if os.path.exists(path):
+            # A recent mtime keeps the file out of remove_orphans() until the new summary row references it
+            os.utime(path)
+            return path, False
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        upload.seek(0)
+        # Write next to the target and rename, so a concurrent identical upload never sees a partial file
+        with tempfile.NamedTemporaryFile(dir=os.path.dirname(path), delete=False) as tmp:
+            shutil.copyfileobj(upload, tmp)
+        os.replace(tmp.name, path)
+        return path, True
+
+    def cached_text(self, path):
+        """The text previously extracted from a stored file, or None."""
+        try:
+            with open(self._text_path(path), encoding='utf-8') as file:
+                return file.read()
+        except FileNotFoundError:
+            return None
+
+    def extract_text(self, path):
+        """
+        Extracts the text of a stored PDF or text file and caches it next to the file.
+
+        :raises UnreadableFile: If the file can't be parsed or has no text.
+        """
+        if path.lower().endswith('.pdf'):
+            text = self._extract_pdf(path)
+        else:
+            with open(path, 'rb') as file:
+                text = file.read().decode('utf-8-sig', errors='replace')
+        if not text.strip():
+            raise UnreadableFile('No text could be extracted from the file')
+
+        text_path = self._text_path(path)
+        with tempfile.NamedTemporaryFile('w', encoding='utf-8', dir=os.path.dirname(path), delete=False) as tmp:
+            tmp.write(text)
+        os.replace(tmp.name, text_path)
+        return text
+
+    def remove_orphans(self, referenced, min_age=3600):
+        """
+        Deletes the stored files no summary refers to anymore, with their extracted texts,
+        the texts extracted by earlier extractor versions and leftovers of interrupted writes.
+
+        Files modified less than min_age seconds ago are kept: their summary row may
+        not be committed yet.
+
+        :param referenced: Absolute paths of the stored files still in use.
+        :return: (files removed, bytes freed).
+        """
+        if not os.path.isdir(self.root):
+            return 0, 0
+        cutoff = time.time() - min_age
+        removed = freed = 0
+        for directory in os.scandir(self.root):
+            if not directory.is_dir():
+                continue
+            files, kept = [], set()
+            for entry in os.scandir(directory.path):
+                if not entry.is_file():
+                    continue
+                stat = entry.stat()
+                match = STORED_FILE.match(entry.name)
+                if match and match.group('version') is None and (
+                        stat.st_mtime > cutoff or os.path.abspath(entry.path) in referenced):
+                    kept.add(match.group('digest'))
+                else:
+                    files.append((entry, stat, match))
+            for entry, stat, match in files:
+                if stat.st_mtime > cutoff:
+                    continue
+                if match is None and not entry.name.startswith('tmp'):
+                    continue  # not ours
+                if match is not None and match.group('version') is not None and \
+                        int(match.group('version')) == EXTRACTOR_VERSION and match.group('digest') in kept:
+                    continue
+                try:
+                    os.remove(entry.path)
+                except FileNotFoundError:
+                    continue
+                removed += 1
+                freed += stat.st_size
+        return removed, freed
+
+    def _extract_pdf(self, path):
+        from pypdf import PdfReader
+        from pypdf.errors import PyPdfError
+
+        try:
+            page_count = len(PdfReader(path).pages)
+            pool = self._get_pool() if page_count > PARALLEL_PDF_PAGES else None
+            if pool is None:
+                pages = _extract_pdf_pages(path, 0, page_count)
+            else:
+                # Contiguous page ranges, one per worker, reassembled in order
+                step = -(-page_count // self.pdf_workers)
+                ranges = [(start, min(start + step, page_count)) for start in range(0, page_count, step)]
+                futures = [pool.submit(_extract_pdf_pages, path, start, stop) for start, stop in ranges]
+                pages = [page for future in futures for page in future.result()]
+        except (PyPdfError, ValueError, OSError) as e:
+            raise UnreadableFile(f'Could not read the PDF: {e}')
+        return '\n\n'.join(page.strip() for page in pages if page.strip())
+
+    def _get_pool(self):
+        if self.pdf_workers <= 0:
+            return None
+        with self._lock:
+            # Pools don't survive a fork: every server worker process starts its own
+            if self._pool is None or self._pool_pid != os.getpid():
+                self._pool = ProcessPoolExecutor(self.pdf_workers, mp_context=multiprocessing.get_context('spawn'))
+                self._pool_pid = os.getpid()
+            return self._pool
+
+    def shutdown(self):
+        with self._lock:
+            if self._pool is not None and self._pool_pid == os.getpid():
+                self._pool.shutdown()
+            self._pool = None
@@ -0,0 +1,173 @@
+import logging
+import queue
+import threading
+
+logger = logging.getLogger(__name__)
+
+# Lifecycle of a summary job, stored in SummaryModel.status
+STATUS_QUEUED = 'queued'
+STATUS_RUNNING = 'running'
+STATUS_DONE = 'done'
+STATUS_FAILED = 'failed'
+
+
+class QueueFull(Exception):
+    """Raised when a job is submitted while the queue is at capacity."""
+
+
+# Queued by resize() to wake an idle worker so that it checks whether it is one too many
+_RETIRE = object()
+
+
+class JobQueue:
+    """
+    Bounded FIFO of job ids drained by a fixed pool of worker threads.
+
+    Workers are started lazily on the first submit so that the queue can be
+    created at import time and still be safe to use in forked processes.
+    resize() changes the size of the pool while jobs are running.
+
+    :param handler: Callable invoked with a job id by a worker thread.
+    :param workers: Number of worker threads.
+    :param maxsize: Maximum number of pending jobs before submit() rejects.
+    :param name: Prefix for the worker thread names.
+    """
+
+    def __init__(self, handler, workers=2, maxsize=64, name='summary-worker'):
+        self.handler = handler
+        self.workers = max(1, int(workers))
+        self.name = name
+        self._queue = queue.Queue(maxsize=maxsize)
+        self._threads = []
+        self._lock = threading.Lock()
+        self._running = 0
+
+    def _ensure_started(self):
+        with self._lock:
+            # Threads do not survive fork(), so drop the ones we don't own anymore
+            self._threads = [t for t in self._threads if t.is_alive()]
+            for i in range(len(self._threads), self.workers):
+                thread = threading.Thread(target=self._work, name=f'{self.name}-{i}', daemon=True)
+                thread.start()
+                self._threads.append(thread)
+
+    def _retire(self):
+        """Removes the calling worker from the pool if the pool is larger than self.workers."""
+        with self._lock:
+            if len(self._threads) <= self.workers:
+                return False
+            self._threads.remove(threading.current_thread())
+            return True
+
+    def _work(self):
+        while True:
+            if self._retire():
+                return
+            job_id = self._queue.get()
+            if job_id is None:
+                self._queue.task_done()
+                return
+            if job_id is _RETIRE:
+                self._queue.task_done()
+                continue
+            with self._lock:
+                self._running += 1
+            try:
+                self.handler(job_id)
+            except Exception:
+                logger.exception("Job %s failed", job_id)
+            finally:
+                with self._lock:
+                    self._running -= 1
+                self._queue.task_done()
+
+    def submit(self, job_id):
+        """
+        Enqueue a job without blocking.
+
+        :param job_id: Identifier passed to the handler.
+        :raises QueueFull: If the queue is at capacity.
+        """
+        self._ensure_started()
+        try:
+            self._queue.put_nowait(job_id)
+        except queue.Full:
+            raise QueueFull(f'Job queue is full ({self._queue.maxsize} pending jobs)')
+
+    def resize(self, workers):
+        """
+        Changes the number of worker threads.
+
+        New workers start at once if the pool is running. Surplus workers
+        leave once their current job is done, so jobs are never interrupted.
+
+        :param workers: The new number of worker threads.
+        """
+        with self._lock:
+            self.workers = max(1, int(workers))
+            surplus = len(self._threads) - self.workers
+        for _ in range(surplus):
+            try:
+                self._queue.put_nowait(_RETIRE)
+            except queue.Full:
+                # Every worker is busy, and checks once its job is done
+                break
+        if surplus < 0 and self._threads:
+            self._ensure_started()
+
+    def depth(self):
+        """Number of jobs waiting for a worker."""
+        return self._queue.qsize()
+
+    def in_flight(self):
+        """Number of jobs currently being processed."""
+        return self._running
+
+    def shutdown(self, wait=True):
+        """Stop all workers once the jobs already queued are processed."""
+        threads = list(self._threads)
+        for _ in threads:
+            self._queue.put(None)
+        if wait:
+            for thread in threads:
+                thread.join()
+        self._threads = []
+
+
+class PeriodicJob:
+    """
+    Runs a function every interval seconds in a daemon thread.
+
+    Like JobQueue's workers, the thread is started lazily by ensure_started(),
+    and again in a forked process, where it does not survive.
+
+    :param fn: Callable invoked without arguments; exceptions are logged.
+    :param interval: Seconds between the end of one run and the start of the next.
+    :param name: Name of the thread.
+    """
+
+    def __init__(self, fn, interval, name='periodic-job'):
+        self.fn = fn
+        self.interval = interval
+        self.name = name
+        self._thread = None
+        self._stop = threading.Event()
+        self._lock = threading.Lock()
+
+    def ensure_started(self):
+        if self._thread is not None and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name=self.name, daemon=True)
+                self._thread.start()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            try:
+                self.fn()
+            except Exception:
+                logger.exception("Periodic job %s failed", self.name)
+
+    def shutdown(self):
+        self._stop.set()
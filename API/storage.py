@@ -0,0 +1,136 @@
+import contextlib
+import os
+import time
+import zlib
+
+from sqlalchemy.types import Text, TypeDecorator
+
+try:
+    import fcntl
+except ImportError:  # Windows: maintenance runs are not serialized across processes
+    fcntl = None
+
+# Texts shorter than this are stored as they are: compressing them saves little and costs a decompression per read
+COMPRESS_MIN_BYTES = 256
+COMPRESSION_LEVEL = 6
+
+
+def compress_text(value):
+    """Stored form of a text: zlib-compressed UTF-8 bytes, or the text itself when it is short or incompressible."""
+    raw = value.encode('utf-8')
+    if len(raw) < COMPRESS_MIN_BYTES:
+        return value
+    packed = zlib.compress(raw, COMPRESSION_LEVEL)
+    return packed if len(packed) < len(raw) else value
+
+
+def decompress_text(value):
+    if isinstance(value, bytes):
+        return zlib.decompress(value).decode('utf-8')
+    return value
+
+
+class CompressedText(TypeDecorator):
+    """
+    Text column stored zlib-compressed.
+
+    SQLite keeps compressed values as BLOBs and short ones as TEXT, and they are
+    told apart by their type on read, so rows written before the column was
+    compressed stay readable as they are until they are rewritten.
+    """
+
+    impl = Text
+    cache_ok = True
+
+    def process_bind_param(self, value, dialect):
+        return None if value is None else compress_text(value)
+
+    def process_result_value(self, value, dialect):
+        return None if value is None else decompress_text(value)
+
+
+def database_bytes(path):
+    """
+    Size of an SQLite database file. Its write-ahead log is left out: it is
+    reused rather than shrunk after checkpoints, so it says little about growth.
+    """
+    return os.path.getsize(path) if os.path.exists(path) else 0
+
+
+def incremental_vacuum(engine, pages_per_step=256, pause=0.05):
+    """
+    Returns the free pages of an SQLite database to the file system a few at a time.
+
+    Each step holds the write lock only for pages_per_step pages, and pause
+    seconds separate the steps, so requests writing in between barely wait.
+    Only works on databases created with auto_vacuum=INCREMENTAL, or converted
+    by a full VACUUM (see full_vacuum()).
+
+    :return: Bytes released, or None if the database is not in incremental auto-vacuum mode.
+    """
+    connection = engine.raw_connection()
+    try:
+        sqlite = connection.driver_connection
+        if sqlite.execute('PRAGMA auto_vacuum').fetchone()[0] != 2:
+            return None
+        page_size = sqlite.execute('PRAGMA page_size').fetchone()[0]
+        freed = 0
+        free_pages = sqlite.execute('PRAGMA freelist_count').fetchone()[0]
+        while free_pages:
+            # executescript runs the pragma to completion; execute() frees a single page per step
+            sqlite.executescript(f'PRAGMA incremental_vacuum({pages_per_step})')
+            remaining = sqlite.execute('PRAGMA freelist_count').fetchone()[0]
+            if remaining >= free_pages:
+                break
+            freed += free_pages - remaining
+            free_pages = remaining
+            time.sleep(pause)
+        # Copy the freed pages back from the log so the file actually shrinks, without waiting for readers
+        sqlite.execute('PRAGMA wal_checkpoint(PASSIVE)')
+        return freed * page_size
+    finally:
+        connection.close()
+
+
+def full_vacuum(engine):
+    """
+    Rebuilds an SQLite database with incremental auto-vacuum enabled.
+
+    Blocks every other writer for as long as the copy takes: meant for a
+    maintenance window, once per database created before incremental vacuums.
+
+    :return: Bytes released.
+    """
+    path = engine.url.database
+    before = database_bytes(path)
+    connection = engine.raw_connection()
+    try:
+        sqlite = connection.driver_connection
+        sqlite.execute('PRAGMA auto_vacuum = INCREMENTAL')
+        sqlite.executescript('VACUUM')
+        sqlite.execute('PRAGMA wal_checkpoint(TRUNCATE)')
+    finally:
+        connection.close()
+    return before - database_bytes(path)
+
+
+@contextlib.contextmanager
+def exclusive_lock(path):
+    """
+    Inter-process lock on a file, taken without waiting.
+
+    Yields True if this process holds the lock, False if another one does.
+    """
+    if fcntl is None:
+        yield True
+        return
+    with open(path, 'a') as file:
+        try:
+            fcntl.flock(file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            yield False
+            return
+        try:
+            yield True
+        finally:
+            fcntl.flock(file, fcntl.LOCK_UN)
@@ -0,0 +1,55 @@
+import os
+import sys
+
+import pytest
+
+API_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+# The API modules and the shared inference package in ../Model, as app.py sees them
+sys.path.insert(0, os.path.join(API_DIR, '..', 'Model'))
+sys.path.insert(0, API_DIR)
+
+
+@pytest.fixture(scope='session')
+def api(tmp_path_factory):
+    """The app module, configured on a temporary database; no model is loaded."""
+    workdir = tmp_path_factory.mktemp('api')
+    # The app reads its settings when imported, and keeps uploads relative to the working directory
+    os.environ.update(INSTANCE_PATH=str(workdir / 'instance'), SUMMARIZER_MODEL_PATH=str(workdir / 'model'),
+                      PRELOAD_MODEL='0', COMPACTION_INTERVAL_MINUTES='0')
+    previous = os.getcwd()
+    os.chdir(workdir)
+    try:
+        import app as api
+        yield api
+    finally:
+        os.chdir(previous)
+
+
+@pytest.fixture
+def client(api):
+    """Test client on empty tables."""
+    with api.app.app_context():
+        with api.db.engine.begin() as connection:
+            for table in reversed(api.db.metadata.sorted_tables):
+                connection.execute(table.delete())
+        api.summary_cache.memory.clear()
+    yield api.app.test_client()
+    with api.app.app_context():
+        api.db.session.remove()
+
+
+@pytest.fixture
+def add_summary(api, client):
+    """Inserts a finished summary and returns its id."""
+
+    def add(text='An article about transformers.', summarized='A summary.', **fields):
+        with api.app.app_context():
+            summary = api.SummaryModel(minsize=fields.pop('minsize', 10), maxsize=fields.pop('maxsize', 50),
+                                       status=fields.pop('status', api.STATUS_DONE), **fields)
+            summary.original_text = text
+            summary.summarized = summarized
+            api.db.session.add(summary)
+            api.db.session.commit()
+            return summary.id
+
+    return add
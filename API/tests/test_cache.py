@@ -0,0 +1,142 @@
+import sys
+import threading
+import time
+
+import pytest
+
+from cache import SummaryCache, cache_key, normalize_text
+from inference.lru import LRUCache, default_sizeof
+
+
+def test_keys_ignore_whitespace_but_not_settings():
+    key = cache_key('A  text\n\n  with lines ', 30, 150, 'v1')
+    assert key == cache_key('A text\nwith lines', 30, 150, 'v1')
+    assert key != cache_key('A text\nwith lines', 30, 120, 'v1')
+    assert key != cache_key('A text\nwith lines', 30, 150, 'v2')
+    assert normalize_text('Café\r\n\n x  y') == 'Café\nx y'
+
+
+def test_lru_evicts_least_recently_used_within_bytes():
+    entry = default_sizeof('a', 'x' * 100)
+    cache = LRUCache(entry * 2)
+    cache.put('a', 'x' * 100)
+    cache.put('b', 'y' * 100)
+    cache.get('a')  # b is now the least recently used
+    cache.put('c', 'z' * 100)
+    assert 'a' in cache and 'c' in cache and 'b' not in cache
+    assert cache.stats()['bytes'] == entry * 2
+    assert cache.stats()['evictions'] == 1
+
+
+def test_lru_replacing_an_entry_updates_its_size():
+    cache = LRUCache(10_000)
+    cache.put('a', 'x' * 100)
+    cache.put('a', 'x' * 10)
+    assert cache.stats()['bytes'] == default_sizeof('a', 'x' * 10)
+    assert len(cache) == 1
+
+
+def test_lru_skips_entries_larger_than_the_budget():
+    cache = LRUCache(100)
+    cache.put('small', 'x')
+    cache.put('large', 'x' * 1000)
+    assert 'large' not in cache and 'small' in cache
+
+
+def test_persistent_hits_are_promoted_to_memory():
+    stored = {'key': 'summary'}
+    lookups = []
+
+    def lookup(key):
+        lookups.append(key)
+        return stored.get(key)
+
+    cache = SummaryCache(10_000, lookup=lookup)
+    assert cache.get('key') == 'summary'
+    assert cache.get('key') == 'summary'
+    assert cache.get('missing') is None
+    assert lookups == ['key', 'missing']
+    stats = cache.stats()
+    assert (stats['persistent_hits'], stats['memory_hits'], stats['misses']) == (1, 1, 1)
+
+
+def test_concurrent_misses_are_computed_once():
+    cache = SummaryCache(10_000)
+    calls = []
+    release = threading.Event()
+
+    def compute():
+        calls.append(1)
+        release.wait(5)
+        return 'summary'
+
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(cache.get_or_compute('key', compute)))
+               for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    # Let every thread reach the in-flight computation before it finishes
+    deadline = time.monotonic() + 5
+    while cache.coalesced < 7 and time.monotonic() < deadline:
+        time.sleep(0.01)
+    release.set()
+    for thread in threads:
+        thread.join()
+    assert results == ['summary'] * 8
+    assert len(calls) == 1
+    assert cache.stats()['coalesced'] == 7
+    assert cache.stats()['in_flight'] == 0
+    assert cache.get_or_compute('key', lambda: pytest.fail('computed again')) == 'summary'
+
+
+def test_failed_computation_reaches_waiters_and_is_retried():
+    cache = SummaryCache(10_000)
+    started, release = threading.Event(), threading.Event()
+
+    def fail():
+        started.set()
+        release.wait(5)
+        raise RuntimeError('model failed')
+
+    errors = []
+
+    def call():
+        try:
+            cache.get_or_compute('key', fail)
+        except RuntimeError as e:
+            errors.append(str(e))
+
+    owner = threading.Thread(target=call)
+    owner.start()
+    started.wait(5)
+    waiter = threading.Thread(target=call)
+    waiter.start()
+    while cache.coalesced < 1:
+        time.sleep(0.01)
+    release.set()
+    owner.join()
+    waiter.join()
+    assert errors == ['model failed'] * 2
+    assert cache.get_or_compute('key', lambda: 'summary') == 'summary'
+
+
+def test_counters_are_exact_under_concurrent_lookups():
+    cache = SummaryCache(10_000, lookup=lambda key: 'stored' if key == 'persistent' else None)
+    cache.put('memory', 'summary')
+    # Switch threads as often as possible, so unsynchronized increments would lose counts
+    interval = sys.getswitchinterval()
+    sys.setswitchinterval(1e-6)
+    try:
+        def lookups():
+            for _ in range(2000):
+                cache.get('memory')
+                cache.get('missing')
+        threads = [threading.Thread(target=lookups) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+    finally:
+        sys.setswitchinterval(interval)
+    stats = cache.stats()
+    assert (stats['memory_hits'], stats['misses']) == (16000, 16000)
@@ -0,0 +1,110 @@
+import json
+import threading
+import time
+
+import pytest
+
+from jobs import JobQueue
+from inference.registry import ModelRegistry
+
+
+def wait_until(condition, timeout=5):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, 'timed out'
+        time.sleep(0.01)
+
+
+class BlockingHandler:
+    """Holds every job until released, tracking how many run at once."""
+
+    def __init__(self):
+        self.release = threading.Event()
+        self.running = self.peak = self.done = 0
+        self.lock = threading.Lock()
+
+    def __call__(self, job_id):
+        with self.lock:
+            self.running += 1
+            self.peak = max(self.peak, self.running)
+        self.release.wait()
+        with self.lock:
+            self.running -= 1
+            self.done += 1
+
+
+@pytest.fixture
+def handler():
+    handler = BlockingHandler()
+    yield handler
+    handler.release.set()
+
+
+def alive(job_queue):
+    return sum(thread.is_alive() for thread in job_queue._threads)
+
+
+def test_resize_starts_more_workers(handler):
+    job_queue = JobQueue(handler, workers=1, name='test-grow')
+    for job_id in range(4):
+        job_queue.submit(job_id)
+    wait_until(lambda: handler.running == 1)
+    job_queue.resize(3)
+    wait_until(lambda: handler.running == 3)
+    handler.release.set()
+    wait_until(lambda: handler.done == 4)
+    assert handler.peak == 3
+    job_queue.shutdown()
+
+
+def test_resize_retires_surplus_workers_after_their_job(handler):
+    job_queue = JobQueue(handler, workers=3, name='test-shrink')
+    for job_id in range(3):
+        job_queue.submit(job_id)
+    wait_until(lambda: handler.running == 3)
+    job_queue.resize(1)
+    # Running jobs are not interrupted
+    assert handler.running == 3 and alive(job_queue) == 3
+    handler.release.set()
+    wait_until(lambda: handler.done == 3 and len(job_queue._threads) == 1)
+    handler.release.clear()
+    for job_id in range(3, 6):
+        job_queue.submit(job_id)
+    wait_until(lambda: handler.running == 1)
+    time.sleep(0.05)
+    assert handler.running == 1
+    handler.release.set()
+    wait_until(lambda: handler.done == 6)
+    job_queue.shutdown()
+
+
+def test_resize_wakes_idle_workers(handler):
+    job_queue = JobQueue(handler, workers=4, name='test-idle')
+    handler.release.set()
+    job_queue.submit(0)
+    wait_until(lambda: handler.done == 1)
+    job_queue.resize(2)
+    wait_until(lambda: alive(job_queue) == 2 and len(job_queue._threads) == 2)
+    job_queue.shutdown()
+    assert job_queue._threads == []
+
+
+def test_reload_resizes_the_job_queue_of_a_model(api, tmp_path, monkeypatch):
+    config = tmp_path / 'models.json'
+
+    def write_config(workers):
+        config.write_text(json.dumps({'models': [{'name': 'resized', 'path': 'model', 'workers': workers}]}))
+
+    write_config(1)
+    registry = ModelRegistry.from_config(str(config), poll_seconds=None)
+    monkeypatch.setattr(api, 'model_registry', registry)
+    monkeypatch.setitem(api.app.config, 'MODEL_REGISTRY', str(config))
+    monkeypatch.setattr(api, 'job_queues', {})
+    job_queue = api.job_queue_for('resized')
+    assert job_queue.workers == 1
+
+    write_config(3)
+    assert api.app.test_client().post('/models/reload').status_code == 200
+    assert registry.get('resized').spec.workers == 3
+    assert api.job_queue_for('resized') is job_queue
+    assert job_queue.workers == 3
@@ -0,0 +1,117 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+NOW = datetime.utcnow()
+
+# (days ago, model, input length, score): every length bucket, unknown models and the score bounds
+RATINGS = [
+    (0, 'large', 200, 10), (0, 'large', 300, 9.5), (0, 'small', 2500, 0), (1, 'large', 5000, 7.25),
+    (1, None, 20000, 3), (2, 'small', 70000, 8), (2, 'small', 900, 8.9), (3, 'large', 999, 1),
+    (40, 'large', 1000, 6),
+]
+
+
+def rollups(api):
+    """{(day, model, length bucket, score bucket): (count, total)} of the stored rollups."""
+    with api.app.app_context():
+        return {(row.day, row.model, row.length_bucket, row.score_bucket): (row.count, pytest.approx(row.total))
+                for row in api.RatingRollup.query}
+
+
+def scanned(api):
+    """The same, computed from the summaries."""
+    with api.app.app_context():
+        return {(row.day, row.model, row.length_bucket, row.score_bucket): (row.count, pytest.approx(row.total))
+                for row in api.db.session.execute(api.scan_ratings())}
+
+
+@pytest.fixture
+def rated(api, client, add_summary):
+    """Summaries rated through the API, with their scores."""
+    ids = {}
+    for days_ago, model, length, score in RATINGS:
+        id = add_summary(text='x' * length, model=model, created_date=NOW - timedelta(days=days_ago, minutes=1))
+        assert client.put(f'/rate_summary/{id}', json={'score': score}).json == {'id': id, 'score': score}
+        ids[id] = score
+    add_summary(text='Never rated')
+    return ids
+
+
+def test_rollups_match_a_scan_after_ratings(api, client, rated):
+    assert rollups(api) == scanned(api)
+    assert sum(count for count, _ in rollups(api).values()) == len(RATINGS)
+    with api.app.app_context():
+        assert api.check_rating_rollups() == []
+
+
+def test_refused_ratings_leave_the_rollups_alone(api, client, add_summary, rated):
+    before = rollups(api)
+    rated_id = next(iter(rated))
+    unrated = add_summary(text='Rate me')
+    queued = add_summary(text='Still summarizing', status=api.STATUS_QUEUED)
+    for id, body, status in [
+        (rated_id, {'score': 5}, 400),
+        (unrated, {'score': 10.5}, 400),
+        (unrated, {'score': -1}, 400),
+        (unrated, {'score': '8'}, 400),
+        (unrated, {'score': None}, 400),
+        (unrated, {}, 400),
+        (queued, {'score': 5}, 400),
+        ('missing-id', {'score': 5}, 404),
+    ]:
+        assert client.put(f'/rate_summary/{id}', json=body).status_code == status
+    assert rollups(api) == before == scanned(api)
+
+
+def test_backfill_rebuilds_the_incremental_rollups(api, client, rated):
+    incremental = rollups(api)
+    with api.app.app_context():
+        # Rows rated before the rollups existed: no rollup rows, no recorded input lengths
+        with api.db.engine.begin() as connection:
+            connection.execute(api.db.delete(api.RatingRollup))
+            connection.execute(api.db.update(api.SummaryModel).values(input_length=None))
+        assert api.check_rating_rollups()
+        ratings, rows = api.backfill_rating_rollups()
+        assert api.check_rating_rollups() == []
+    assert (ratings, rows) == (len(RATINGS), len(incremental))
+    assert rollups(api) == incremental
+
+
+def test_check_reports_drifted_buckets(api, client, rated):
+    with api.app.app_context():
+        with api.db.engine.begin() as connection:
+            connection.execute(api.db.update(api.SummaryModel).where(api.SummaryModel.score == 10).values(score=2))
+        drifted = api.check_rating_rollups()
+    assert [(row['score_bucket'], row['stored_count'], row['scanned_count']) for row in drifted] == [(2, 0, 1), (9, 2, 1)]
+
+
+def test_stats_totals_match_a_scan(api, client, rated):
+    stats = client.get('/stats?days=3660').json
+    expected = scanned(api)
+    count = sum(count for count, _ in expected.values())
+    total = sum(rated.values())
+    assert stats['count'] == count == len(RATINGS)
+    assert stats['mean'] == pytest.approx(total / count)
+    histogram = [0] * 10
+    for (_, _, _, score_bucket), (bucket_count, _) in expected.items():
+        histogram[score_bucket] += bucket_count
+    assert stats['histogram'] == histogram
+    for field in ('by_day', 'by_model', 'by_length'):
+        assert sum(group['count'] for group in stats[field]) == count
+        assert sum(group['mean'] * group['count'] for group in stats[field]) == pytest.approx(total)
+    by_model = {group['model']: group['count'] for group in stats['by_model']}
+    assert by_model == {'large': 5, 'small': 3, None: 1}
+    by_length = {(group['min_chars'], group['max_chars']): group['count'] for group in stats['by_length']}
+    assert by_length == {(0, 1000): 4, (1000, 4000): 2, (4000, 16000): 1, (16000, 64000): 1, (64000, None): 1}
+
+
+def test_stats_filter_by_days_and_model(api, client, rated):
+    recent = client.get('/stats').json
+    assert recent['count'] == len(RATINGS) - 1
+    assert recent['since'] == (NOW - timedelta(days=29)).strftime('%Y-%m-%d')
+    assert [group['count'] for group in client.get('/stats?days=1').json['by_day']] == [3]
+    small = client.get('/stats?model=small&days=3660').json
+    assert small['count'] == 3 and small['mean'] == pytest.approx((0 + 8 + 8.9) / 3)
+    assert client.get('/stats?days=0').status_code == 400
+    assert client.get('/stats?days=100000').status_code == 400
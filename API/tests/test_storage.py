@@ -0,0 +1,98 @@
+import gzip
+import json
+import os
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import create_engine, text
+
+from storage import COMPRESS_MIN_BYTES, compress_text, decompress_text, exclusive_lock, incremental_vacuum
+
+LONG_TEXT = 'Transformers summarize long scientific articles into short abstracts. ' * 20
+
+
+def test_long_texts_are_compressed():
+    stored = compress_text(LONG_TEXT)
+    assert isinstance(stored, bytes) and len(stored) < len(LONG_TEXT)
+    assert decompress_text(stored) == LONG_TEXT
+
+
+def test_short_texts_are_kept_as_text():
+    short = 'x' * (COMPRESS_MIN_BYTES - 1)
+    assert compress_text(short) == short
+    assert decompress_text(short) == short
+    assert decompress_text(compress_text('Ünïcode ' * 100)) == 'Ünïcode ' * 100
+
+
+def stored_types(api, id):
+    with api.app.app_context(), api.db.engine.connect() as connection:
+        return tuple(connection.execute(
+            text('SELECT typeof(original_text), typeof(summarized) FROM summary_text WHERE id = :id'), {'id': id}).one())
+
+
+def test_bodies_are_stored_compressed_and_read_back(api, client, add_summary):
+    id = add_summary(text=LONG_TEXT, summarized='A short summary.')
+    assert stored_types(api, id) == ('blob', 'text')
+    summary = client.get(f'/get_summary/{id}').json
+    assert (summary['original_text'], summary['summarized']) == (LONG_TEXT, 'A short summary.')
+
+
+def test_rows_written_before_compression_are_read_and_recompressed(api, client, add_summary):
+    id = add_summary(text='placeholder')
+    with api.app.app_context(), api.db.engine.begin() as connection:
+        connection.execute(text('UPDATE summary_text SET original_text = :text WHERE id = :id'),
+                           {'text': LONG_TEXT, 'id': id})
+    assert stored_types(api, id) == ('text', 'text')
+    assert client.get(f'/get_summary/{id}').json['original_text'] == LONG_TEXT
+
+    with api.app.app_context():
+        rewritten, saved = api.recompress_texts()
+    assert rewritten == 1 and saved > 0
+    assert stored_types(api, id)[0] == 'blob'
+    assert client.get(f'/get_summary/{id}').json['original_text'] == LONG_TEXT
+
+
+@pytest.mark.parametrize('policy', ['archive', 'delete'])
+def test_expiry_keeps_rated_and_recent_summaries(api, client, add_summary, policy):
+    old = datetime.utcnow() - timedelta(days=10)
+    expired = {add_summary(text=f'Old {i}', created_date=old + timedelta(minutes=i)) for i in range(3)}
+    rated = add_summary(text='Old and rated', created_date=old, score=7)
+    recent = add_summary(text='Recent')
+    with api.app.app_context():
+        count, archive = api.expire_summaries(datetime.utcnow() - timedelta(days=1), policy)
+        remaining = {row[0] for row in api.db.session.query(api.SummaryModel.id)}
+    assert count == 3 and remaining == {rated, recent}
+    if policy == 'archive':
+        with gzip.open(archive, 'rt', encoding='utf-8') as file:
+            archived = [json.loads(line) for line in file]
+        assert {row['id'] for row in archived} == expired
+        assert sorted(row['original_text'] for row in archived) == ['Old 0', 'Old 1', 'Old 2']
+    else:
+        assert archive is None
+
+
+def test_incremental_vacuum_releases_free_pages(tmp_path):
+    legacy = create_engine(f'sqlite:///{tmp_path / "legacy.db"}')
+    with legacy.begin() as connection:
+        connection.execute(text('CREATE TABLE t (x)'))
+    assert incremental_vacuum(legacy) is None
+
+    engine = create_engine(f'sqlite:///{tmp_path / "incremental.db"}')
+    with engine.begin() as connection:
+        connection.exec_driver_sql('PRAGMA auto_vacuum = INCREMENTAL')
+        connection.exec_driver_sql('CREATE TABLE t (x)')
+        connection.exec_driver_sql('INSERT INTO t VALUES (randomblob(100000))')
+        connection.exec_driver_sql('DELETE FROM t')
+    size = os.path.getsize(tmp_path / 'incremental.db')
+    freed = incremental_vacuum(engine, pages_per_step=4, pause=0)
+    assert freed > 90000
+    assert os.path.getsize(tmp_path / 'incremental.db') == size - freed
+
+
+def test_exclusive_lock_is_held_by_one_holder(tmp_path):
+    path = str(tmp_path / 'compaction.lock')
+    with exclusive_lock(path) as first:
+        with exclusive_lock(path) as second:
+            assert first and not second
+    with exclusive_lock(path) as again:
+        assert again
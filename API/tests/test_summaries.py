@@ -0,0 +1,51 @@
+from datetime import datetime, timedelta
+
+
+def test_cursors_round_trip(api):
+    created = datetime(2024, 5, 1, 12, 30, 15, 250)
+    assert api.decode_cursor(api.encode_cursor(created, 'some-id|with-bar')) == (created, 'some-id|with-bar')
+    assert api.decode_cursor('not a cursor') is None
+    assert api.decode_cursor('') is None
+
+
+def test_pages_cover_every_summary_once_newest_first(api, client, add_summary):
+    start = datetime(2024, 1, 1)
+    # Two summaries per second: pages must break created_date ties by id
+    ids = {add_summary(text=f'Text {i}', created_date=start + timedelta(seconds=i // 2)) for i in range(23)}
+    listed, cursor = [], None
+    while True:
+        page = client.get('/summaries?limit=5' + (f'&cursor={cursor}' if cursor else '')).json
+        assert len(page['summaries']) <= 5
+        listed += page['summaries']
+        cursor = page['next_cursor']
+        if cursor is None:
+            break
+    assert len(listed) == 23 and {row['id'] for row in listed} == ids
+    positions = [(row['created_date'], row['id']) for row in listed]
+    assert positions == sorted(positions, reverse=True)
+    assert 'original_text' not in listed[0] and listed[0]['preview'].startswith('Text')
+
+
+def test_last_full_page_has_no_cursor(client, add_summary):
+    for i in range(4):
+        add_summary(text=f'Text {i}')
+    assert client.get('/summaries?limit=4').json['next_cursor'] is None
+
+
+def test_listing_filters_by_status(api, client, add_summary):
+    failed = add_summary(status=api.STATUS_FAILED)
+    add_summary()
+    assert [row['id'] for row in client.get('/summaries?status=failed').json['summaries']] == [failed]
+    assert client.get('/summaries?status=lost').status_code == 400
+
+
+def test_invalid_pages_are_rejected(client):
+    assert client.get('/summaries?limit=0').status_code == 400
+    assert client.get('/summaries?limit=100000').status_code == 400
+    assert client.get('/summaries?cursor=garbage').status_code == 400
+
+
+def test_text_bodies_are_read_from_their_table(client, add_summary):
+    id = add_summary(text='The whole original text.', summarized='Its summary.')
+    summary = client.get(f'/get_summary/{id}').json
+    assert (summary['original_text'], summary['summarized']) == ('The whole original text.', 'Its summary.')
@@ -0,0 +1,53 @@
+import io
+import json
+
+import pytest
+
+INVALID_TEXTS = [None, 42, ['a', 'list'], {'an': 'object'}, '', '   ']
+INVALID_BODIES = [None, 'a string', 42, ['text']]
+
+
+@pytest.mark.parametrize('text', INVALID_TEXTS)
+def test_stream_rejects_invalid_texts(client, text):
+    response = client.post('/process_text_stream', json={'text': text, 'minsize': 10, 'maxsize': 50})
+    assert response.status_code == 400
+    assert response.json == {'error': 'text must be a non-empty string'}
+
+
+@pytest.mark.parametrize('body', INVALID_BODIES)
+def test_stream_rejects_bodies_that_are_not_objects(client, body):
+    response = client.post('/process_text_stream', data=json.dumps(body), content_type='application/json')
+    assert response.status_code == 400
+    assert response.json == {'error': 'Request body must be a JSON object'}
+
+
+@pytest.mark.parametrize('text', INVALID_TEXTS)
+@pytest.mark.parametrize('sizes', [{'minsize': 10, 'maxsize': 50}, {'sizes': [{'minsize': 10, 'maxsize': 50}]}])
+@pytest.mark.parametrize('mode', ['abstractive', 'extractive'])
+def test_process_text_rejects_invalid_texts(client, text, sizes, mode):
+    response = client.post('/process_text', json={'text': text, 'mode': mode, **sizes})
+    assert response.status_code == 400
+    assert response.json == {'error': 'text must be a non-empty string'}
+
+
+@pytest.mark.parametrize('body', INVALID_BODIES)
+def test_process_text_rejects_bodies_that_are_not_objects(client, body):
+    response = client.post('/process_text', data=json.dumps(body), content_type='application/json')
+    assert response.status_code == 400
+    assert response.json == {'error': 'Request body must be a JSON object'}
+
+
+def test_process_text_extracts_valid_texts(client):
+    text = 'Transformers summarize articles. ' * 20
+    response = client.post('/process_text', json={'text': text, 'minsize': 1, 'maxsize': 20, 'mode': 'extractive'})
+    assert response.status_code == 201
+    assert response.json['status'] == 'done' and response.json['summarized']
+
+
+@pytest.mark.parametrize('budget', ['fast', '', '-5', '0'])
+def test_process_file_rejects_invalid_latency_budgets(client, budget):
+    form = {'file': (io.BytesIO(b'Some text.'), 'article.txt'), 'minsize': '10', 'maxsize': '50',
+            'latency_budget_ms': budget}
+    response = client.post('/process_file', data=form, content_type='multipart/form-data')
+    assert response.status_code == 400
+    assert response.json == {'error': 'latency_budget_ms must be a positive number'}
@@ -1,9 +1,19 @@
 import xml.etree.ElementTree as ET
 import pandas as pd
+import argparse
 import csv
+import os
+import signal
+import sys
+import threading
 from pathlib import Path
 from tqdm import tqdm  # Import tqdm for the progress bar
 
+from manifest import ExtractionManifest, HashingReader
+
+# Columns of the extracted rows; Source is the XML file path relative to the article folder
+COLUMNS = ('Abstract', 'Body', 'Source')
+
 def find_xml_files(root_folder):
     """
     Recursively find all .xml files in the given folder.
@@ -47,28 +57,264 @@ def append_to_csv(abstract_text, body_text, csv_filename='formatted_dataset.csv'
     })
     df.to_csv(csv_filename, mode='a', index=False, quoting=csv.QUOTE_ALL, lineterminator='\n', header=False)
 
-def process_xml_files(folder_path, csv_filename='formatted_dataset.csv'):
+def file_format_of(filename):
+    return 'parquet' if str(filename).endswith('.parquet') else 'csv'
+
+def _raise_system_exit(signum, frame):
+    raise SystemExit(128 + signum)
+
+class DatasetWriter:
     """
-    Processes all XML files in a given folder, extracting abstract and body text,
-    and appending them to a CSV file, with a pretty progress display.
+    Buffers extracted rows and writes them in batches to a CSV or Parquet file.
     
-    :param folder_path: The path to the folder containing XML files.
-    :param csv_filename: The filename of the CSV file to append the data to.
+    CSV output is appended in the same format as append_to_csv. Parquet output
+    is written as one compressed row group per batch. Use it as a context manager:
+    buffered rows are flushed and the file is closed properly on normal exit,
+    KeyboardInterrupt or SIGTERM, so an interrupted run leaves a readable file.
+    
+    :param filename: The output file.
+    :param file_format: 'csv' or 'parquet'; inferred from the file extension when None.
+    :param batch_size: Number of rows buffered before they are written.
+    :param compression: Parquet compression codec (ignored for CSV).
+    :param columns: Column names of the rows.
+    """
+
+    def __init__(self, filename, file_format=None, batch_size=1000, compression='zstd', columns=('Abstract', 'Body')):
+        if file_format is None:
+            file_format = file_format_of(filename)
+        if file_format not in ('csv', 'parquet'):
+            raise ValueError(f'Unsupported format: {file_format}')
+        self.filename = filename
+        self.file_format = file_format
+        self.batch_size = batch_size
+        self.compression = compression
+        self.columns = tuple(columns)
+        self.rows_written = 0
+        self._buffer = []
+        self._file = None
+        self._csv_writer = None
+        self._parquet_writer = None
+        self._previous_sigterm = None
+
+    def write(self, *row):
+        """Buffers one row, writing the batch once batch_size rows are pending."""
+        self._buffer.append(row)
+        if len(self._buffer) >= self.batch_size:
+            self.flush()
+
+    def flush(self):
+        if not self._buffer:
+            return
+        rows, self._buffer = self._buffer, []
+        if self.file_format == 'csv':
+            self._flush_csv(rows)
+        else:
+            self._flush_parquet(rows)
+        self.rows_written += len(rows)
+
+    def _flush_csv(self, rows):
+        if self._file is None:
+            self._file = open(self.filename, 'a', newline='', encoding='utf-8')
+            self._csv_writer = csv.writer(self._file, quoting=csv.QUOTE_ALL, lineterminator='\n')
+        self._csv_writer.writerows(rows)
+        self._file.flush()
+
+    def write_table(self, table):
+        """Writes an Arrow table with the same columns as is, after the buffered rows (Parquet only)."""
+        self.flush()
+        self._write_parquet(table)
+        self.rows_written += table.num_rows
+
+    def _flush_parquet(self, rows):
+        import pyarrow as pa
+
+        self._write_parquet(pa.table({name: [row[i] for row in rows] for i, name in enumerate(self.columns)}))
+
+    def _write_parquet(self, table):
+        import pyarrow.parquet as pq
+
+        if self._parquet_writer is None:
+            self._parquet_writer = pq.ParquetWriter(self.filename, table.schema, compression=self.compression)
+        self._parquet_writer.write_table(table)
+
+    def close(self):
+        try:
+            self.flush()
+        finally:
+            if self._file is not None:
+                os.fsync(self._file.fileno())
+                self._file.close()
+                self._file = None
+            if self._parquet_writer is not None:
+                # Writes the Parquet footer; without it the file is unreadable
+                self._parquet_writer.close()
+                self._parquet_writer = None
+
+    def __enter__(self):
+        if threading.current_thread() is threading.main_thread():
+            # Turn SIGTERM into SystemExit so __exit__ still flushes the buffer
+            self._previous_sigterm = signal.signal(signal.SIGTERM, _raise_system_exit)
+        return self
+
+    def __exit__(self, *exc_info):
+        try:
+            self.close()
+        finally:
+            if self._previous_sigterm is not None:
+                signal.signal(signal.SIGTERM, self._previous_sigterm)
+                self._previous_sigterm = None
+
+def remove_csv_rows(csv_filename, sources):
+    """
+    Rewrites a CSV dataset without the rows extracted from the given source files.
+    
+    :param csv_filename: The CSV file, with Source as its last column.
+    :param sources: Source paths of the rows to drop.
+    """
+    csv.field_size_limit(sys.maxsize)
+    tmp_filename = f'{csv_filename}.tmp'
+    with open(csv_filename, newline='', encoding='utf-8') as src, \
+            open(tmp_filename, 'w', newline='', encoding='utf-8') as dst:
+        writer = csv.writer(dst, quoting=csv.QUOTE_ALL, lineterminator='\n')
+        writer.writerows(row for row in csv.reader(src) if row[-1] not in sources)
+    os.replace(tmp_filename, csv_filename)
+
+def copy_parquet_rows(parquet_filename, writer, sources):
+    """
+    Copies the rows of a Parquet dataset to writer, one row group at a time,
+    except those extracted from the given source files.
+    """
+    import pyarrow as pa
+    import pyarrow.compute as pc
+    import pyarrow.parquet as pq
+
+    excluded = pa.array(sorted(sources), pa.string())
+    for batch in pq.ParquetFile(parquet_filename).iter_batches():
+        table = pa.Table.from_batches([batch])
+        if sources:
+            table = table.filter(pc.invert(pc.is_in(table['Source'], value_set=excluded)))
+        if table.num_rows:
+            writer.write_table(table)
+
+def process_xml_files(folder_path, csv_filename='formatted_dataset.csv', file_format=None, batch_size=1000,
+                      compression='zstd', dry_run=False, full=False):
     """
-    xml_files = find_xml_files(folder_path)
+    Processes the new and changed XML files in a given folder, extracting abstract and body text,
+    and appending them to a CSV (or Parquet) file in batches, with a pretty progress display.
+    
+    A manifest next to the output (<csv_filename>.manifest.sqlite, see manifest.ExtractionManifest)
+    remembers which file every row came from, so a rerun skips unchanged files and replaces or
+    removes the rows of changed and deleted files instead of appending duplicates. Each row
+    carries its source path in the Source column. An output written without a manifest is rebuilt.
+    
+    CSV rows are appended in place. Parquet files cannot be appended to, so the kept rows
+    are copied into a new file that replaces the old one, and the manifest is only
+    committed once it has.
     
-    for file_path in tqdm(xml_files, desc="Processing XML files", unit="file"):
-        tree = ET.parse(file_path)
-        root = tree.getroot()
+    :param folder_path: The path to the folder containing XML files.
+    :param csv_filename: The filename of the CSV or Parquet file to write the data to.
+    :param file_format: 'csv' or 'parquet'; inferred from the file extension when None.
+    :param batch_size: Number of rows buffered before they are written.
+    :param compression: Parquet compression codec.
+    :param dry_run: Only report what would be extracted and removed.
+    :param full: Ignore the manifest and rebuild the whole file.
+    :return: The manifest.ExtractionPlan of the run.
+    """
+    file_format = file_format or file_format_of(csv_filename)
+    manifest_path = f'{csv_filename}.manifest.sqlite'
+    if full:
+        if dry_run:
+            manifest_path = ':memory:'
+        else:
+            ExtractionManifest.remove(manifest_path)
+
+    with ExtractionManifest(manifest_path, read_only=dry_run) as manifest:
+        # Rows written without a manifest cannot be attributed to their files
+        untracked = manifest.is_empty() and os.path.exists(csv_filename)
+        plan = manifest.plan(folder_path)
+        print(plan.report())
+        if dry_run:
+            if untracked:
+                print(f'{csv_filename} is untracked and would be rebuilt')
+            return plan
+        if not (untracked or plan.new or plan.changed or plan.drops):
+            manifest.apply(plan)
+            return plan
+
+        shard = os.path.basename(csv_filename)
+        sources = plan.drops.get(shard, set())
+        if untracked:
+            os.remove(csv_filename)
+        exists = os.path.exists(csv_filename)
+        rewrite = file_format == 'parquet'
+        if rewrite:
+            target = f'{csv_filename}.tmp'
+        else:
+            target = csv_filename
+            if sources and exists:
+                remove_csv_rows(csv_filename, sources)
+        manifest.apply(plan, commit=not rewrite)
+
+        rows = []
+        try:
+            with DatasetWriter(target, file_format, batch_size=batch_size, compression=compression,
+                               columns=COLUMNS) as writer:
+                if rewrite and exists:
+                    copy_parquet_rows(csv_filename, writer, sources)
+                for path, size, mtime_ns in tqdm(plan.pending(), desc="Processing XML files", unit="file",
+                                                 total=plan.new + plan.changed):
+                    with open(os.path.join(folder_path, path), 'rb') as file:
+                        reader = HashingReader(file)
+                        try:
+                            root = ET.parse(reader).getroot()
+                        except ET.ParseError as e:
+                            root = None
+                            tqdm.write(f'Skipping unparsable file {path}: {e}')
+                        content_hash = reader.hexdigest()
+                    if root is None:
+                        rows.append((path, size, mtime_ns, content_hash, None, False))
+                        continue
+
+                    abstract_section = root.find('.//abstract')
+                    body_section = root.find('.//body')
 
-        abstract_section = root.find('.//abstract')
-        body_section = root.find('.//body')
+                    abstract_text = extract_text_with_spaces_and_newlines(abstract_section) if abstract_section is not None else ""
+                    body_text = extract_text_with_spaces_and_newlines(body_section) if body_section is not None else ""
 
-        abstract_text = extract_text_with_spaces_and_newlines(abstract_section) if abstract_section is not None else ""
-        body_text = extract_text_with_spaces_and_newlines(body_section) if body_section is not None else ""
+                    writer.write(abstract_text, body_text, path)
+                    rows.append((path, size, mtime_ns, content_hash, shard, bool(abstract_text and body_text)))
+                    if len(rows) >= batch_size:
+                        # Rows reach the file before the manifest learns about them
+                        writer.flush()
+                        manifest.record(rows, commit=not rewrite)
+                        rows = []
+        except BaseException:
+            if rewrite:
+                # The previous file is left as it was, and so is the uncommitted manifest
+                if os.path.exists(target):
+                    os.remove(target)
+                raise
+            # DatasetWriter flushed the buffered rows on exit
+            manifest.record(rows)
+            raise
+        manifest.record(rows, commit=False)
+        if rewrite:
+            if os.path.exists(target):
+                os.replace(target, csv_filename)
+            elif exists:
+                os.remove(csv_filename)
+        manifest.commit()
+    return plan
 
-        append_to_csv(abstract_text, body_text, csv_filename)
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Extract abstract/body pairs from XML articles to CSV or Parquet.')
+    parser.add_argument('folder_path', nargs='?', default='./article_data', help='Folder containing the XML files')
+    parser.add_argument('--output', default='formatted_dataset.csv', help='Output file (.csv or .parquet)')
+    parser.add_argument('--batch-size', type=int, default=1000, help='Rows buffered per write')
+    parser.add_argument('--compression', default='zstd', help='Parquet compression codec')
+    parser.add_argument('--dry-run', action='store_true', help='Report the files that would be extracted and the rows removed')
+    parser.add_argument('--full', action='store_true', help='Ignore the manifest and rebuild the whole file')
+    args = parser.parse_args()
 
-# Example usage
-folder_path = './article_data'  # Replace with the path to your folder
-process_xml_files(folder_path)
+    process_xml_files(args.folder_path, args.output, batch_size=args.batch_size, compression=args.compression,
+                      dry_run=args.dry_run, full=args.full)
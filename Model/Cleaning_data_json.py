@@ -1,8 +1,19 @@
 import xml.etree.ElementTree as ET
+import argparse
 import json
+import os
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+from itertools import islice
 from pathlib import Path
 from tqdm import tqdm  # Import tqdm for the progress bar
 
+from manifest import ExtractionManifest, HashingReader
+
+MANIFEST_FILENAME = 'manifest.sqlite'
+
+# Extracted files recorded in the manifest per commit
+MANIFEST_BATCH_SIZE = 1000
+
 def find_xml_files(root_folder):
     """
     Recursively find all .xml files in the given folder.
@@ -14,6 +25,18 @@ def find_xml_files(root_folder):
     xml_files = list(root_path.rglob('*.xml'))
     return xml_files
 
+def iter_xml_files(root_folder):
+    """
+    Lazily yield all .xml files under the given folder, one directory at a time.
+    
+    :param root_folder: The root directory to search for .xml files.
+    :return: A generator of paths to .xml files.
+    """
+    for dirpath, _, filenames in os.walk(root_folder):
+        for filename in filenames:
+            if filename.endswith('.xml'):
+                yield os.path.join(dirpath, filename)
+
 def extract_text_with_spaces_and_newlines(section):
     """
     Extracts text from an XML section, preserving spaces and newlines.
@@ -32,6 +55,254 @@ def extract_text_with_spaces_and_newlines(section):
     
     return ' '.join(text).strip().replace(' \n ', '\n').replace('\n ', '\n').replace(' \n', '\n')
 
+def parse_article(file_path):
+    """
+    Incrementally parses an XML article and extracts its abstract and body text.
+    
+    Finished top-level subtrees are cleared as soon as they are parsed, so memory
+    stays bounded by the largest section rather than the whole document.
+    
+    :param file_path: Path to the XML file, or a binary file object.
+    :return: A dict with 'Abstract' and 'Body', or None if either is missing or empty.
+    """
+    abstract_text = body_text = None
+    root = None
+    depth = 0
+    for event, elem in ET.iterparse(file_path, events=('start', 'end')):
+        if event == 'start':
+            if root is None:
+                root = elem
+            depth += 1
+            continue
+        depth -= 1
+        if elem.tag == 'abstract' and abstract_text is None:
+            abstract_text = extract_text_with_spaces_and_newlines(elem)
+        elif elem.tag == 'body' and body_text is None:
+            body_text = extract_text_with_spaces_and_newlines(elem)
+        if depth == 1:
+            root.clear()
+    if abstract_text and body_text:
+        return {'Abstract': abstract_text, 'Body': body_text}
+    return None
+
+def parse_articles(file_paths):
+    """
+    Parses a batch of XML articles in a worker process.
+    
+    :param file_paths: Paths to the XML files.
+    :return: A list of (record, error, content_hash) tuples, one per file; record is None for invalid articles.
+    """
+    results = []
+    for file_path in file_paths:
+        with open(file_path, 'rb') as file:
+            reader = HashingReader(file)
+            try:
+                record, error = parse_article(reader), None
+            except ET.ParseError as e:
+                record, error = None, f'{file_path}: {e}'
+            results.append((record, error, reader.hexdigest()))
+    return results
+
+class JsonlShardWriter:
+    """
+    Writes records to numbered JSONL shards, starting a new shard every shard_size records.
+    
+    :param output_dir: Directory the shards are written to.
+    :param shard_size: Maximum number of records per shard.
+    :param shard_counts: {shard name: record count} of the shards already in output_dir, to append
+        after them (filling up the last one) instead of overwriting them from part-00000.
+    """
+
+    def __init__(self, output_dir, shard_size=10000, shard_counts=None):
+        self.output_dir = Path(output_dir)
+        self.output_dir.mkdir(parents=True, exist_ok=True)
+        self.shard_size = shard_size
+        self.shard_paths = []
+        self._file = None
+        self._count = 0
+        self._next_index = 0
+        if shard_counts is not None:
+            existing = sorted(self.output_dir.glob('part-*.jsonl'))
+            if existing:
+                self._next_index = int(existing[-1].stem[len('part-'):]) + 1
+                last_count = shard_counts.get(existing[-1].name, 0)
+                if last_count < shard_size:
+                    self._file = open(existing[-1], 'a', encoding='utf-8')
+                    self.shard_paths.append(existing[-1])
+                    self._count = last_count
+
+    def write(self, record):
+        """Writes one record, returning the name of the shard it went to."""
+        if self._file is None or self._count >= self.shard_size:
+            self._open_next()
+        self._file.write(json.dumps(record, ensure_ascii=False))
+        self._file.write('\n')
+        self._count += 1
+        return self.shard_paths[-1].name
+
+    def _open_next(self):
+        self.close()
+        shard_path = self.output_dir / f'part-{self._next_index:05d}.jsonl'
+        self._file = open(shard_path, 'w', encoding='utf-8')
+        self.shard_paths.append(shard_path)
+        self._next_index += 1
+        self._count = 0
+
+    def flush(self):
+        if self._file is not None:
+            self._file.flush()
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+def drop_records(shard_path, sources):
+    """
+    Rewrites a JSONL shard without the records extracted from the given source files,
+    deleting it once empty.
+    
+    :param shard_path: The shard to rewrite.
+    :param sources: Source paths of the records to drop.
+    :return: The number of records left.
+    """
+    shard_path = Path(shard_path)
+    if not shard_path.exists():
+        return 0
+    kept = 0
+    tmp_path = shard_path.with_suffix('.jsonl.tmp')
+    with open(shard_path, encoding='utf-8') as src, open(tmp_path, 'w', encoding='utf-8') as dst:
+        for line in src:
+            if json.loads(line).get('Source') not in sources:
+                dst.write(line)
+                kept += 1
+    if kept:
+        os.replace(tmp_path, shard_path)
+    else:
+        os.remove(tmp_path)
+        os.remove(shard_path)
+    return kept
+
+def _batched(iterable, size):
+    iterator = iter(iterable)
+    while batch := list(islice(iterator, size)):
+        yield batch
+
+def process_xml_files_parallel(folder_path, output_dir='formatted_dataset', workers=None, shard_size=10000,
+                               ordered=False, batch_size=32, dry_run=False, full=False):
+    """
+    Extracts abstract and body text from the new and changed XML files in a folder across
+    a process pool, streaming the records to sharded JSONL files as they are parsed.
+    
+    A manifest in output_dir (see manifest.ExtractionManifest) remembers which file every
+    record came from, so a rerun skips unchanged files, removes the records of changed and
+    deleted files from their shards and appends the new records after the existing shards.
+    Each record carries its source path, relative to folder_path, in 'Source'. Shards that
+    the manifest does not know about (written before it existed) are rebuilt.
+    
+    Files are discovered lazily and at most a few batches per worker are in flight,
+    so memory use does not depend on the size of the corpus.
+    
+    :param folder_path: The path to the folder containing XML files.
+    :param output_dir: Directory the part-NNNNN.jsonl shards are written to.
+    :param workers: Number of worker processes (defaults to the CPU count).
+    :param shard_size: Maximum number of records per shard.
+    :param ordered: Keep records in file discovery order instead of completion order.
+    :param batch_size: Number of files sent to a worker at once.
+    :param dry_run: Only report what would be extracted and removed.
+    :param full: Ignore the manifest and rebuild every shard.
+    :return: A dict with the new, changed, touched, unchanged and deleted file counts, the
+        valid, not_valid and errors counts and the shards written to.
+    """
+    workers = workers or os.cpu_count()
+    max_in_flight = workers * 4
+    output_dir = Path(output_dir)
+    manifest_path = str(output_dir / MANIFEST_FILENAME)
+    if full:
+        if dry_run:
+            manifest_path = ':memory:'
+        else:
+            ExtractionManifest.remove(manifest_path)
+    if not dry_run:
+        output_dir.mkdir(parents=True, exist_ok=True)
+
+    with ExtractionManifest(manifest_path, read_only=dry_run) as manifest:
+        # Shards written without a manifest cannot be attributed to their files
+        stale_shards = sorted(output_dir.glob('part-*.jsonl')) if manifest.is_empty() else []
+        plan = manifest.plan(folder_path)
+        stats = {'new': plan.new, 'changed': plan.changed, 'touched': plan.touched, 'unchanged': plan.unchanged,
+                 'deleted': plan.deleted, 'valid': 0, 'not_valid': 0, 'errors': 0}
+        if dry_run:
+            print(plan.report())
+            if stale_shards:
+                print(f'{len(stale_shards)} untracked shard(s) in {output_dir} would be rebuilt')
+            stats['shards'] = []
+            return stats
+
+        for shard_path in stale_shards:
+            shard_path.unlink()
+        for shard, sources in plan.drops.items():
+            drop_records(output_dir / shard, sources)
+        manifest.apply(plan)
+
+        manifest_rows = []
+
+        def collect(results, batch, writer, progress):
+            for (record, error, content_hash), (path, size, mtime_ns) in zip(results, batch):
+                shard = None
+                if record is not None:
+                    record['Source'] = path
+                    shard = writer.write(record)
+                    stats['valid'] += 1
+                else:
+                    stats['not_valid'] += 1
+                    if error is not None:
+                        stats['errors'] += 1
+                        tqdm.write(f'Skipping unparsable file {error}')
+                manifest_rows.append((path, size, mtime_ns, content_hash, shard, record is not None))
+            if len(manifest_rows) >= MANIFEST_BATCH_SIZE:
+                record_batch(writer)
+            progress.update(len(results))
+
+        def record_batch(writer):
+            # Records reach the shards before the manifest learns about them, so an
+            # interruption can at worst extract a file twice, never lose it
+            writer.flush()
+            manifest.record(manifest_rows)
+            manifest_rows.clear()
+
+        with ProcessPoolExecutor(max_workers=workers) as executor, \
+                JsonlShardWriter(output_dir, shard_size, manifest.shard_counts()) as writer, \
+                tqdm(desc="Processing XML files", unit="file", total=plan.new + plan.changed) as progress:
+            pending = {}  # future -> batch, in submission order
+            for batch in _batched(plan.pending(), batch_size):
+                paths = [os.path.join(folder_path, path) for path, _, _ in batch]
+                pending[executor.submit(parse_articles, paths)] = batch
+                if len(pending) < max_in_flight:
+                    continue
+                if ordered:
+                    future = next(iter(pending))
+                    collect(future.result(), pending.pop(future), writer, progress)
+                else:
+                    done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        collect(future.result(), pending.pop(future), writer, progress)
+            for future in list(pending):
+                collect(future.result(), pending.pop(future), writer, progress)
+            record_batch(writer)
+
+    stats['shards'] = [str(path) for path in writer.shard_paths]
+    print(f"new={stats['new']} changed={stats['changed']} touched={stats['touched']} "
+          f"unchanged={stats['unchanged']} deleted={stats['deleted']}")
+    print(f"valid={stats['valid']} not_valid={stats['not_valid']} errors={stats['errors']}")
+    return stats
+
 def process_xml_files(folder_path, json_filename='formatted_dataset.json'):
     """
     Processes all XML files in a given folder, extracting abstract and body text,
@@ -66,6 +337,20 @@ def process_xml_files(folder_path, json_filename='formatted_dataset.json'):
         json.dump(data, file, indent=4)
     print(f'{not_valid=}')
 
-# Example usage
-folder_path = './article_data'  # Replace with the path to your folder
-process_xml_files(folder_path)
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Extract abstract/body pairs from XML articles.')
+    parser.add_argument('folder_path', nargs='?', default='./article_data', help='Folder containing the XML files')
+    parser.add_argument('--jsonl', metavar='DIR', help='Stream sharded JSONL into DIR using a process pool')
+    parser.add_argument('--workers', type=int, help='Worker processes for --jsonl (default: CPU count)')
+    parser.add_argument('--shard-size', type=int, default=10000, help='Records per JSONL shard')
+    parser.add_argument('--ordered', action='store_true', help='Keep records in file discovery order')
+    parser.add_argument('--dry-run', action='store_true',
+                        help='With --jsonl, report the files that would be extracted and the records removed')
+    parser.add_argument('--full', action='store_true', help='With --jsonl, ignore the manifest and rebuild every shard')
+    args = parser.parse_args()
+
+    if args.jsonl:
+        process_xml_files_parallel(args.folder_path, args.jsonl, workers=args.workers, shard_size=args.shard_size,
+                                   ordered=args.ordered, dry_run=args.dry_run, full=args.full)
+    else:
+        process_xml_files(args.folder_path)
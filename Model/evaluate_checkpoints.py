@@ -0,0 +1,345 @@
+"""
+Compares fine-tuned checkpoints on the validation split.
+
+Every checkpoint summarizes the same validation sample in padded batches,
+then ROUGE-1/2/L is scored in a process pool while the next checkpoint
+generates. Summaries are cached per checkpoint and decode settings under
+--cache-dir, so evaluating again (e.g. after adding a checkpoint or more
+samples) only generates what is missing and rescoring is instant. The report
+puts generation throughput and latency next to the quality numbers.
+
+Runs offline: checkpoints and tokenizers are read from local directories only.
+
+    python evaluate_checkpoints.py                          # ./results/model and every ./results/checkpoint-*
+    python evaluate_checkpoints.py results/checkpoint-500 results/model --samples 500 --num-beams 2 --output report.md
+"""
+import argparse
+import glob
+import hashlib
+import json
+import logging
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+# Never reach out to the Hugging Face Hub
+os.environ.setdefault('HF_HUB_OFFLINE', '1')
+os.environ.setdefault('TRANSFORMERS_OFFLINE', '1')
+
+logger = logging.getLogger(__name__)
+
+ROUGE_TYPES = ('rouge1', 'rouge2', 'rougeL')
+
+# (prediction, reference) pairs per task sent to the scoring pool
+SCORE_CHUNK_SIZE = 64
+
+# Trainer checkpoints only hold the weights unless a tokenizer was given to the Trainer
+TOKENIZER_FILES = ('tokenizer.json', 'tokenizer_config.json')
+
+# Bump when the cached entries change meaning
+CACHE_FORMAT = 1
+
+
+def find_checkpoints(results_dir='./results'):
+    """Trainer checkpoints of results_dir by step, followed by the final model."""
+    def step(path):
+        suffix = path.rsplit('-', 1)[-1]
+        return int(suffix) if suffix.isdigit() else -1
+
+    checkpoints = sorted(glob.glob(os.path.join(results_dir, 'checkpoint-*')), key=step)
+    final = os.path.join(results_dir, 'model')
+    return checkpoints + ([final] if os.path.isdir(final) else [])
+
+
+def sample_id(text):
+    return hashlib.sha256(text.encode('utf-8')).hexdigest()[:16]
+
+
+def load_validation_sample(data_path, samples, test_size=0.1, seed=42):
+    """
+    The first validation records of a dataset, with the split used by fine_tune.py.
+
+    :param data_path: A JSON, JSONL or Arrow file, a directory of shards or a glob pattern.
+    :param samples: Number of records; 0 for the whole validation split.
+    :param test_size: Validation fraction used for training.
+    :param seed: Split seed used for training.
+    :return: A list of {'id', 'text', 'reference'} dicts.
+    """
+    from training_data import find_shards, iter_records, split_of
+
+    sample, seen = [], set()
+    for path in find_shards(data_path):
+        for record in iter_records(path):
+            if not record.get('Abstract') or not record.get('Body') or split_of(record, test_size, seed) != 'validation':
+                continue
+            key = sample_id(record['Body'])
+            if key in seen:
+                continue
+            seen.add(key)
+            sample.append({'id': key, 'text': record['Body'], 'reference': record['Abstract']})
+            if samples and len(sample) >= samples:
+                return sample
+    return sample
+
+
+def has_tokenizer(path):
+    return any(os.path.exists(os.path.join(path, name)) for name in TOKENIZER_FILES)
+
+
+def load_checkpoint(path, backend, device=None, tokenizer_path=None):
+    """
+    Loads a checkpoint with an inference backend.
+
+    :param tokenizer_path: Tokenizer directory for checkpoints saved without one (torch backend only).
+    """
+    from inference.backends import TorchBackend, load_backend, load_model
+
+    if has_tokenizer(path) or tokenizer_path is None:
+        return load_backend(backend, path, device)
+    if backend != 'torch':
+        raise ValueError(f'{path} has no tokenizer files, which the {backend} backend needs; '
+                         'save the tokenizer with the checkpoint or use the torch backend')
+    import torch
+    from transformers import AutoTokenizer
+
+    device = device or ('cuda' if torch.cuda.is_available() else 'cpu')
+    return TorchBackend(load_model(path).to(device), AutoTokenizer.from_pretrained(tokenizer_path), device)
+
+
+class OutputCache:
+    """
+    Summaries generated by one checkpoint with one set of decode settings, stored as JSONL.
+
+    The file name is a hash of the checkpoint path and files, the backend, the
+    tokenizer and the generation settings; every line holds one sample's summary
+    with the timing of the batch it was generated in. Lines are appended batch
+    by batch, so an interrupted evaluation resumes where it stopped.
+
+    :param cache_dir: Directory of the cache files.
+    :param checkpoint: The checkpoint directory.
+    :param backend: Inference backend name.
+    :param tokenizer_path: Tokenizer directory used when the checkpoint has none.
+    :param generation: Generation settings.
+    """
+
+    def __init__(self, cache_dir, checkpoint, backend, tokenizer_path, generation):
+        from inference.runtime import model_version
+
+        settings = {
+            'format': CACHE_FORMAT,
+            'checkpoint': os.path.abspath(checkpoint),
+            'files': model_version(checkpoint, backend),
+            'tokenizer': os.path.abspath(tokenizer_path if tokenizer_path and not has_tokenizer(checkpoint) else checkpoint),
+            'generation': generation,
+        }
+        key = hashlib.sha256(json.dumps(settings, sort_keys=True).encode('utf-8')).hexdigest()[:16]
+        os.makedirs(cache_dir, exist_ok=True)
+        self.path = os.path.join(cache_dir, f'{os.path.basename(os.path.normpath(checkpoint))}-{key}.jsonl')
+        self.entries = {}
+        if os.path.exists(self.path):
+            truncated = False
+            with open(self.path, encoding='utf-8') as file:
+                for line in file:
+                    try:
+                        entry = json.loads(line)
+                    except json.JSONDecodeError:
+                        truncated = True  # last line of an interrupted run
+                        continue
+                    self.entries[entry['id']] = entry
+            if truncated:
+                # Rewrite the file so new lines aren't appended to the partial one
+                os.remove(self.path)
+                self.add(list(self.entries.values()))
+
+    def add(self, entries):
+        with open(self.path, 'a', encoding='utf-8') as file:
+            for entry in entries:
+                file.write(json.dumps(entry) + '\n')
+                self.entries[entry['id']] = entry
+
+
+def generate_missing(checkpoint, sample, cache, backend, generation, batch_size, device=None, tokenizer_path=None):
+    """
+    Summarizes the samples that are not cached yet, longest first so batches need little padding.
+
+    :return: (number of summaries generated, seconds spent loading the checkpoint or None if all were cached).
+    """
+    missing = [item for item in sample if item['id'] not in cache.entries]
+    if not missing:
+        return 0, None
+
+    started = time.perf_counter()
+    model = load_checkpoint(checkpoint, backend, device, tokenizer_path)
+    load_seconds = time.perf_counter() - started
+    model.summarize([missing[0]['text']], **generation)  # warm-up
+
+    missing.sort(key=lambda item: len(item['text']), reverse=True)
+    for start in range(0, len(missing), batch_size):
+        batch = missing[start:start + batch_size]
+        started = time.perf_counter()
+        summaries = model.summarize([item['text'] for item in batch], **generation)
+        seconds = time.perf_counter() - started
+        cache.add([
+            {'id': item['id'], 'summary': summary, 'tokens': model.count_tokens(summary),
+             'batch_seconds': seconds, 'batch_size': len(batch)}
+            for item, summary in zip(batch, summaries)
+        ])
+        logger.info("%s: %d/%d summaries generated", checkpoint, start + len(batch), len(missing))
+    return len(missing), load_seconds
+
+
+_scorer = None
+
+
+def _init_scorer():
+    global _scorer
+    from rouge_score import rouge_scorer
+
+    _scorer = rouge_scorer.RougeScorer(list(ROUGE_TYPES), use_stemmer=True)
+
+
+def score_pairs(pairs):
+    """ROUGE F-measures of (prediction, reference) pairs, one tuple in ROUGE_TYPES order per pair."""
+    scores = []
+    for prediction, reference in pairs:
+        result = _scorer.score(reference, prediction)
+        scores.append(tuple(result[name].fmeasure for name in ROUGE_TYPES))
+    return scores
+
+
+def percentile(values, q):
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, round(q / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def checkpoint_report(checkpoint, sample, cache, score_chunks, generated, load_seconds):
+    """
+    Averages the ROUGE scores of a checkpoint and derives its generation throughput and latency.
+
+    Timings come from the cache: samples generated by an earlier run keep the timings of that run.
+    """
+    scores = [score for chunk in score_chunks for score in chunk.result()]
+    entries = [cache.entries[item['id']] for item in sample]
+    # Every sample is charged its share of the batch it was generated in
+    seconds = sum(entry['batch_seconds'] / entry['batch_size'] for entry in entries)
+    latencies = [entry['batch_seconds'] * 1000 for entry in entries]
+    report = {'checkpoint': checkpoint, 'samples': len(sample), 'generated': generated,
+              'cached': len(sample) - generated, 'load_seconds': load_seconds}
+    for i, name in enumerate(ROUGE_TYPES):
+        report[name] = sum(score[i] for score in scores) / len(scores)
+    report.update({
+        'samples_per_second': len(entries) / seconds,
+        'tokens_per_second': sum(entry['tokens'] for entry in entries) / seconds,
+        'latency_p50_ms': percentile(latencies, 50),
+        'latency_p95_ms': percentile(latencies, 95),
+        'cache': cache.path,
+    })
+    return report
+
+
+COLUMNS = (
+    ('checkpoint', '{}'), ('rouge1', '{:.4f}'), ('rouge2', '{:.4f}'), ('rougeL', '{:.4f}'),
+    ('samples_per_second', '{:.2f}'), ('tokens_per_second', '{:.1f}'),
+    ('latency_p50_ms', '{:.0f}'), ('latency_p95_ms', '{:.0f}'), ('cached', '{}'),
+)
+
+
+def format_table(reports, markdown=False):
+    rows = [[name for name, _ in COLUMNS]]
+    rows += [[template.format(report[name]) for name, template in COLUMNS] for report in reports]
+    if markdown:
+        lines = ['| ' + ' | '.join(row) + ' |' for row in rows]
+        lines.insert(1, '|' + '|'.join('---' for _ in COLUMNS) + '|')
+        return '\n'.join(lines)
+    widths = [max(len(row[i]) for row in rows) for i in range(len(COLUMNS))]
+    return '\n'.join(
+        '  '.join(cell.ljust(width) if i == 0 else cell.rjust(width) for i, (cell, width) in enumerate(zip(row, widths)))
+        for row in rows
+    )
+
+
+def write_report(path, reports, settings):
+    if path.endswith('.md'):
+        best = max(reports, key=lambda report: report['rougeL'])
+        with open(path, 'w', encoding='utf-8') as file:
+            file.write(f"# Checkpoint evaluation\n\n{settings['samples']} validation samples from "
+                       f"`{settings['data']}`, {settings['backend']} backend, batches of {settings['batch_size']}, "
+                       f"generation `{json.dumps(settings['generation'])}`.\n\n")
+            file.write(format_table(reports, markdown=True) + '\n\n')
+            file.write(f"Best ROUGE-L: `{best['checkpoint']}` ({best['rougeL']:.4f}).\n")
+    else:
+        with open(path, 'w', encoding='utf-8') as file:
+            json.dump({'settings': settings, 'checkpoints': reports}, file, indent=4)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('checkpoints', nargs='*', help='Model directories (default: the checkpoints and final model '
+                                                       'in --results-dir)')
+    parser.add_argument('--results-dir', default='./results')
+    parser.add_argument('--data', default=os.environ.get('TRAINING_DATA', 'formatted_dataset' if os.path.isdir(
+        'formatted_dataset') else 'formatted_dataset.json'), help='Dataset the model was trained on')
+    parser.add_argument('--samples', type=int, default=200, help='Validation records to evaluate (0: all)')
+    parser.add_argument('--test-size', type=float, default=0.1, help='Validation fraction used for training')
+    parser.add_argument('--seed', type=int, default=42, help='Split seed used for training')
+    parser.add_argument('--batch-size', type=int, default=8)
+    parser.add_argument('--num-beams', type=int)
+    parser.add_argument('--max-length', type=int)
+    parser.add_argument('--min-length', type=int)
+    parser.add_argument('--length-penalty', type=float)
+    parser.add_argument('--backend', default='torch', help='Inference backend: torch, int8 or onnx')
+    parser.add_argument('--device', help='Device for the torch backend (default: CUDA when available)')
+    parser.add_argument('--tokenizer', default='./results/model', help='Tokenizer of checkpoints saved without one')
+    parser.add_argument('--workers', type=int, default=os.cpu_count(), help='ROUGE scoring processes')
+    parser.add_argument('--cache-dir', default='./cache/evaluation')
+    parser.add_argument('--output', default='evaluation_report.json',
+                        help='Report file: a Markdown table if it ends with .md, JSON otherwise')
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+    checkpoints = args.checkpoints or find_checkpoints(args.results_dir)
+    if not checkpoints:
+        parser.error(f'No checkpoints given or found in {args.results_dir}')
+    missing = [path for path in checkpoints if not os.path.isdir(path)]
+    if missing:
+        parser.error(f"Not a model directory: {', '.join(missing)}")
+    tokenizer_path = args.tokenizer if has_tokenizer(args.tokenizer) else None
+
+    from inference.backends import DEFAULT_GENERATION
+
+    overrides = {'num_beams': args.num_beams, 'max_length': args.max_length, 'min_length': args.min_length,
+                 'length_penalty': args.length_penalty}
+    generation = {**DEFAULT_GENERATION, **{key: value for key, value in overrides.items() if value is not None}}
+
+    sample = load_validation_sample(args.data, args.samples, args.test_size, args.seed)
+    if not sample:
+        parser.error(f'No validation records in {args.data}')
+    logger.info("Evaluating %d checkpoint(s) on %d validation samples", len(checkpoints), len(sample))
+
+    # Spawned workers only import rouge_score, not the torch state of this process
+    context = multiprocessing.get_context('spawn')
+    results = []
+    with ProcessPoolExecutor(max_workers=args.workers, mp_context=context, initializer=_init_scorer) as pool:
+        for checkpoint in checkpoints:
+            cache = OutputCache(args.cache_dir, checkpoint, args.backend, tokenizer_path, generation)
+            generated, load_seconds = generate_missing(checkpoint, sample, cache, args.backend, generation,
+                                                       args.batch_size, args.device, tokenizer_path)
+            # Scored in the background while the next checkpoint generates
+            pairs = [(cache.entries[item['id']]['summary'], item['reference']) for item in sample]
+            chunks = [pool.submit(score_pairs, pairs[start:start + SCORE_CHUNK_SIZE])
+                      for start in range(0, len(pairs), SCORE_CHUNK_SIZE)]
+            results.append((checkpoint, cache, chunks, generated, load_seconds))
+        reports = [checkpoint_report(checkpoint, sample, cache, chunks, generated, load_seconds)
+                   for checkpoint, cache, chunks, generated, load_seconds in results]
+
+    print(format_table(reports))
+    settings = {'data': args.data, 'samples': len(sample), 'test_size': args.test_size, 'seed': args.seed,
+                'backend': args.backend, 'batch_size': args.batch_size, 'generation': generation}
+    write_report(args.output, reports, settings)
+    logger.info("Report written to %s", args.output)
+
+
+if __name__ == '__main__':
+    main()
@@ -1,33 +1,38 @@
-import pandas as pd
 import numpy as np
-from transformers import BartTokenizer, BartForConditionalGeneration, Trainer, TrainingArguments
-from datasets import Dataset, DatasetDict
+from transformers import BartTokenizerFast, BartForConditionalGeneration, Trainer, TrainingArguments
+from transformers.trainer_utils import get_last_checkpoint
 import torch
 import logging
 import os
-from sklearn.model_selection import train_test_split
 from tqdm import tqdm
 from rich.console import Console
 from rich.logging import RichHandler
+from inference.backends import TorchBackend
+from inference.runtime import get_runtime
+from training_data import load_tokenized_datasets, build_data_collator, LENGTH_COLUMN
+
+logger = logging.getLogger()
 
 # Configure logging
-console = Console()
-file_handler = logging.FileHandler('training.log')
-file_handler.setFormatter(logging.Formatter('%(asctime)s - %(levelname)s - %(message)s'))
-rich_handler = RichHandler(console=console, show_time=False, show_level=True, show_path=False)
+def configure_logging():
+    console = Console()
+    file_handler = logging.FileHandler('training.log')
+    file_handler.setFormatter(logging.Formatter('%(asctime)s - %(levelname)s - %(message)s'))
+    rich_handler = RichHandler(console=console, show_time=False, show_level=True, show_path=False)
 
-logger = logging.getLogger()
-logger.setLevel(logging.INFO)
-logger.addHandler(file_handler)
-logger.addHandler(rich_handler)
+    logger.setLevel(logging.INFO)
+    logger.addHandler(file_handler)
+    logger.addHandler(rich_handler)
 
 # Check for GPU availability
 device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
-logger.info("Using device: %s", device)
 
 # Define paths
 model_save_path = './results/model'
-last_checkpoint = './results/checkpoint'
+tokenized_cache_dir = './cache/tokenized'
+# Training data: JSONL/Arrow shards (Cleaning_data_json.py --jsonl writes them to ./formatted_dataset) or a JSON file
+dataset_path = os.environ.get('TRAINING_DATA', 'formatted_dataset' if os.path.isdir('formatted_dataset')
+                              else 'formatted_dataset.json')
 
 # Training arguments
 training_args = TrainingArguments(
@@ -43,64 +48,41 @@ training_args = TrainingArguments(
     save_steps=500,                 # save checkpoint every 500 steps
     save_total_limit=3,             # limit the total number of checkpoints
     report_to="none",               # Avoid logging to external platforms
+    group_by_length=True,           # batch examples of similar length together to minimize padding
+    length_column_name=LENGTH_COLUMN,
 )
 
 def load_or_train_model():
+    # The Trainer restores the optimizer, scheduler and RNG states and skips the batches already
+    # seen in the interrupted epoch without reading them, so training resumes mid-epoch
     resume_from_checkpoint = None
-    if os.path.isdir(last_checkpoint):
-        resume_from_checkpoint = last_checkpoint
-        logger.info("Resuming training from checkpoint: %s", last_checkpoint)
+    if os.path.isdir(training_args.output_dir):
+        resume_from_checkpoint = get_last_checkpoint(training_args.output_dir)
+    if resume_from_checkpoint:
+        logger.info("Resuming training from checkpoint: %s", resume_from_checkpoint)
 
     if os.path.isdir(model_save_path):
         # Load the model
         logger.info("Loading pre-trained model...")
         model = BartForConditionalGeneration.from_pretrained(model_save_path).to(device)
-        tokenizer = BartTokenizer.from_pretrained(model_save_path)
+        tokenizer = BartTokenizerFast.from_pretrained(model_save_path)
         logger.info("Model loaded successfully.")
     else:
         # Train and save the model
         logger.info("Model not found. Training model...")
         
-        # Load dataset from JSON
-        try:
-            data = pd.read_json('formatted_dataset.json')
-            logger.info("Dataset loaded from 'formatted_dataset.json'.")
-        except Exception as e:
-            logger.error("Error loading dataset: %s", e)
-            raise
-
-        # Split into training and validation datasets
-        train_df, val_df = train_test_split(data, test_size=0.1, random_state=42)
-        logger.info("Data split into training and validation sets.")
-
-        # Convert to Hugging Face Dataset
-        train_dataset = Dataset.from_pandas(train_df)
-        val_dataset = Dataset.from_pandas(val_df)
-        datasets = DatasetDict({
-            'train': train_dataset,
-            'validation': val_dataset
-        })
-        logger.info("Dataset converted to Hugging Face Dataset format.")
-
         # Initialize tokenizer and model
-        tokenizer = BartTokenizer.from_pretrained('facebook/bart-large')
+        tokenizer = BartTokenizerFast.from_pretrained('facebook/bart-large')
         model = BartForConditionalGeneration.from_pretrained('facebook/bart-large').to(device)
         logger.info("Tokenizer and model initialized and moved to device.")
 
-        def preprocess_function(examples):
-            # Tokenize the inputs and targets
-            inputs = tokenizer(examples['Body'], max_length=1024, truncation=True, padding='max_length')
-            targets = tokenizer(examples['Abstract'], max_length=150, truncation=True, padding='max_length')
-            
-            # Create a dictionary with encoded inputs and targets
-            model_inputs = inputs
-            model_inputs['labels'] = targets['input_ids']
-            
-            return model_inputs
-
-        # Optimize the tokenization process by using multiprocessing
-        logger.info("Tokenizing the dataset with optimized map function...")
-        encoded_datasets = datasets.map(preprocess_function, batched=True, num_proc=os.cpu_count())
+        # Stream the shards through the tokenizer into memory-mapped Arrow files, or reuse the ones cached by a previous run
+        try:
+            encoded_datasets = load_tokenized_datasets(dataset_path, tokenizer, cache_dir=tokenized_cache_dir,
+                                                       num_proc=os.cpu_count())
+        except Exception as e:
+            logger.error("Error loading dataset: %s", e)
+            raise
         logger.info("Dataset tokenized.")
 
         # Define the Trainer
@@ -109,6 +91,7 @@ def load_or_train_model():
             args=training_args,                  # training arguments, defined above
             train_dataset=encoded_datasets['train'],         # training dataset
             eval_dataset=encoded_datasets['validation'],     # evaluation dataset
+            data_collator=build_data_collator(tokenizer, model),  # pads per batch, masks label padding with -100
         )
         logger.info("Trainer instantiated.")
 
@@ -130,18 +113,19 @@ def load_or_train_model():
 
     return model, tokenizer
 
-# Load or train the model
-model, tokenizer = load_or_train_model()
-
-# Generate summaries for some example texts
+# Generate summaries for some example texts, loading the saved model on first use
 def generate_summary(text):
-    inputs = tokenizer(text, return_tensors="pt", max_length=1024, truncation=True)
-    inputs = {key: value.to(device) for key, value in inputs.items()}  # Move inputs to GPU if available
-    summary_ids = model.generate(inputs["input_ids"], max_length=150, num_beams=4, length_penalty=2.0, early_stopping=True)
-    summary = tokenizer.decode(summary_ids[0], skip_special_tokens=True)
-    return summary
-
-# Test the summarization
-sample_text = "Your long article or body text goes here."
-logger.info("Generating summary for sample text...")
-print(generate_summary(sample_text))
+    return get_runtime(model_save_path).summarize(text)
+
+if __name__ == '__main__':
+    configure_logging()
+    logger.info("Using device: %s", device)
+
+    # Load or train the model
+    model, tokenizer = load_or_train_model()
+    backend = TorchBackend(model, tokenizer, device)
+
+    # Test the summarization
+    sample_text = "Your long article or body text goes here."
+    logger.info("Generating summary for sample text...")
+    print(backend.summarize([sample_text])[0])
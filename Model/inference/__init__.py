@@ -0,0 +1,6 @@
+from .batching import MicroBatcher
+from .longdoc import LongDocumentSummarizer, split_into_chunks
+from .lru import LRUCache
+from .metrics import Histogram
+from .registry import ModelRegistry, ModelSpec, load_config
+from .runtime import ModelRuntime, get_runtime
@@ -0,0 +1,315 @@
+import hashlib
+import logging
+import os
+import threading
+
+import torch
+from transformers import (AutoTokenizer, BartForConditionalGeneration, StoppingCriteria, StoppingCriteriaList,
+                          TextIteratorStreamer)
+from transformers.modeling_outputs import BaseModelOutput
+
+from .lru import LRUCache
+from .metrics import REGISTRY, timed
+
+logger = logging.getLogger(__name__)
+
+# Maximum number of input tokens BART accepts
+MAX_INPUT_LENGTH = 1024
+
+# Generation settings used by fine_tune.generate_summary
+DEFAULT_GENERATION = {
+    'max_length': 150,
+    'num_beams': 4,
+    'length_penalty': 2.0,
+    'early_stopping': True,
+}
+
+# Streaming decodes one hypothesis token by token, so beam search is replaced by greedy or sampled decoding
+STREAM_GENERATION = {
+    'greedy': {'num_beams': 1, 'do_sample': False},
+    'sample': {'num_beams': 1, 'do_sample': True, 'top_p': 0.9, 'temperature': 0.8},
+}
+
+INPUT_TOKENS = REGISTRY.counter('summarizer_input_tokens_total', 'Tokens fed to the encoder, excluding padding')
+OUTPUT_TOKENS = REGISTRY.counter('summarizer_output_tokens_total', 'Tokens generated, excluding padding')
+ENCODER_CACHE_HITS = REGISTRY.counter('summarizer_encoder_cache_hits_total', 'Inputs whose encoder outputs were cached')
+ENCODER_CACHE_MISSES = REGISTRY.counter('summarizer_encoder_cache_misses_total', 'Inputs run through the encoder')
+
+
+def _tensor_sizeof(key, value):
+    return value.numel() * value.element_size() + len(key) + 64
+
+
+def load_model(model_path):
+    """
+    Loads the seq2seq model from memory-mapped safetensors when available.
+
+    safetensors weights are mapped straight from the page cache instead of
+    being unpickled into freshly allocated buffers, which makes loading faster
+    and lets processes on the same host share the weight pages.
+    """
+    use_safetensors = os.path.exists(os.path.join(model_path, 'model.safetensors')) or None
+    model = BartForConditionalGeneration.from_pretrained(model_path, use_safetensors=use_safetensors,
+                                                         low_cpu_mem_usage=True)
+    model.eval()
+    return model
+
+
+class _LockedDecoder:
+    """Tokenizer facade for TextIteratorStreamer, which decodes from the generating thread."""
+
+    def __init__(self, tokenizer, lock):
+        self.tokenizer = tokenizer
+        self.lock = lock
+
+    def decode(self, *args, **kwargs):
+        with self.lock:
+            return self.tokenizer.decode(*args, **kwargs)
+
+
+class _StopWhenSet(StoppingCriteria):
+    """Ends generation early once the event is set, e.g. when the streaming client went away."""
+
+    def __init__(self, event):
+        self.event = event
+
+    def __call__(self, input_ids, scores, **kwargs):
+        return torch.full((input_ids.shape[0],), self.event.is_set(), dtype=torch.bool, device=input_ids.device)
+
+
+class TorchBackend:
+    """
+    Eager fp32 PyTorch inference.
+
+    Every backend exposes the same interface: summarize() for batched
+    generation, count_tokens() for length accounting and memory_bytes() for
+    the weight footprint, so callers never need to know which one is active.
+
+    Encoder outputs of recent inputs are kept in an LRU cache bounded by
+    ``encoder_cache_bytes``, keyed by a hash of their token ids, so summarizing
+    the same document again with other generation settings (e.g. another
+    length) only runs the decoder.
+
+    :param model: A loaded seq2seq model.
+    :param tokenizer: Its tokenizer.
+    :param device: Device the inputs are moved to.
+    :param encoder_cache_bytes: Byte budget of the encoder output cache; 0 disables it.
+    """
+
+    name = 'torch'
+
+    def __init__(self, model, tokenizer, device='cpu', encoder_cache_bytes=0):
+        self.model = model
+        self.tokenizer = tokenizer
+        self.device = torch.device(device)
+        self.encoder_cache = LRUCache(encoder_cache_bytes, sizeof=_tensor_sizeof) if encoder_cache_bytes else None
+        # Fast tokenizers raise "Already borrowed" when used from several threads at once
+        self._tokenizer_lock = threading.Lock()
+
+    @classmethod
+    def load(cls, model_path, device='cpu', **options):
+        model = load_model(model_path).to(device)
+        return cls(model, AutoTokenizer.from_pretrained(model_path), device, **options)
+
+    def tokenize(self, texts, max_input_length=MAX_INPUT_LENGTH):
+        with timed('tokenize'), self._tokenizer_lock:
+            inputs = self.tokenizer(texts, return_tensors="pt", max_length=max_input_length, truncation=True, padding=True)
+        return {key: value.to(self.device) for key, value in inputs.items()}
+
+    def encode(self, inputs):
+        """
+        Encoder outputs of a padded batch, only running the encoder on inputs that are not cached.
+
+        :param inputs: Tokenized batch, padded on the right as BART tokenizers do.
+        :return: A BaseModelOutput for the whole batch.
+        """
+        if self.encoder_cache is None:
+            with timed('encode'):
+                return self.model.get_encoder()(input_ids=inputs["input_ids"],
+                                                attention_mask=inputs["attention_mask"], return_dict=True)
+
+        lengths = inputs["attention_mask"].sum(dim=1).tolist()
+        keys = [hashlib.sha256(ids[:length].cpu().numpy().tobytes()).hexdigest()
+                for ids, length in zip(inputs["input_ids"], lengths)]
+        states = [self.encoder_cache.get(key) for key in keys]
+        missing = [i for i, state in enumerate(states) if state is None]
+        ENCODER_CACHE_HITS.inc(len(keys) - len(missing))
+        ENCODER_CACHE_MISSES.inc(len(missing))
+        if missing:
+            rows = torch.tensor(missing, device=self.device)
+            width = max(lengths[i] for i in missing)
+            with timed('encode'):
+                hidden = self.model.get_encoder()(input_ids=inputs["input_ids"][rows, :width],
+                                                  attention_mask=inputs["attention_mask"][rows, :width],
+                                                  return_dict=True).last_hidden_state
+            for row, i in enumerate(missing):
+                # Copies, so a cached entry doesn't keep the whole batch's hidden states alive
+                states[i] = hidden[row, :lengths[i]].clone()
+                self.encoder_cache.put(keys[i], states[i])
+        if len(states) == 1:
+            return BaseModelOutput(last_hidden_state=states[0].unsqueeze(0))
+        # Padding positions are masked out by the attention mask, zeros are as good as anything
+        hidden = states[0].new_zeros((len(states), inputs["input_ids"].shape[1], states[0].shape[-1]))
+        for i, state in enumerate(states):
+            hidden[i, :state.shape[0]] = state
+        return BaseModelOutput(last_hidden_state=hidden)
+
+    def generate(self, inputs, generation):
+        """Runs the encoder once, or reuses its cached outputs, then beam search over them, timing each separately."""
+        encoder_outputs = self.encode(inputs)
+        with timed('beam_search'):
+            return self.model.generate(inputs["input_ids"], attention_mask=inputs["attention_mask"],
+                                       encoder_outputs=encoder_outputs, **generation)
+
+    def summarize(self, texts, **generation):
+        """
+        Summarizes a batch of texts in a single padded generate call.
+
+        :param texts: The texts to summarize.
+        :param generation: Overrides of DEFAULT_GENERATION.
+        :return: One summary per text.
+        """
+        inputs = self.tokenize(texts)
+        with torch.inference_mode():
+            summary_ids = self.generate(inputs, {**DEFAULT_GENERATION, **generation})
+        INPUT_TOKENS.inc(int(inputs["attention_mask"].sum()))
+        OUTPUT_TOKENS.inc(int((summary_ids != self.tokenizer.pad_token_id).sum()))
+        with timed('decode'), self._tokenizer_lock:
+            return self.tokenizer.batch_decode(summary_ids, skip_special_tokens=True)
+
+    def stream(self, text, mode='greedy', timeout=60, **generation):
+        """
+        Summarizes one text, yielding the summary as text fragments while it is decoded.
+
+        Generation runs in a separate thread feeding a TextIteratorStreamer;
+        closing the generator stops it at the next token.
+
+        :param text: The text to summarize, within the input window.
+        :param mode: Key of STREAM_GENERATION: 'greedy' or 'sample'.
+        :param timeout: Seconds to wait for the next fragment before giving up.
+        :param generation: Overrides of the generation settings.
+        :return: A generator of text fragments.
+        """
+        if mode not in STREAM_GENERATION:
+            raise ValueError(f"Unknown streaming mode '{mode}', expected one of {', '.join(STREAM_GENERATION)}")
+        inputs = self.tokenize([text])
+        streamer = TextIteratorStreamer(_LockedDecoder(self.tokenizer, self._tokenizer_lock), skip_prompt=True,
+                                        timeout=timeout, skip_special_tokens=True)
+        cancelled = threading.Event()
+        settings = {'max_length': DEFAULT_GENERATION['max_length'], **STREAM_GENERATION[mode], **generation,
+                    'streamer': streamer, 'stopping_criteria': StoppingCriteriaList([_StopWhenSet(cancelled)])}
+        errors = []
+
+        def run():
+            try:
+                with torch.inference_mode():
+                    summary_ids = self.generate(inputs, settings)
+                INPUT_TOKENS.inc(int(inputs["attention_mask"].sum()))
+                OUTPUT_TOKENS.inc(int((summary_ids != self.tokenizer.pad_token_id).sum()))
+            except Exception as e:
+                errors.append(e)
+                streamer.end()
+
+        thread = threading.Thread(target=run, name='stream-generate', daemon=True)
+        thread.start()
+        try:
+            for fragment in streamer:
+                if fragment:
+                    yield fragment
+        finally:
+            cancelled.set()
+            thread.join()
+        if errors:
+            raise errors[0]
+
+    def count_tokens(self, text):
+        """Untruncated token count of a text, without special tokens."""
+        with timed('count_tokens'), self._tokenizer_lock:
+            return len(self.tokenizer(text, add_special_tokens=False)["input_ids"])
+
+    def memory_bytes(self):
+        """Size of the model weights in bytes."""
+        return sum(t.numel() * t.element_size() for t in self.model.state_dict().values() if torch.is_tensor(t))
+
+
+class QuantizedBackend(TorchBackend):
+    """PyTorch inference with the Linear layers dynamically quantized to int8."""
+
+    name = 'int8'
+
+    @classmethod
+    def load(cls, model_path, device='cpu', **options):
+        model = load_model(model_path)
+        model = torch.ao.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+        return cls(model, AutoTokenizer.from_pretrained(model_path), 'cpu', **options)
+
+    def memory_bytes(self):
+        total = 0
+        for value in self.model.state_dict().values():
+            if torch.is_tensor(value):
+                total += value.numel() * value.element_size()
+            elif isinstance(value, tuple):
+                # Packed quantized Linear params are stored as (weight, bias) tuples
+                total += sum(t.numel() * t.element_size() for t in value if torch.is_tensor(t))
+        return total
+
+
+class OnnxBackend(TorchBackend):
+    """
+    ONNX Runtime inference through Optimum.
+
+    The model is exported once to ``<model_path>/onnx`` with separate encoder,
+    decoder and decoder-with-past graphs, so beam search reuses the KV cache
+    instead of re-running the decoder over the whole prefix at every step.
+    The encoder runs inside the ONNX generate call, so its outputs are never cached.
+    """
+
+    name = 'onnx'
+
+    @classmethod
+    def load(cls, model_path, device='cpu', **options):
+        try:
+            from optimum.onnxruntime import ORTModelForSeq2SeqLM
+        except ImportError:
+            raise RuntimeError("The onnx backend requires optimum[onnxruntime]")
+
+        onnx_path = os.path.join(model_path, 'onnx')
+        if os.path.isdir(onnx_path):
+            model = ORTModelForSeq2SeqLM.from_pretrained(onnx_path, use_cache=True)
+        else:
+            logger.info("Exporting %s to ONNX...", model_path)
+            model = ORTModelForSeq2SeqLM.from_pretrained(model_path, export=True, use_cache=True)
+            model.save_pretrained(onnx_path)
+        return cls(model, AutoTokenizer.from_pretrained(model_path), 'cpu')
+
+    def generate(self, inputs, generation):
+        # The encoder is a separate ONNX session run inside generate, so it can't be timed on its own
+        with timed('generate'):
+            return self.model.generate(inputs["input_ids"], attention_mask=inputs["attention_mask"], **generation)
+
+    def memory_bytes(self):
+        onnx_path = self.model.model_save_dir
+        return sum(
+            os.path.getsize(os.path.join(onnx_path, name))
+            for name in os.listdir(onnx_path) if name.endswith(('.onnx', '.onnx_data'))
+        )
+
+
+BACKENDS = {backend.name: backend for backend in (TorchBackend, QuantizedBackend, OnnxBackend)}
+
+
+def load_backend(name, model_path, device=None, **options):
+    """
+    Loads a model with the given inference backend.
+
+    :param name: One of BACKENDS: 'torch', 'int8' or 'onnx'.
+    :param model_path: Directory of the fine-tuned model.
+    :param device: Device for the torch backend (defaults to CUDA when available).
+    :param options: Backend keyword arguments, e.g. encoder_cache_bytes.
+    :return: A backend instance.
+    """
+    if name not in BACKENDS:
+        raise ValueError(f"Unknown inference backend '{name}', expected one of {', '.join(BACKENDS)}")
+    device = device or ('cuda' if torch.cuda.is_available() else 'cpu')
+    logger.info("Loading %s with the %s backend", model_path, name)
+    return BACKENDS[name].load(model_path, device, **options)
@@ -0,0 +1,168 @@
+import logging
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+from .metrics import REGISTRY, BATCH_SIZE_BUCKETS, LATENCY_BUCKETS, profiling
+
+logger = logging.getLogger(__name__)
+
+_STOP = object()
+
+
+class _Request:
+    __slots__ = ('text', 'params', 'length', 'future', 'enqueued')
+
+    def __init__(self, text, params, length):
+        self.text = text
+        self.params = params
+        self.length = length
+        self.future = Future()
+        self.enqueued = time.monotonic()
+
+
+def _params_key(params):
+    return tuple(sorted(params.items()))
+
+
+class MicroBatcher:
+    """
+    Collects concurrent summarization requests and runs them as padded batches.
+
+    A single dispatcher thread waits for the first pending request, keeps
+    collecting for up to ``max_wait_ms`` (or until ``max_pending`` requests are
+    waiting), then sorts what it gathered by generation parameters and token
+    length and calls ``generate_fn`` once per group of similar lengths.
+
+    :param generate_fn: Callable ``generate_fn(texts, **params) -> list[str]`` returning one result per text.
+    :param max_batch_size: Maximum number of texts per generate_fn call.
+    :param max_wait_ms: How long to keep collecting after the first request arrives.
+    :param max_pending: Number of requests that closes the collection window early.
+    :param length_fn: Callable returning the (approximate) token length of a text.
+    :param bucket_width: Maximum length difference between the shortest and longest text of a batch.
+    :param name: Label of this batcher's metrics in the process-wide registry.
+    """
+
+    def __init__(self, generate_fn, max_batch_size=8, max_wait_ms=20, max_pending=None,
+                 length_fn=None, bucket_width=128, name='default'):
+        self.generate_fn = generate_fn
+        self.max_batch_size = max(1, int(max_batch_size))
+        self.max_wait = max_wait_ms / 1000.0
+        self.max_pending = max_pending or self.max_batch_size * 4
+        self.length_fn = length_fn or (lambda text: len(text.split()))
+        self.bucket_width = bucket_width
+        self.batch_sizes = REGISTRY.histogram('summarizer_batch_size', 'Texts per generate call',
+                                              BATCH_SIZE_BUCKETS, batcher=name)
+        self.wait_times = REGISTRY.histogram('summarizer_batch_wait_seconds', 'Time a text waits to be batched',
+                                             LATENCY_BUCKETS, batcher=name)
+        self.batch_latencies = REGISTRY.histogram('summarizer_batch_seconds', 'Duration of a generate call',
+                                                  LATENCY_BUCKETS, batcher=name)
+        # A batcher replacing another one of the same name (a swapped model) takes over its gauge
+        REGISTRY.gauge('summarizer_batch_queue_depth', 'Texts waiting to be batched', batcher=name).fn = self.depth
+        self._queue = queue.Queue()
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def _ensure_started(self):
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._loop, name='micro-batcher', daemon=True)
+                self._thread.start()
+
+    def submit(self, text, **params):
+        """
+        Queue a text for summarization.
+
+        :param text: The text to summarize.
+        :param params: Generation parameters; only requests with equal parameters share a batch.
+        :return: A concurrent.futures.Future resolving to the summary.
+        """
+        request = _Request(text, params, self.length_fn(text))
+        self._ensure_started()
+        self._queue.put(request)
+        return request.future
+
+    def summarize(self, text, timeout=None, **params):
+        """Blocking variant of submit()."""
+        return self.submit(text, **params).result(timeout=timeout)
+
+    def _loop(self):
+        while True:
+            first = self._queue.get()
+            if first is _STOP:
+                return
+            pending = [first]
+            stopping = False
+            deadline = first.enqueued + self.max_wait
+            while len(pending) < self.max_pending:
+                remaining = deadline - time.monotonic()
+                try:
+                    # Past the deadline (e.g. with a backlog), still take whatever is already queued
+                    request = self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if request is _STOP:
+                    stopping = True
+                    break
+                pending.append(request)
+
+            for batch in self._group(pending):
+                self._run(batch)
+            if stopping:
+                return
+
+    def _group(self, pending):
+        """Split the collected requests into batches of equal params and similar length."""
+        pending.sort(key=lambda r: (_params_key(r.params), r.length))
+        batch = []
+        for request in pending:
+            if batch and (
+                len(batch) >= self.max_batch_size
+                or request.params != batch[0].params
+                or request.length - batch[0].length > self.bucket_width
+            ):
+                yield batch
+                batch = []
+            batch.append(request)
+        if batch:
+            yield batch
+
+    def _run(self, batch):
+        started = time.monotonic()
+        for request in batch:
+            self.wait_times.observe(started - request.enqueued)
+        self.batch_sizes.observe(len(batch))
+        try:
+            # Stage timings of the batch, handed to every request so callers can profile them
+            with profiling() as batch_profile:
+                results = self.generate_fn([r.text for r in batch], **batch[0].params)
+            if len(results) != len(batch):
+                raise RuntimeError(f'generate_fn returned {len(results)} results for {len(batch)} inputs')
+        except Exception as e:
+            logger.exception("Batch of %d failed", len(batch))
+            for request in batch:
+                request.future.set_exception(e)
+        else:
+            for request, result in zip(batch, results):
+                request.future.profile = {'batch_wait': started - request.enqueued, **batch_profile}
+                request.future.set_result(result)
+        self.batch_latencies.observe(time.monotonic() - started)
+
+    def depth(self):
+        """Number of requests waiting to be collected into a batch."""
+        return self._queue.qsize()
+
+    def stats(self):
+        """Batch-size, queue wait-time and batch latency histograms."""
+        return {
+            'batch_size': self.batch_sizes.snapshot(),
+            'wait_seconds': self.wait_times.snapshot(),
+            'batch_seconds': self.batch_latencies.snapshot(),
+        }
+
+    def close(self, wait=True):
+        """Stop the dispatcher once the requests already queued are processed."""
+        self._queue.put(_STOP)
+        if wait and self._thread is not None:
+            self._thread.join()
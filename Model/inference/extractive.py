@@ -0,0 +1,201 @@
+import re
+
+import numpy as np
+from sklearn.feature_extraction.text import TfidfVectorizer
+
+from .metrics import timed
+
+SENTENCE_BOUNDARY = re.compile(r'(?<=[.!?])\s+(?=[A-Z0-9(\[])')
+WORD = re.compile(r'\S+')
+
+# Lines this short without closing punctuation are section titles, not sentences
+MAX_TITLE_WORDS = 12
+
+SENTENCE_ENDINGS = ('.', '!', '?')
+
+# Weights of the TextRank centrality, the TF-IDF similarity to the whole document and
+# the position of the sentence in its section, each scaled to [0, 1]
+SCORE_WEIGHTS = (0.5, 0.3, 0.2)
+
+
+def count_words(text):
+    return len(text.split())
+
+
+def _paragraphs(text):
+    lines = [line.strip() for line in text.split('\n')]
+    filled = [line for line in lines if line]
+    if sum(not line.endswith(SENTENCE_ENDINGS) for line in filled) * 2 <= len(filled):
+        return filled
+    # Most lines stop mid-sentence: hard-wrapped text such as extracted PDF pages, where
+    # only blank lines separate paragraphs
+    paragraphs = ' '.join(line or '\n' for line in lines).split('\n')
+    return [paragraph.strip() for paragraph in paragraphs if paragraph.strip()]
+
+
+def split_sentences(text):
+    """
+    Splits a document into sentences, keeping track of the section each belongs to.
+
+    Follows the newline-delimited paragraphs and titles produced by
+    extract_text_with_spaces_and_newlines: a title starts a new section and is
+    not a candidate sentence itself, and no sentence spans two lines. Hard-wrapped
+    text is first rejoined into paragraphs.
+
+    :param text: The document text.
+    :return: (sentences, paragraphs, positions): the sentences, and for each the
+        index of its paragraph and its rank within its section.
+    """
+    sentences, paragraphs, positions = [], [], []
+    position = 0
+    for index, paragraph in enumerate(_paragraphs(text)):
+        if count_words(paragraph) <= MAX_TITLE_WORDS and not paragraph.endswith(SENTENCE_ENDINGS):
+            position = 0
+            continue
+        for sentence in SENTENCE_BOUNDARY.split(paragraph):
+            sentences.append(sentence)
+            paragraphs.append(index)
+            positions.append(position)
+            position += 1
+    return sentences, np.array(paragraphs), np.array(positions)
+
+
+def textrank(similarity, damping=0.85, tolerance=1e-6, max_iterations=100):
+    """
+    Centrality of each sentence by power iteration over the sentence similarity graph.
+
+    :param similarity: Dense (n, n) matrix of non-negative similarities with a zero diagonal.
+    :return: The stationary rank of every sentence, summing to 1.
+    """
+    n = similarity.shape[0]
+    weights = similarity.sum(axis=1, keepdims=True)
+    # A sentence similar to no other one links to every sentence alike
+    transition = np.divide(similarity, weights, out=np.full_like(similarity, 1.0 / n), where=weights > 0)
+    rank = np.full(n, 1.0 / n)
+    for _ in range(max_iterations):
+        updated = (1 - damping) / n + damping * (rank @ transition)
+        converged = np.abs(updated - rank).sum() < tolerance
+        rank = updated
+        if converged:
+            break
+    return rank
+
+
+def _rescale(values):
+    spread = values.max() - values.min()
+    return (values - values.min()) / spread if spread > 0 else np.ones_like(values)
+
+
+class ExtractiveSummarizer:
+    """
+    Selects the most salient sentences of a document within a token budget.
+
+    Sentences are vectorized with TF-IDF fitted on the document itself, and
+    scored by their TextRank centrality in the cosine similarity graph, their
+    similarity to the document centroid and their position in their section.
+    They are then taken in score order, skipping near-duplicates of sentences
+    already taken, until the budget is spent, and returned in document order.
+
+    Nothing here touches the model, so it runs in milliseconds.
+
+    :param count_tokens: Callable returning the number of tokens of a string; counts words when None.
+    :param redundancy: Sentences more similar than this to a selected one are skipped.
+    :param damping: TextRank damping factor.
+    """
+
+    def __init__(self, count_tokens=None, redundancy=0.6, damping=0.85):
+        self.count_tokens = count_tokens or count_words
+        self.redundancy = redundancy
+        self.damping = damping
+
+    def score(self, sentences, positions):
+        """
+        Salience of every sentence.
+
+        :return: (scores, similarity), the (n,) scores and the (n, n) cosine similarity matrix.
+        """
+        vectorizer = TfidfVectorizer(stop_words='english', sublinear_tf=True)
+        try:
+            # Sparse (n, vocabulary) matrix with L2-normalized rows
+            tfidf = vectorizer.fit_transform(sentences)
+        except ValueError:
+            # Only stop words: fall back to the order of the sentences
+            n = len(sentences)
+            return 1.0 / (1.0 + np.arange(n)), np.zeros((n, n))
+        similarity = (tfidf @ tfidf.T).toarray()
+        np.fill_diagonal(similarity, 0.0)
+
+        centroid = np.asarray(tfidf.mean(axis=0)).ravel()
+        norm = np.linalg.norm(centroid)
+        coverage = tfidf @ (centroid / norm) if norm > 0 else np.zeros(len(sentences))
+        features = (textrank(similarity, self.damping), coverage, 1.0 / np.sqrt(1.0 + positions))
+        scores = sum(weight * _rescale(feature) for weight, feature in zip(SCORE_WEIGHTS, features))
+        return scores, similarity
+
+    def truncate(self, text, max_tokens):
+        """
+        The longest beginning of a text that fits in max_tokens, cut after a word.
+
+        Whitespace between the words kept, line breaks included, is left as it is.
+        """
+        if self.count_tokens(text) <= max_tokens:
+            return text
+        ends = [match.end() for match in WORD.finditer(text)]
+        # Binary search on the number of words kept; a single word may already exceed the budget
+        low, high = 0, len(ends) - 1
+        while low < high:
+            middle = (low + high + 1) // 2
+            if self.count_tokens(text[:ends[middle - 1]]) <= max_tokens:
+                low = middle
+            else:
+                high = middle - 1
+        return text[:ends[low - 1]] if low else ''
+
+    def select(self, text, max_tokens):
+        """
+        The most salient sentences of a document that fit in max_tokens, in document order.
+
+        Sentences of the same paragraph stay on one line, so the result keeps
+        the paragraph structure of the input. When the best sentence exceeds the
+        budget on its own, or there is nothing to choose from (a single sentence,
+        only titles), the result is cut to the budget on word boundaries.
+
+        :param text: The document text.
+        :param max_tokens: Token budget of the result.
+        :return: The condensed text.
+        """
+        with timed('extract'):
+            sentences, paragraphs, positions = split_sentences(text)
+            if len(sentences) <= 1:
+                return self.truncate(text.strip(), max_tokens)
+            scores, similarity = self.score(sentences, positions)
+            lengths = np.array([self.count_tokens(sentence) for sentence in sentences])
+
+            selected, redundant, budget = [], [], max_tokens
+            for i in np.argsort(-scores, kind='stable'):
+                # One separator token between consecutive sentences
+                cost = lengths[i] + (1 if selected else 0)
+                if cost > budget:
+                    if not selected:
+                        return self.truncate(sentences[i], max_tokens)
+                    continue
+                if selected and similarity[i, selected].max() > self.redundancy:
+                    redundant.append(i)
+                    continue
+                selected.append(i)
+                budget -= cost
+            # Near-duplicates only fill what budget is left once every distinct sentence is in
+            for i in redundant:
+                if lengths[i] + 1 <= budget:
+                    selected.append(i)
+                    budget -= lengths[i] + 1
+
+            selected.sort()
+            lines, previous = [], None
+            for i in selected:
+                if paragraphs[i] == previous:
+                    lines[-1] += ' ' + sentences[i]
+                else:
+                    lines.append(sentences[i])
+                previous = paragraphs[i]
+            return '\n'.join(lines)
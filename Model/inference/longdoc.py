@@ -0,0 +1,141 @@
+import hashlib
+import re
+
+from .lru import LRUCache
+
+SENTENCE_BOUNDARY = re.compile(r'(?<=[.!?])\s+')
+
+
+def _pack(pieces, lengths, max_tokens, separator_tokens=1):
+    """Greedily concatenate consecutive pieces into groups of at most max_tokens."""
+    groups, current, current_tokens = [], [], 0
+    for piece, length in zip(pieces, lengths):
+        if current and current_tokens + separator_tokens + length > max_tokens:
+            groups.append(current)
+            current, current_tokens = [], 0
+        current.append(piece)
+        current_tokens += length + (separator_tokens if len(current) > 1 else 0)
+    if current:
+        groups.append(current)
+    return groups
+
+
+def _split_oversized(text, count_tokens, max_tokens):
+    """Split a single paragraph that does not fit on sentence, then word boundaries."""
+    sentences = SENTENCE_BOUNDARY.split(text)
+    if len(sentences) == 1:
+        words = text.split()
+        if len(words) <= 1:
+            return [text]
+        # Halve on words until each part fits
+        middle = len(words) // 2
+        halves = [' '.join(words[:middle]), ' '.join(words[middle:])]
+        return [part for half in halves for part in _split_to_fit(half, count_tokens, max_tokens)]
+    lengths = [count_tokens(sentence) for sentence in sentences]
+    chunks = []
+    for group in _pack(sentences, lengths, max_tokens):
+        chunk = ' '.join(group)
+        chunks.extend(_split_to_fit(chunk, count_tokens, max_tokens) if len(group) == 1 else [chunk])
+    return chunks
+
+
+def _split_to_fit(text, count_tokens, max_tokens):
+    if count_tokens(text) <= max_tokens:
+        return [text]
+    return _split_oversized(text, count_tokens, max_tokens)
+
+
+def split_into_chunks(text, count_tokens, max_tokens=1022):
+    """
+    Splits a document into chunks of at most max_tokens tokens.
+
+    Chunks follow the newline-delimited paragraph, section and title boundaries
+    produced by extract_text_with_spaces_and_newlines; paragraphs that are too
+    long on their own are split on sentences, and sentences on words.
+
+    :param text: The document text.
+    :param count_tokens: Callable returning the number of tokens of a string, without special tokens.
+    :param max_tokens: Token budget of a chunk.
+    :return: A list of chunk strings in document order.
+    """
+    paragraphs = []
+    for line in text.split('\n'):
+        line = line.strip()
+        if line:
+            paragraphs.extend(_split_to_fit(line, count_tokens, max_tokens))
+    lengths = [count_tokens(paragraph) for paragraph in paragraphs]
+    return ['\n'.join(group) for group in _pack(paragraphs, lengths, max_tokens)]
+
+
+class LongDocumentSummarizer:
+    """
+    Map-reduce summarization for documents longer than the model's input window.
+
+    The map phase summarizes every chunk with fixed generation settings, in
+    batches of ``map_batch_size`` so that peak memory does not grow with the
+    document, and caches each partial summary by chunk content. The reduce
+    phase summarizes the concatenated partial summaries with the caller's
+    settings, so changing them re-runs only the reduce pass.
+
+    :param generate_fn: Callable ``generate_fn(texts, **params) -> list[str]``.
+    :param count_tokens: Callable returning the number of tokens of a string, without special tokens.
+    :param max_tokens: Input budget of a single generate call.
+    :param map_batch_size: Number of chunks summarized per generate call in the map phase.
+    :param cache_bytes: Byte budget of the chunk summary cache.
+    :param namespace: Prefix of the chunk cache keys, e.g. the model version.
+    """
+
+    def __init__(self, generate_fn, count_tokens, max_tokens=1022, map_batch_size=4,
+                 cache_bytes=32 * 1024 * 1024, namespace=''):
+        self.generate_fn = generate_fn
+        self.count_tokens = count_tokens
+        self.max_tokens = max_tokens
+        self.map_batch_size = max(1, map_batch_size)
+        self.chunk_cache = LRUCache(cache_bytes)
+        self.namespace = namespace
+
+    def _chunk_key(self, chunk):
+        return hashlib.sha256(f'{self.namespace}\0{chunk}'.encode('utf-8')).hexdigest()
+
+    def map(self, chunks):
+        """
+        Summarizes chunks with the default generation settings, reusing cached partial summaries.
+
+        :param chunks: Chunk strings, each within the token budget.
+        :return: One partial summary per chunk, in order.
+        """
+        keys = [self._chunk_key(chunk) for chunk in chunks]
+        partials = [self.chunk_cache.get(key) for key in keys]
+        missing = [i for i, partial in enumerate(partials) if partial is None]
+        for start in range(0, len(missing), self.map_batch_size):
+            indices = missing[start:start + self.map_batch_size]
+            for i, partial in zip(indices, self.generate_fn([chunks[i] for i in indices])):
+                partials[i] = partial
+                self.chunk_cache.put(keys[i], partial)
+        return partials
+
+    def condense(self, text):
+        """
+        Summarizes the chunks of a document until what is left fits in a single input window.
+
+        :param text: The document text.
+        :return: The text the final pass summarizes.
+        """
+        chunks = split_into_chunks(text, self.count_tokens, self.max_tokens)
+        while len(chunks) > 1:
+            reduced = split_into_chunks('\n'.join(self.map(chunks)), self.count_tokens, self.max_tokens)
+            if len(reduced) >= len(chunks):
+                # Partial summaries are not getting any shorter, let the final pass truncate
+                return '\n'.join(reduced)
+            chunks = reduced
+        return chunks[0] if chunks else text
+
+    def summarize(self, text, **params):
+        """
+        Summarizes a document of any length.
+
+        :param text: The document text.
+        :param params: Generation parameters of the final (reduce) pass.
+        :return: The summary.
+        """
+        return self.generate_fn([self.condense(text)], **params)[0]
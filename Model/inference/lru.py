@@ -0,0 +1,80 @@
+import sys
+import threading
+from collections import OrderedDict
+
+
+def default_sizeof(key, value):
+    """Approximate footprint of a cached str/bytes entry, in bytes."""
+    if isinstance(value, str):
+        value_size = len(value.encode('utf-8'))
+    elif isinstance(value, (bytes, bytearray)):
+        value_size = len(value)
+    else:
+        value_size = sys.getsizeof(value)
+    return value_size + len(key) + 64
+
+
+class LRUCache:
+    """
+    Thread-safe least-recently-used cache bounded by a byte budget.
+
+    :param max_bytes: Total size budget; the least recently used entries are evicted beyond it.
+    :param sizeof: Callable ``sizeof(key, value)`` returning the size of an entry in bytes.
+    """
+
+    def __init__(self, max_bytes, sizeof=default_sizeof):
+        self.max_bytes = max_bytes
+        self.sizeof = sizeof
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._bytes = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return default
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def put(self, key, value):
+        size = self.sizeof(key, value)
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self._bytes -= previous[1]
+            self._entries[key] = (value, size)
+            self._bytes += size
+            while self._bytes > self.max_bytes:
+                _, (_, evicted_size) = self._entries.popitem(last=False)
+                self._bytes -= evicted_size
+                self.evictions += 1
+
+    def __contains__(self, key):
+        with self._lock:
+            return key in self._entries
+
+    def __len__(self):
+        return len(self._entries)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def stats(self):
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'entries': len(self._entries),
+            'bytes': self._bytes,
+            'max_bytes': self.max_bytes,
+        }
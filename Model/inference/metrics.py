@@ -0,0 +1,230 @@
+import contextvars
+import threading
+import time
+from contextlib import contextmanager
+
+# Default bucket boundaries, in seconds, for latency histograms
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.02, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+# Default bucket boundaries for batch-size histograms
+BATCH_SIZE_BUCKETS = (1, 2, 4, 8, 16, 32, 64)
+
+
+class Histogram:
+    """
+    Thread-safe cumulative histogram with fixed bucket boundaries.
+
+    :param buckets: Increasing upper bounds of the buckets; an implicit +Inf bucket is added.
+    """
+
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = tuple(sorted(buckets))
+        self._counts = [0] * (len(self.buckets) + 1)
+        self._sum = 0.0
+        self._count = 0
+        self._lock = threading.Lock()
+
+    def observe(self, value):
+        index = len(self.buckets)
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                index = i
+                break
+        with self._lock:
+            self._counts[index] += 1
+            self._sum += value
+            self._count += 1
+
+    def snapshot(self):
+        """
+        Returns the cumulative bucket counts, total count and sum.
+
+        :return: A dict with 'buckets' as a list of (upper_bound, cumulative_count) pairs.
+        """
+        with self._lock:
+            counts = list(self._counts)
+            total, count = self._sum, self._count
+        cumulative, running = [], 0
+        for bound, n in zip(self.buckets + (float('inf'),), counts):
+            running += n
+            cumulative.append((bound, running))
+        return {'buckets': cumulative, 'count': count, 'sum': total}
+
+
+class Counter:
+    """Monotonically increasing value."""
+
+    def __init__(self):
+        self.value = 0
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1):
+        with self._lock:
+            self.value += amount
+
+
+class Gauge:
+    """Value that goes up and down, or is read from a callback at scrape time."""
+
+    def __init__(self, fn=None):
+        self.fn = fn
+        self._value = 0
+        self._lock = threading.Lock()
+
+    @property
+    def value(self):
+        return self.fn() if self.fn is not None else self._value
+
+    def set(self, value):
+        self._value = value
+
+    def inc(self, amount=1):
+        with self._lock:
+            self._value += amount
+
+    def dec(self, amount=1):
+        self.inc(-amount)
+
+
+class CallbackCounter:
+    """Counter whose value is read from a callback, e.g. counters kept by another object."""
+
+    def __init__(self, fn):
+        self.fn = fn
+
+    @property
+    def value(self):
+        return self.fn()
+
+
+# Escapes of the text exposition format: backslashes and line feeds everywhere, double quotes in label values
+_HELP_ESCAPES = str.maketrans({'\\': '\\\\', '\n': '\\n'})
+_LABEL_ESCAPES = str.maketrans({'\\': '\\\\', '\n': '\\n', '"': '\\"'})
+
+
+def _format_labels(labels, extra=None):
+    items = list(labels) + ([extra] if extra else [])
+    if not items:
+        return ''
+    return '{' + ','.join(f'{key}="{str(value).translate(_LABEL_ESCAPES)}"' for key, value in items) + '}'
+
+
+def _format_value(value):
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Registry:
+    """
+    Collection of named metric families rendered in the Prometheus text format.
+
+    Metrics are created on first use and shared afterwards, so any module can
+    ask for the same name and labels and get the same instance.
+    """
+
+    def __init__(self):
+        self._families = {}
+        self._lock = threading.Lock()
+
+    def _get(self, kind, name, help_text, labels, factory):
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            family = self._families.setdefault(name, (kind, help_text, {}))
+            if family[0] != kind:
+                raise ValueError(f'Metric {name} is already registered as a {family[0]}')
+            metrics = family[2]
+            if key not in metrics:
+                metrics[key] = factory()
+            return metrics[key]
+
+    def counter(self, name, help_text='', fn=None, **labels):
+        return self._get('counter', name, help_text, labels, lambda: CallbackCounter(fn) if fn else Counter())
+
+    def gauge(self, name, help_text='', fn=None, **labels):
+        return self._get('gauge', name, help_text, labels, lambda: Gauge(fn))
+
+    def histogram(self, name, help_text='', buckets=LATENCY_BUCKETS, **labels):
+        return self._get('histogram', name, help_text, labels, lambda: Histogram(buckets))
+
+    def render(self):
+        """All metrics in the Prometheus text exposition format (version 0.0.4)."""
+        with self._lock:
+            families = [(name, kind, help_text, list(metrics.items()))
+                        for name, (kind, help_text, metrics) in sorted(self._families.items())]
+        lines = []
+        for name, kind, help_text, metrics in families:
+            lines.append(f'# HELP {name} {help_text.translate(_HELP_ESCAPES)}')
+            lines.append(f'# TYPE {name} {kind}')
+            for labels, metric in metrics:
+                if kind == 'histogram':
+                    snapshot = metric.snapshot()
+                    for bound, count in snapshot['buckets']:
+                        lines.append(f'{name}_bucket{_format_labels(labels, ("le", _format_value(bound)))} {count}')
+                    lines.append(f'{name}_sum{_format_labels(labels)} {_format_value(snapshot["sum"])}')
+                    lines.append(f'{name}_count{_format_labels(labels)} {snapshot["count"]}')
+                else:
+                    lines.append(f'{name}{_format_labels(labels)} {_format_value(metric.value)}')
+        return '\n'.join(lines) + '\n'
+
+
+# Process-wide registry shared by the inference package and the API
+REGISTRY = Registry()
+
+STAGE_SECONDS = 'summarizer_stage_seconds'
+
+_profile = contextvars.ContextVar('profile', default=None)
+_stage_histograms = {}
+
+
+def _stage_histogram(stage):
+    histogram = _stage_histograms.get(stage)
+    if histogram is None:
+        histogram = REGISTRY.histogram(STAGE_SECONDS, 'Time spent in each stage of a summary request', stage=stage)
+        _stage_histograms[stage] = histogram
+    return histogram
+
+
+def record_stage(stage, seconds):
+    """Observes a stage duration, and adds it to the active profile if there is one."""
+    _stage_histogram(stage).observe(seconds)
+    profile = _profile.get()
+    if profile is not None:
+        profile[stage] = profile.get(stage, 0.0) + seconds
+
+
+@contextmanager
+def timed(stage):
+    """Times the enclosed block as one occurrence of stage."""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        record_stage(stage, time.perf_counter() - started)
+
+
+@contextmanager
+def profiling(profile=None):
+    """
+    Collects the stage durations recorded by the current thread into a dict.
+
+    :param profile: Dict to collect into; a new one is created when None.
+    """
+    profile = {} if profile is None else profile
+    token = _profile.set(profile)
+    try:
+        yield profile
+    finally:
+        _profile.reset(token)
+
+
+def merge_profile(stages):
+    """Adds stage durations measured elsewhere (e.g. by a batch worker) to the active profile."""
+    profile = _profile.get()
+    if profile is None or not stages:
+        return
+    for stage, seconds in stages.items():
+        profile[stage] = profile.get(stage, 0.0) + seconds
+
+
+def profiling_active():
+    return _profile.get() is not None
@@ -0,0 +1,453 @@
+import json
+import logging
+import os
+import threading
+import time
+
+from .metrics import REGISTRY
+from .runtime import STATE_READY, ModelRuntime, model_version
+
+logger = logging.getLogger(__name__)
+
+# Weight files of a model directory, for the memory estimate of models that are not loaded yet
+WEIGHT_FILES = ('model.safetensors', 'pytorch_model.bin')
+
+# ModelRuntime keyword arguments a config entry may set
+RUNTIME_OPTIONS = ('device', 'max_batch_size', 'max_wait_ms', 'warmup', 'precompress_tokens', 'encoder_cache_bytes')
+
+# Weight of the latest summary in the moving average of a model's latency
+LATENCY_SMOOTHING = 0.2
+
+
+def weights_bytes(model_path):
+    """Size of the weight files of a model directory."""
+    paths = [os.path.join(model_path, name) for name in WEIGHT_FILES]
+    return sum(os.path.getsize(path) for path in paths if os.path.exists(path))
+
+
+class ModelSpec:
+    """
+    One model of the registry config.
+
+    :param name: Unique name, recorded with every summary the model produces.
+    :param path: Directory of the model.
+    :param backend: Inference backend name, see inference.backends.BACKENDS.
+    :param max_input_tokens: Longest input, in tokens, routed to this model; None for any length.
+    :param latency_ms: Expected duration of one summary, used for routing until it is measured.
+    :param workers: Inference worker threads of the model's pool.
+    :param version: Identifies the model's summaries in caches; derived from the model files when None.
+    :param options: ModelRuntime keyword arguments, e.g. max_batch_size or encoder_cache_bytes.
+    """
+
+    def __init__(self, name, path, backend='torch', max_input_tokens=None, latency_ms=None, workers=2,
+                 version=None, **options):
+        unknown = set(options) - set(RUNTIME_OPTIONS)
+        if unknown:
+            raise ValueError(f"Unknown option(s) for model {name}: {', '.join(sorted(unknown))}")
+        if max_input_tokens is not None and max_input_tokens < 1:
+            raise ValueError(f'max_input_tokens of model {name} must be positive')
+        self.name = name
+        self.path = path
+        self.backend = backend
+        self.max_input_tokens = max_input_tokens
+        self.latency_ms = latency_ms
+        self.workers = max(1, int(workers))
+        self.version = version
+        self.options = options
+
+    def runtime_key(self):
+        """What the runtime depends on; the routing settings can change without reloading the model."""
+        return self.path, self.backend, self.version, tuple(sorted(self.options.items()))
+
+    def files_version(self):
+        return model_version(self.path, self.backend)
+
+    def memory_estimate(self):
+        """Bytes the model is expected to take once loaded: its weights plus a full encoder cache."""
+        return weights_bytes(self.path) + self.options.get('encoder_cache_bytes', 0)
+
+    def create_runtime(self):
+        return ModelRuntime(self.path, backend=self.backend, name=self.name, version=self.version, **self.options)
+
+
+def load_config(path, defaults=None):
+    """
+    Reads the model registry config.
+
+    The config is a JSON object {"models": [{"name", "path", ...}, ...]} listing the
+    models from the preferred one (usually the largest) to the fastest; every entry
+    takes the ModelSpec arguments. Relative paths are resolved against the directory
+    of the config file.
+
+    :param path: The config file.
+    :param defaults: Values of the entry keys a config entry leaves out, e.g. the API's batching settings.
+    :return: The ModelSpecs, in order of preference.
+    :raises ValueError: If the config is invalid.
+    """
+    with open(path, encoding='utf-8') as file:
+        config = json.load(file)
+    entries = config.get('models') if isinstance(config, dict) else None
+    if not entries or not isinstance(entries, list):
+        raise ValueError(f'{path} must hold a non-empty "models" list')
+    base_dir = os.path.dirname(os.path.abspath(path))
+    specs, names = [], set()
+    for entry in entries:
+        if not isinstance(entry, dict) or 'name' not in entry or 'path' not in entry:
+            raise ValueError('Every model needs a name and a path')
+        if entry['name'] in names:
+            raise ValueError(f"Duplicate model name {entry['name']}")
+        names.add(entry['name'])
+        options = {key: value for key, value in (defaults or {}).items() if key not in ('name', 'path')}
+        options.update(entry)
+        options['path'] = os.path.normpath(os.path.join(base_dir, os.path.expanduser(entry['path'])))
+        try:
+            specs.append(ModelSpec(**options))
+        except TypeError as e:
+            raise ValueError(f"Invalid model {entry['name']}: {e}")
+    return specs
+
+
+class ModelEntry:
+    """
+    A registered model: its spec, the runtime serving it and its measured latency.
+
+    Callers go through summarize() and stream(), which count the requests using
+    each runtime: a runtime replaced by a newer version is closed once the last
+    of them is done, so swapping never cuts a request short.
+
+    :param spec: The ModelSpec.
+    """
+
+    def __init__(self, spec):
+        self.spec = spec
+        self.runtime = spec.create_runtime()
+        self.files_version = spec.files_version()
+        # Runtime being loaded to replace the current one, and the files that failed to load last
+        self.pending = None
+        self.failed = None
+        self._latency = None
+        self._users = {}
+        self._retired = set()
+        self._lock = threading.Lock()
+        self.requests = REGISTRY.counter('summarizer_model_requests_total', 'Requests routed to each model',
+                                         model=spec.name)
+        REGISTRY.gauge('summarizer_model_memory_bytes', 'Weights and encoder cache bytes of each model',
+                       model=spec.name).fn = lambda: self.memory_bytes()
+
+    @property
+    def name(self):
+        return self.spec.name
+
+    @property
+    def version(self):
+        return self.runtime.version
+
+    def accepts(self, tokens):
+        return self.spec.max_input_tokens is None or tokens <= self.spec.max_input_tokens
+
+    def latency_seconds(self):
+        """Moving average of the duration of a summary, or until measured the configured or warm-up latency."""
+        if self._latency is not None:
+            return self._latency
+        if self.spec.latency_ms is not None:
+            return self.spec.latency_ms / 1000.0
+        return self.runtime.timings.get('warmup_seconds', 0.0)
+
+    def expected_seconds(self, backlog=0):
+        """Time a new request should take, given the requests already waiting for the model's workers."""
+        return self.latency_seconds() * (1 + backlog / self.spec.workers)
+
+    def memory_bytes(self):
+        """Bytes of the loaded runtimes, or the estimate of those still loading."""
+        with self._lock:
+            runtimes = [self.runtime, self.pending, *self._retired]
+        total = 0
+        for runtime in runtimes:
+            if runtime is not None:
+                loaded = runtime.memory_bytes()
+                total += loaded if loaded is not None else self.spec.memory_estimate()
+        return total
+
+    def _acquire(self):
+        with self._lock:
+            runtime = self.runtime
+            self._users[runtime] = self._users.get(runtime, 0) + 1
+        return runtime
+
+    def _release(self, runtime):
+        with self._lock:
+            self._users[runtime] -= 1
+            if self._users[runtime]:
+                return
+            del self._users[runtime]
+            if runtime not in self._retired:
+                return
+            self._retired.discard(runtime)
+        runtime.close()
+
+    def summarize(self, text, **params):
+        runtime = self._acquire()
+        try:
+            # Waiting for the weights to load says nothing about the model's speed
+            measured = runtime.state == STATE_READY
+            started = time.monotonic()
+            summary = runtime.summarize(text, **params)
+            elapsed = time.monotonic() - started
+            if measured:
+                with self._lock:
+                    self._latency = elapsed if self._latency is None else (
+                        LATENCY_SMOOTHING * elapsed + (1 - LATENCY_SMOOTHING) * self._latency)
+            return summary
+        finally:
+            self._release(runtime)
+
+    def stream(self, text, mode='greedy', **params):
+        runtime = self._acquire()
+        try:
+            yield from runtime.stream(text, mode, **params)
+        finally:
+            self._release(runtime)
+
+    def replace(self, spec, runtime):
+        """Makes a loaded runtime the current one; the previous one is closed once unused."""
+        with self._lock:
+            previous, self.runtime = self.runtime, runtime
+            self.spec = spec
+            self.files_version = spec.files_version()
+            self.pending = None
+            self._latency = None
+            self._retired.add(previous)
+            unused = previous not in self._users
+            if unused:
+                self._retired.discard(previous)
+        if unused:
+            previous.close()
+
+    def retire(self):
+        """Closes every runtime of a model removed from the registry, once unused."""
+        with self._lock:
+            runtimes = [runtime for runtime in (self.runtime, self.pending) if runtime is not None]
+            unused = [runtime for runtime in runtimes if runtime not in self._users]
+            self._retired.update(runtime for runtime in runtimes if runtime in self._users)
+        for runtime in unused:
+            runtime.close()
+
+    def status(self):
+        return {
+            **self.runtime.status(),
+            'name': self.name,
+            'path': self.spec.path,
+            'backend': self.spec.backend,
+            'max_input_tokens': self.spec.max_input_tokens,
+            'workers': self.spec.workers,
+            'latency_ms': round(self.latency_seconds() * 1000, 3),
+            'memory_bytes': self.memory_bytes(),
+            'swapping': self.pending is not None,
+        }
+
+
+class ModelRegistry:
+    """
+    The models a service routes requests to, in order of preference.
+
+    route() sends every request to the preferred loaded model that accepts its
+    input length and, given a latency budget, is expected to answer within it.
+    A model whose config entry or files change is swapped without restarting:
+    the new runtime loads in the background while the old one keeps serving,
+    then takes over, and the old one is closed once its requests are done.
+    route() checks the config file and the model files for changes every
+    poll_seconds, so every process serving the registry picks them up.
+
+    :param specs: ModelSpecs in order of preference.
+    :param memory_budget: Bytes the models may take together, weights plus encoder caches,
+        including a model being swapped in; 0 for no limit.
+    :param config_path: Config file the specs were read from, to reload it when it changes.
+    :param defaults: load_config defaults used on reload.
+    :param poll_seconds: Interval of the change checks; None disables them.
+    :raises ValueError: If the models don't fit in the memory budget.
+    """
+
+    def __init__(self, specs, memory_budget=0, config_path=None, defaults=None, poll_seconds=5):
+        self.memory_budget = memory_budget
+        self.config_path = config_path
+        self.defaults = defaults
+        self.poll_seconds = poll_seconds if config_path else None
+        estimate = sum(spec.memory_estimate() for spec in specs)
+        if memory_budget and estimate > memory_budget:
+            raise ValueError(f'The models need about {estimate} bytes, more than the memory budget of {memory_budget}')
+        self.entries = {spec.name: ModelEntry(spec) for spec in specs}
+        self._config_mtime = os.stat(config_path).st_mtime_ns if config_path else None
+        self._next_poll = time.monotonic() + (self.poll_seconds or 0)
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_config(cls, path, defaults=None, **kwargs):
+        return cls(load_config(path, defaults), config_path=path, defaults=defaults, **kwargs)
+
+    @property
+    def default(self):
+        """The preferred model."""
+        return next(iter(self.entries.values()))
+
+    def get(self, name):
+        return self.entries.get(name)
+
+    def load(self):
+        """Loads every model synchronously."""
+        for entry in self.entries.values():
+            entry.runtime.load()
+
+    def start_loading(self):
+        """Loads every model in a background thread."""
+        for entry in self.entries.values():
+            entry.runtime.start_loading()
+
+    def count_tokens(self, text):
+        for entry in self.entries.values():
+            backend = entry.runtime.backend
+            if backend is not None:
+                return backend.count_tokens(text)
+        # No tokenizer loaded yet: words are a lower bound
+        return len(text.split())
+
+    def route(self, text, latency_budget_ms=None, backlog=None):
+        """
+        Picks the model for a request.
+
+        Only loaded models are candidates (the preferred one is returned while none
+        is, and waits for its weights). Among those accepting the input length (or
+        the one with the longest input window when none does), this is the first one
+        expected to answer within the latency budget, or the fastest when none is.
+
+        :param text: The text to summarize.
+        :param latency_budget_ms: Time the client is willing to wait; None to always prefer quality.
+        :param backlog: Callable returning the number of requests waiting for a model, given its name.
+        :return: The ModelEntry.
+        """
+        self.poll()
+        entries = list(self.entries.values())
+        ready = [entry for entry in entries if entry.runtime.state == STATE_READY]
+        if not ready:
+            chosen = entries[0]
+        else:
+            tokens = self.count_tokens(text)
+            candidates = [entry for entry in ready if entry.accepts(tokens)] or [
+                max(ready, key=lambda entry: entry.spec.max_input_tokens)]
+            chosen = candidates[0]
+            if latency_budget_ms is not None:
+                expected = [(entry.expected_seconds(backlog(entry.name) if backlog else 0), entry)
+                            for entry in candidates]
+                fitting = [entry for seconds, entry in expected if seconds * 1000 <= latency_budget_ms]
+                chosen = fitting[0] if fitting else min(expected, key=lambda item: item[0])[1]
+        chosen.requests.inc()
+        return chosen
+
+    def _fits(self, spec):
+        if not self.memory_budget:
+            return True
+        used = sum(entry.memory_bytes() for entry in self.entries.values())
+        return used + spec.memory_estimate() <= self.memory_budget
+
+    def _swap_in(self, entry, spec):
+        runtime = spec.create_runtime()
+        entry.pending = runtime
+        files_version = spec.files_version()
+
+        def load():
+            try:
+                runtime.load()
+            except Exception:
+                entry.pending = None
+                entry.failed = (spec.runtime_key(), files_version)
+                return
+            entry.replace(spec, runtime)
+            logger.info("Model %s swapped to %s", spec.name, runtime.version)
+
+        thread = threading.Thread(target=load, name=f'model-swap-{spec.name}', daemon=True)
+        thread.start()
+        return thread
+
+    def reload(self, specs=None):
+        """
+        Applies a new list of models, by default the config file's, without interrupting requests.
+
+        New models load in the background and receive requests once loaded. Models
+        whose runtime settings or files changed are swapped in the background too,
+        and only the routing settings of the others are updated. Removed models stop
+        receiving requests at once. Models that would exceed the memory budget are
+        rejected, and so are changes that already failed to load.
+
+        :param specs: ModelSpecs in order of preference; None to read the config file again.
+        :return: {'added', 'swapped', 'removed': [names], 'rejected': {name: reason}}.
+        :raises ValueError: If the config file is invalid.
+        """
+        with self._lock:
+            if specs is None:
+                self._config_mtime = os.stat(self.config_path).st_mtime_ns
+                specs = load_config(self.config_path, self.defaults)
+            result = {'added': [], 'swapped': [], 'removed': [], 'rejected': {}}
+            entries = {}
+            for spec in specs:
+                entry = self.entries.get(spec.name)
+                if entry is None:
+                    if not self._fits(spec):
+                        result['rejected'][spec.name] = 'exceeds the memory budget'
+                        continue
+                    entry = ModelEntry(spec)
+                    entry.runtime.start_loading()
+                    result['added'].append(spec.name)
+                elif spec.runtime_key() != entry.spec.runtime_key() or spec.files_version() != entry.files_version:
+                    if entry.pending is not None:
+                        # Check again once the swap in progress is over
+                        self._config_mtime = None
+                    else:
+                        if entry.failed == (spec.runtime_key(), spec.files_version()):
+                            result['rejected'][spec.name] = 'failed to load'
+                        elif not self._fits(spec):
+                            result['rejected'][spec.name] = 'exceeds the memory budget'
+                        else:
+                            self._swap_in(entry, spec)
+                            result['swapped'].append(spec.name)
+                else:
+                    entry.spec = spec
+                entries[spec.name] = entry
+            if not entries:
+                raise ValueError('No model left to serve')
+            # Only retired once the new models are known to leave one to serve
+            for name in [name for name in self.entries if name not in entries]:
+                self.entries[name].retire()
+                result['removed'].append(name)
+            self.entries = entries
+        if any(result.values()):
+            logger.info("Model registry reloaded: %s", result)
+        return result
+
+    def poll(self):
+        """Reloads the registry if the config file or the files of a model changed, at most every poll_seconds."""
+        now = time.monotonic()
+        if self.poll_seconds is None or now < self._next_poll:
+            return
+        self._next_poll = now + self.poll_seconds
+        try:
+            if os.stat(self.config_path).st_mtime_ns != self._config_mtime or any(
+                    self._files_changed(entry) for entry in self.entries.values()):
+                self.reload()
+        except (OSError, ValueError) as e:
+            logger.error("Could not reload the model registry from %s: %s", self.config_path, e)
+
+    @staticmethod
+    def _files_changed(entry):
+        if entry.pending is not None:
+            return False
+        files_version = entry.spec.files_version()
+        return files_version != entry.files_version and entry.failed != (entry.spec.runtime_key(), files_version)
+
+    def memory_bytes(self):
+        return sum(entry.memory_bytes() for entry in self.entries.values())
+
+    def status(self):
+        return {
+            'models': [entry.status() for entry in self.entries.values()],
+            'memory_bytes': self.memory_bytes(),
+            'memory_budget': self.memory_budget or None,
+        }
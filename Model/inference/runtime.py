@@ -0,0 +1,249 @@
+import logging
+import os
+import threading
+import time
+
+from .batching import MicroBatcher
+from .longdoc import LongDocumentSummarizer
+from .metrics import merge_profile
+
+logger = logging.getLogger(__name__)
+
+# Lifecycle of the process-wide model
+STATE_IDLE = 'idle'
+STATE_LOADING = 'loading'
+STATE_READY = 'ready'
+STATE_FAILED = 'failed'
+STATE_CLOSED = 'closed'
+
+# Decoding strategies that can stream tokens, see backends.STREAM_GENERATION
+STREAM_MODES = ('greedy', 'sample')
+
+# Input window of BART minus the BOS/EOS tokens
+MAX_CHUNK_TOKENS = 1022
+
+WARMUP_TEXT = "Transformers summarize long scientific articles into short abstracts."
+
+
+def model_version(model_path, backend_name):
+    """
+    Identifies a model build without loading it: directory name, backend and weights modification time.
+    """
+    stamps = [
+        os.stat(os.path.join(model_path, name)).st_mtime_ns
+        for name in ('model.safetensors', 'pytorch_model.bin', 'config.json')
+        if os.path.exists(os.path.join(model_path, name))
+    ]
+    return f'{os.path.basename(os.path.normpath(model_path))}-{backend_name}-{max(stamps, default=0)}'
+
+
+class ModelRuntime:
+    """
+    Lazily loaded model with its micro-batching engine and long-document summarizer.
+
+    Nothing heavy (not even torch) is imported until load() runs, so a service
+    can start accepting requests and report 'loading' while the weights are
+    read in the background with start_loading().
+
+    :param model_path: Directory of the fine-tuned model.
+    :param backend: Inference backend name, see inference.backends.BACKENDS.
+    :param device: Device for the torch backend (defaults to CUDA when available).
+    :param max_batch_size: Largest batch the micro-batcher sends to generate.
+    :param max_wait_ms: Micro-batching collection window.
+    :param warmup: Run one generation right after loading so the first request doesn't pay for it.
+    :param precompress_tokens: Inputs longer than this many tokens are condensed to their most salient
+        sentences before generation, instead of by map-reduce passes; 0 disables it.
+    :param encoder_cache_bytes: Byte budget of the backend's encoder output cache, which lets other summary
+        lengths of a recent input skip the encoder; 0 disables it.
+    :param name: Label of the runtime's metrics, e.g. its name in a model registry.
+    :param version: Identifies the summaries of this runtime in caches; derived from the model files when None.
+    """
+
+    def __init__(self, model_path, backend='torch', device=None, max_batch_size=8, max_wait_ms=20, warmup=True,
+                 precompress_tokens=0, encoder_cache_bytes=0, name='default', version=None):
+        self.name = name
+        self.model_path = model_path
+        self.backend_name = backend
+        self.device = device
+        self.max_batch_size = max_batch_size
+        self.max_wait_ms = max_wait_ms
+        self.warmup_enabled = warmup
+        self.precompress_tokens = min(precompress_tokens, MAX_CHUNK_TOKENS)
+        self.encoder_cache_bytes = encoder_cache_bytes
+        self.version = version or model_version(model_path, backend)
+        if self.precompress_tokens and version is None:
+            # Summaries of long inputs depend on the extractive budget too
+            self.version += f'-extract{self.precompress_tokens}'
+        self.state = STATE_IDLE
+        self.error = None
+        self.timings = {}
+        self.backend = None
+        self.batcher = None
+        self.long_documents = None
+        self.extractive = None
+        self._created = time.monotonic()
+        self._ready = threading.Event()
+        self._lock = threading.Lock()
+
+    def load(self):
+        """Loads the model synchronously; safe to call from several threads, loads once."""
+        with self._lock:
+            if self.state in (STATE_READY, STATE_LOADING):
+                return
+            self.state = STATE_LOADING
+        try:
+            started = time.monotonic()
+            from .backends import load_backend
+            from .extractive import ExtractiveSummarizer
+            imported = time.monotonic()
+            backend = load_backend(self.backend_name, self.model_path, self.device,
+                                   encoder_cache_bytes=self.encoder_cache_bytes)
+            loaded = time.monotonic()
+
+            self.backend = backend
+            self.batcher = MicroBatcher(backend.summarize, max_batch_size=self.max_batch_size,
+                                        max_wait_ms=self.max_wait_ms, length_fn=self._token_length, name=self.name)
+            self.long_documents = LongDocumentSummarizer(self._generate_many, backend.count_tokens,
+                                                         max_tokens=MAX_CHUNK_TOKENS, namespace=self.version)
+            if self.precompress_tokens:
+                self.extractive = ExtractiveSummarizer(backend.count_tokens)
+            self.timings = {'import_seconds': imported - started, 'load_seconds': loaded - imported}
+            if self.warmup_enabled:
+                self.warmup()
+        except Exception as e:
+            logger.exception("Failed to load model from %s", self.model_path)
+            self.error = str(e)
+            self.state = STATE_FAILED
+            self._ready.set()
+            raise
+        self.timings['cold_start_seconds'] = time.monotonic() - self._created
+        self.state = STATE_READY
+        self._ready.set()
+        logger.info("Model %s ready: %s", self.version,
+                    ', '.join(f'{name}={seconds:.2f}s' for name, seconds in self.timings.items()))
+
+    def start_loading(self):
+        """Loads the model in a background thread."""
+        thread = threading.Thread(target=self._load_quietly, name='model-loader', daemon=True)
+        thread.start()
+        return thread
+
+    def _load_quietly(self):
+        try:
+            self.load()
+        except Exception:
+            pass  # already logged, state is 'failed'
+
+    def warmup(self, text=WARMUP_TEXT):
+        """Runs one generation to initialize lazy kernels and allocator pools."""
+        started = time.monotonic()
+        self.backend.summarize([text])
+        self.timings['warmup_seconds'] = time.monotonic() - started
+
+    def wait_until_ready(self, timeout=None):
+        """
+        Blocks until the model is loaded, starting the load if nobody did.
+
+        :raises RuntimeError: If loading failed or did not finish within timeout.
+        """
+        if self.state == STATE_CLOSED:
+            raise RuntimeError('Model runtime is closed')
+        if self.state == STATE_IDLE:
+            self.start_loading()
+        if not self._ready.wait(timeout):
+            raise RuntimeError(f'Model is still {self.state}')
+        if self.state != STATE_READY:
+            raise RuntimeError(f'Model failed to load: {self.error}')
+
+    def _precompress(self, text):
+        if self.extractive is None or self.backend.count_tokens(text) <= self.precompress_tokens:
+            return text
+        return self.extractive.select(text, self.precompress_tokens)
+
+    def _token_length(self, text):
+        return min(self.backend.count_tokens(text), MAX_CHUNK_TOKENS)
+
+    def _generate_many(self, texts, **params):
+        # Route long-document chunks through the batcher so they share batches with other traffic
+        futures = [self.batcher.submit(text, **params) for text in texts]
+        return [self._result(future) for future in futures]
+
+    @staticmethod
+    def _result(future, timeout=None):
+        result = future.result(timeout=timeout)
+        merge_profile(getattr(future, 'profile', None))
+        return result
+
+    def summarize(self, text, timeout=None, **params):
+        """
+        Summarizes a text of any length, waiting for the model to be ready.
+
+        :param text: The text to summarize.
+        :param timeout: Seconds to wait for the model to load.
+        :param params: Generation parameters.
+        :return: The summary.
+        """
+        self.wait_until_ready(timeout)
+        text = self._precompress(text)
+        if self.backend.count_tokens(text) > MAX_CHUNK_TOKENS:
+            return self.long_documents.summarize(text, **params)
+        return self._result(self.batcher.submit(text, **params))
+
+    def stream(self, text, mode='greedy', timeout=None, **params):
+        """
+        Summarizes a text of any length, returning a generator of text fragments.
+
+        Long documents are first condensed, extractively or with the batched
+        map-reduce passes; only the final pass streams. Streams bypass the micro-batcher.
+
+        :param text: The text to summarize.
+        :param mode: One of STREAM_MODES.
+        :param timeout: Seconds to wait for the model to load.
+        :param params: Generation parameters.
+        """
+        self.wait_until_ready(timeout)
+        text = self._precompress(text)
+        if self.backend.count_tokens(text) > MAX_CHUNK_TOKENS:
+            text = self.long_documents.condense(text)
+        return self.backend.stream(text, mode, **params)
+
+    def memory_bytes(self):
+        """Weights plus cached encoder outputs in bytes, or None until the model is loaded."""
+        if self.state != STATE_READY:
+            return None
+        cache = self.backend.encoder_cache
+        return self.backend.memory_bytes() + (cache.stats()['bytes'] if cache is not None else 0)
+
+    def close(self):
+        """
+        Stops the micro-batcher once the texts already submitted are summarized and drops
+        the model; only call it once nobody uses the runtime anymore.
+        """
+        if self.batcher is not None:
+            self.batcher.close()
+        self.backend = self.batcher = self.long_documents = self.extractive = None
+        self.state = STATE_CLOSED
+
+    def status(self):
+        return {'state': self.state, 'version': self.version, 'error': self.error,
+                'memory_bytes': self.memory_bytes(), **self.timings}
+
+
+_runtime = None
+_runtime_lock = threading.Lock()
+
+
+def get_runtime(model_path=None, **options):
+    """
+    Returns the process-wide ModelRuntime, creating it on first use.
+
+    :param model_path: Directory of the fine-tuned model; only used by the first call.
+    :param options: ModelRuntime keyword arguments; only used by the first call.
+    """
+    global _runtime
+    with _runtime_lock:
+        if _runtime is None:
+            if model_path is None:
+                raise RuntimeError('The first get_runtime() call must provide the model path')
+            _runtime = ModelRuntime(model_path, **options)
+        return _runtime
@@ -0,0 +1,240 @@
+import hashlib
+import os
+import sqlite3
+from collections import defaultdict
+from datetime import datetime, timezone
+from urllib.request import pathname2url
+
+# Rows sent to SQLite per executemany while scanning the corpus
+SCAN_BATCH_SIZE = 10000
+
+READ_SIZE = 1 << 20
+
+SCHEMA = '''
+    CREATE TABLE IF NOT EXISTS files (
+        path TEXT PRIMARY KEY,
+        size INTEGER NOT NULL,
+        mtime_ns INTEGER NOT NULL,
+        content_hash TEXT NOT NULL,
+        shard TEXT,
+        valid INTEGER NOT NULL,
+        processed_at TEXT NOT NULL
+    );
+    CREATE INDEX IF NOT EXISTS ix_files_shard ON files (shard);
+'''
+
+
+class HashingReader:
+    """
+    Binary file wrapper hashing the bytes as a parser reads them, so a file is read only once.
+
+    :param file: A file object opened in binary mode.
+    """
+
+    def __init__(self, file):
+        self.file = file
+        self._hash = hashlib.sha256()
+
+    def read(self, size=-1):
+        data = self.file.read(size)
+        self._hash.update(data)
+        return data
+
+    def hexdigest(self):
+        """Hash of the whole file, reading whatever the parser left unread."""
+        while self.read(READ_SIZE):
+            pass
+        return self._hash.hexdigest()
+
+
+def hash_file(path):
+    with open(path, 'rb') as file:
+        return HashingReader(file).hexdigest()
+
+
+class ExtractionPlan:
+    """
+    What an extraction run has to do, as computed by ExtractionManifest.plan().
+
+    :ivar new: Files not extracted before.
+    :ivar changed: Files whose content changed since they were extracted.
+    :ivar touched: Files whose size or mtime changed but whose content did not; only their stats are updated.
+    :ivar unchanged: Files skipped.
+    :ivar deleted: Extracted files that no longer exist.
+    :ivar drops: {output shard: set of source paths} of the records to remove, those of changed and deleted files.
+    """
+
+    def __init__(self, manifest):
+        self.manifest = manifest
+        self.new = self.changed = self.touched = self.unchanged = self.deleted = 0
+        self.drops = defaultdict(set)
+        self._touched = []
+        self._changed = []
+        self._deleted = []
+
+    def pending(self):
+        """Yields (path, size, mtime_ns) of the new and changed files, in path order."""
+        yield from self.manifest.connection.execute('SELECT path, size, mtime_ns FROM pending ORDER BY path')
+
+    def report(self):
+        lines = [f'new={self.new} changed={self.changed} touched={self.touched} unchanged={self.unchanged} '
+                 f'deleted={self.deleted}']
+        for shard, paths in sorted(self.drops.items()):
+            lines.append(f'  {shard}: {len(paths)} record(s) to remove')
+        return '\n'.join(lines)
+
+
+class ExtractionManifest:
+    """
+    Persistent record of the XML files already extracted, kept in SQLite next to the output.
+
+    For every file it stores the path (relative to the article folder), size,
+    mtime, content hash, the output shard holding its record and whether it was
+    valid. A rerun then only parses new and changed files: unchanged stats mean
+    an unchanged file, and a changed size or mtime with the same content hash
+    only updates the stats. The scan goes through a temporary table, so memory
+    does not grow with the corpus.
+
+    :param path: The manifest database file.
+    :param read_only: Leave the file system untouched (dry runs): a missing manifest is treated as empty.
+    """
+
+    def __init__(self, path, read_only=False):
+        self.path = path
+        if read_only:
+            self.connection = self._connect_read_only(path)
+            return
+        self.connection = sqlite3.connect(path)
+        self.connection.executescript('PRAGMA journal_mode = WAL; PRAGMA synchronous = NORMAL;' + SCHEMA)
+
+    @staticmethod
+    def _connect_read_only(path):
+        if not os.path.exists(path):
+            connection = sqlite3.connect(':memory:')
+            connection.executescript(SCHEMA)
+            return connection
+        # mode=ro still creates the -wal and -shm files of a WAL database, and leaves them behind. Without
+        # a log (removed when the last writer closes cleanly) the file is complete and is read as immutable;
+        # a log left by an interrupted run already comes with its -shm file
+        options = 'mode=ro' if os.path.exists(path + '-wal') else 'mode=ro&immutable=1'
+        return sqlite3.connect(f'file:{pathname2url(os.path.abspath(path))}?{options}', uri=True)
+
+    def is_empty(self):
+        return self.connection.execute('SELECT 1 FROM files LIMIT 1').fetchone() is None
+
+    def _scan(self, folder):
+        batch = []
+        for dirpath, _, filenames in os.walk(folder):
+            for filename in filenames:
+                if not filename.endswith('.xml'):
+                    continue
+                full_path = os.path.join(dirpath, filename)
+                stat = os.stat(full_path)
+                batch.append((os.path.relpath(full_path, folder).replace(os.sep, '/'), stat.st_size, stat.st_mtime_ns))
+                if len(batch) >= SCAN_BATCH_SIZE:
+                    yield batch
+                    batch = []
+        if batch:
+            yield batch
+
+    def plan(self, folder):
+        """
+        Compares the files under folder with the manifest.
+
+        Reads nothing but the contents of files whose stats changed, to tell
+        edits from touches. The manifest itself is not modified until apply().
+
+        :param folder: The article folder.
+        :return: An ExtractionPlan.
+        """
+        plan = ExtractionPlan(self)
+        db = self.connection
+        db.executescript('''
+            DROP TABLE IF EXISTS temp.seen;
+            DROP TABLE IF EXISTS temp.pending;
+            CREATE TEMP TABLE seen (path TEXT PRIMARY KEY, size INTEGER, mtime_ns INTEGER);
+            CREATE TEMP TABLE pending (path TEXT PRIMARY KEY, size INTEGER, mtime_ns INTEGER);
+        ''')
+        for batch in self._scan(folder):
+            db.executemany('INSERT INTO seen VALUES (?, ?, ?)', batch)
+
+        plan.new = db.execute('''
+            INSERT INTO pending SELECT s.path, s.size, s.mtime_ns FROM seen s
+            LEFT JOIN files f ON f.path = s.path WHERE f.path IS NULL
+        ''').rowcount
+        stale = db.execute('''
+            SELECT s.path, s.size, s.mtime_ns, f.content_hash, f.shard FROM seen s
+            JOIN files f ON f.path = s.path WHERE s.size != f.size OR s.mtime_ns != f.mtime_ns
+        ''').fetchall()
+        for path, size, mtime_ns, content_hash, shard in stale:
+            if hash_file(os.path.join(folder, path)) == content_hash:
+                plan._touched.append((size, mtime_ns, path))
+                continue
+            db.execute('INSERT INTO pending VALUES (?, ?, ?)', (path, size, mtime_ns))
+            plan._changed.append((path,))
+            if shard is not None:
+                plan.drops[shard].add(path)
+            plan.changed += 1
+        plan.touched = len(plan._touched)
+
+        for path, shard in db.execute('''
+            SELECT f.path, f.shard FROM files f LEFT JOIN seen s ON s.path = f.path WHERE s.path IS NULL
+        '''):
+            plan._deleted.append((path,))
+            if shard is not None:
+                plan.drops[shard].add(path)
+        plan.deleted = len(plan._deleted)
+        plan.unchanged = db.execute('SELECT COUNT(*) FROM seen').fetchone()[0] - plan.new - plan.changed - plan.touched
+        return plan
+
+    def apply(self, plan, commit=True):
+        """
+        Updates the stats of touched files, detaches changed files from their
+        shard and forgets deleted ones; call once their records are removed.
+
+        Changed files keep their old stats and hash until they are recorded
+        again, so an interrupted run picks them up on the next one.
+        """
+        self.connection.executemany('UPDATE files SET size = ?, mtime_ns = ? WHERE path = ?', plan._touched)
+        self.connection.executemany('UPDATE files SET shard = NULL WHERE path = ?', plan._changed)
+        self.connection.executemany('DELETE FROM files WHERE path = ?', plan._deleted)
+        if commit:
+            self.commit()
+
+    def record(self, rows, commit=True):
+        """
+        Stores the outcome of extracted files.
+
+        :param rows: (path, size, mtime_ns, content_hash, shard, valid) tuples; shard is None when no record was written.
+        :param commit: Commit right away; otherwise the rows wait for commit() and are
+            discarded if the manifest is closed first.
+        """
+        processed_at = datetime.now(timezone.utc).isoformat()
+        self.connection.executemany(
+            'INSERT OR REPLACE INTO files (path, size, mtime_ns, content_hash, shard, valid, processed_at) '
+            'VALUES (?, ?, ?, ?, ?, ?, ?)', [(*row, processed_at) for row in rows])
+        if commit:
+            self.commit()
+
+    def commit(self):
+        self.connection.commit()
+
+    def shard_counts(self):
+        """{output shard: number of records} of the shards holding extracted records."""
+        return dict(self.connection.execute('SELECT shard, COUNT(*) FROM files WHERE shard IS NOT NULL GROUP BY shard'))
+
+    def close(self):
+        self.connection.close()
+
+    @staticmethod
+    def remove(path):
+        """Deletes a manifest database, for a full rebuild."""
+        for suffix in ('', '-wal', '-shm'):
+            if os.path.exists(path + suffix):
+                os.remove(path + suffix)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
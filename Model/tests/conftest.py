@@ -0,0 +1,5 @@
+import os
+import sys
+
+# The tests import the Model/ modules the way the scripts and the API do
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
@@ -0,0 +1,87 @@
+import threading
+
+import pytest
+
+from inference.batching import MicroBatcher
+
+
+class RecordingGenerator:
+    """generate_fn that records its batches and can hold them until released."""
+
+    def __init__(self, gate=None):
+        self.batches = []
+        self.gate = gate
+
+    def __call__(self, texts, **params):
+        if self.gate is not None:
+            self.gate.wait()
+        self.batches.append((list(texts), params))
+        return [f'{text}:{params.get("max_length")}' for text in texts]
+
+
+def submit_all(batcher, texts, **params):
+    return [batcher.submit(text, **params) for text in texts]
+
+
+def test_results_match_their_requests():
+    generate = RecordingGenerator()
+    batcher = MicroBatcher(generate, max_batch_size=4, max_wait_ms=50)
+    futures = submit_all(batcher, [f'text {i}' for i in range(10)], max_length=5)
+    assert [future.result(timeout=5) for future in futures] == [f'text {i}:5' for i in range(10)]
+    assert all(len(texts) <= 4 for texts, _ in generate.batches)
+    batcher.close()
+
+
+def test_concurrent_requests_share_a_batch():
+    generate = RecordingGenerator()
+    batcher = MicroBatcher(generate, max_batch_size=8, max_wait_ms=200)
+    futures = submit_all(batcher, ['a', 'b', 'c'])
+    for future in futures:
+        future.result(timeout=5)
+    assert [texts for texts, _ in generate.batches] == [['a', 'b', 'c']]
+    assert all('batch_wait' in future.profile for future in futures)
+    batcher.close()
+
+
+def test_batches_split_by_params_and_length():
+    generate = RecordingGenerator()
+    batcher = MicroBatcher(generate, max_batch_size=8, max_wait_ms=200, bucket_width=10)
+    long_text = ' '.join(['long'] * 50)
+    futures = (submit_all(batcher, ['short', 'short too'], max_length=5)
+               + submit_all(batcher, ['other params'], max_length=9)
+               + submit_all(batcher, [long_text], max_length=5))
+    for future in futures:
+        future.result(timeout=5)
+    assert sorted((sorted(texts), params['max_length']) for texts, params in generate.batches) == [
+        ([long_text], 5), (['other params'], 9), (['short', 'short too'], 5)]
+    batcher.close()
+
+
+def test_failed_batch_fails_only_its_requests():
+    def generate(texts, **params):
+        if 'bad' in texts:
+            raise ValueError('cannot summarize')
+        return texts
+
+    batcher = MicroBatcher(generate, max_batch_size=1)
+    bad, good = batcher.submit('bad'), batcher.submit('good')
+    with pytest.raises(ValueError):
+        bad.result(timeout=5)
+    assert good.result(timeout=5) == 'good'
+    batcher.close()
+
+
+def test_wrong_number_of_results_is_an_error():
+    batcher = MicroBatcher(lambda texts, **params: [], max_batch_size=2)
+    with pytest.raises(RuntimeError, match='0 results for 1 inputs'):
+        batcher.summarize('text', timeout=5)
+    batcher.close()
+
+
+def test_close_finishes_queued_requests():
+    gate = threading.Event()
+    batcher = MicroBatcher(RecordingGenerator(gate), max_batch_size=1)
+    futures = submit_all(batcher, ['a', 'b', 'c'])
+    gate.set()
+    batcher.close()
+    assert [future.result(timeout=0) for future in futures] == ['a:None', 'b:None', 'c:None']
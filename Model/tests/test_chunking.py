@@ -0,0 +1,87 @@
+from inference.longdoc import LongDocumentSummarizer, split_into_chunks
+
+
+def count_words(text):
+    return len(text.split())
+
+
+def words(n, word='word'):
+    return ' '.join([word] * n)
+
+
+def test_short_paragraphs_are_packed_together():
+    text = 'First paragraph here.\n\nSecond one.\nThird one.'
+    assert split_into_chunks(text, count_words, max_tokens=100) == [
+        'First paragraph here.\nSecond one.\nThird one.']
+
+
+def test_chunks_break_on_paragraphs():
+    text = f'{words(6, "a")}\n{words(6, "b")}\n{words(3, "c")}'
+    assert split_into_chunks(text, count_words, max_tokens=10) == [
+        words(6, 'a'), f'{words(6, "b")}\n{words(3, "c")}']
+
+
+def test_oversized_paragraph_splits_on_sentences():
+    sentences = [f'{words(4, name)}.' for name in 'abcd']
+    chunks = split_into_chunks(' '.join(sentences), count_words, max_tokens=9)
+    assert chunks == [' '.join(sentences[:2]), ' '.join(sentences[2:])]
+
+
+def test_oversized_sentence_splits_on_words():
+    text = f'Short sentence. {words(25, "long")}'
+    chunks = split_into_chunks(text, count_words, max_tokens=10)
+    assert all(count_words(chunk) <= 10 for chunk in chunks)
+    assert ' '.join(chunks).split() == text.split()
+    assert len(chunks) == 4
+
+
+def test_a_single_oversized_word_is_kept_whole():
+    assert split_into_chunks('x' * 50, len, max_tokens=10) == ['x' * 50]
+
+
+def test_chunks_preserve_every_word_in_order():
+    text = '\n'.join(f'{words(i % 7 + 1, f"p{i}")}. {words(i % 5 + 12, f"q{i}")}' for i in range(30))
+    chunks = split_into_chunks(text, count_words, max_tokens=16)
+    assert all(count_words(chunk) <= 16 for chunk in chunks)
+    assert '\n'.join(chunks).split() == text.split()
+
+
+class FirstWords:
+    """generate_fn keeping the first words of every text, recording its calls."""
+
+    def __init__(self, keep=2):
+        self.keep = keep
+        self.calls = []
+
+    def __call__(self, texts, **params):
+        self.calls.append((list(texts), params))
+        return [' '.join(text.split()[:self.keep]) for text in texts]
+
+
+def test_summarizer_reduces_partial_summaries_with_caller_settings():
+    generate = FirstWords()
+    summarizer = LongDocumentSummarizer(generate, count_words, max_tokens=20, map_batch_size=2)
+    # Chunks of two paragraphs (a+b, c+d, e), summarized two per call
+    text = '\n'.join(words(8, name) for name in 'abcde')
+    assert summarizer.summarize(text, max_length=3) == 'a a'
+    map_calls, (reduce_texts, reduce_params) = generate.calls[:-1], generate.calls[-1]
+    assert [len(texts) for texts, _ in map_calls] == [2, 1]
+    assert all(params == {} for _, params in map_calls)
+    assert reduce_texts == ['a a\nc c\ne e'] and reduce_params == {'max_length': 3}
+
+
+def test_partial_summaries_are_cached_by_chunk():
+    generate = FirstWords()
+    summarizer = LongDocumentSummarizer(generate, count_words, max_tokens=10)
+    text = '\n'.join(words(8, name) for name in 'abc')
+    summarizer.summarize(text, max_length=3)
+    generate.calls.clear()
+    summarizer.summarize(text, max_length=5)
+    assert generate.calls == [(['a a\nb b\nc c'], {'max_length': 5})]
+
+
+def test_short_documents_skip_the_map_phase():
+    generate = FirstWords()
+    summarizer = LongDocumentSummarizer(generate, count_words, max_tokens=10)
+    assert summarizer.condense('Just a short text.') == 'Just a short text.'
+    assert generate.calls == []
@@ -0,0 +1,76 @@
+import csv
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+import pytest
+
+from Cleaning_data import DatasetWriter, append_to_csv
+
+
+def read_csv(path):
+    with open(path, newline='', encoding='utf-8') as file:
+        return list(csv.reader(file))
+
+
+def test_rows_are_written_per_batch(tmp_path):
+    path = tmp_path / 'dataset.csv'
+    with DatasetWriter(str(path), batch_size=2) as writer:
+        writer.write('abstract 1', 'body 1')
+        assert not path.exists()
+        writer.write('abstract 2', 'body 2')
+        assert len(read_csv(path)) == 2
+        writer.write('abstract 3', 'body 3')
+    assert read_csv(path)[-1] == ['abstract 3', 'body 3']
+    assert writer.rows_written == 3
+
+
+def test_csv_output_matches_append_to_csv(tmp_path):
+    expected, written = tmp_path / 'expected.csv', tmp_path / 'written.csv'
+    rows = [('An "abstract", quoted', 'Body\nwith lines'), ('Ünïcode', '')]
+    for row in rows:
+        append_to_csv(*row, csv_filename=str(expected))
+    with DatasetWriter(str(written)) as writer:
+        for row in rows:
+            writer.write(*row)
+    assert written.read_bytes() == expected.read_bytes()
+
+
+def test_csv_output_is_appended(tmp_path):
+    path = tmp_path / 'dataset.csv'
+    for i in range(2):
+        with DatasetWriter(str(path)) as writer:
+            writer.write(f'abstract {i}', f'body {i}')
+    assert read_csv(path) == [['abstract 0', 'body 0'], ['abstract 1', 'body 1']]
+
+
+def test_parquet_output_has_a_row_group_per_batch(tmp_path):
+    path = tmp_path / 'dataset.parquet'
+    with DatasetWriter(str(path), batch_size=2, columns=('Abstract', 'Body', 'Source')) as writer:
+        for i in range(5):
+            writer.write(f'abstract {i}', f'body {i}', f'{i}.xml')
+    parquet = pq.ParquetFile(path)
+    assert parquet.metadata.num_row_groups == 3
+    assert parquet.read().column('Source').to_pylist() == [f'{i}.xml' for i in range(5)]
+
+
+def test_interrupted_run_leaves_a_readable_file(tmp_path):
+    path = tmp_path / 'dataset.parquet'
+    with pytest.raises(KeyboardInterrupt):
+        with DatasetWriter(str(path), batch_size=100) as writer:
+            writer.write('abstract', 'body')
+            raise KeyboardInterrupt
+    assert pq.read_table(path).num_rows == 1
+
+
+def test_tables_are_written_after_buffered_rows(tmp_path):
+    path = tmp_path / 'dataset.parquet'
+    with DatasetWriter(str(path)) as writer:
+        writer.write('first', 'row')
+        writer.write_table(pa.table({'Abstract': ['second'], 'Body': ['row']}))
+    assert pq.read_table(path).column('Abstract').to_pylist() == ['first', 'second']
+    assert writer.rows_written == 2
+
+
+def test_unknown_formats_are_rejected(tmp_path):
+    with pytest.raises(ValueError, match='Unsupported format'):
+        DatasetWriter(str(tmp_path / 'dataset.json'), file_format='json')
@@ -0,0 +1,83 @@
+import numpy as np
+import pytest
+
+from inference.extractive import SENTENCE_BOUNDARY, ExtractiveSummarizer, count_words, split_sentences, textrank
+
+LONG_SENTENCE = ' '.join(f'word{i}' for i in range(60)) + '.'
+
+
+def test_an_oversized_best_sentence_is_cut_to_the_budget():
+    text = f'{LONG_SENTENCE} A short closing remark follows it.'
+    # The long sentence ranks first: it is the first of its section and shares no word with the other one
+    assert ExtractiveSummarizer().select(text, 10) == ' '.join(f'word{i}' for i in range(10))
+
+
+def test_a_single_sentence_is_cut_to_the_budget():
+    assert ExtractiveSummarizer().select(LONG_SENTENCE, 5) == 'word0 word1 word2 word3 word4'
+
+
+def test_titles_only_are_cut_to_the_budget():
+    text = 'Introduction\nMethods and materials\nResults and discussion'
+    assert ExtractiveSummarizer().select(text, 4) == 'Introduction\nMethods and materials'
+
+
+def test_texts_within_the_budget_are_kept():
+    assert ExtractiveSummarizer().select('A single short sentence.', 10) == 'A single short sentence.'
+
+
+def test_truncation_counts_with_the_given_tokenizer():
+    summarizer = ExtractiveSummarizer(count_tokens=len)
+    assert summarizer.truncate('abc defg hij', 9) == 'abc defg'
+    assert summarizer.truncate('abcdefghijk', 5) == ''
+
+
+ARTICLE = '''Introduction
+Transformers changed how scientific articles are summarized. Attention lets every token see the whole input.
+Long documents exceed the input window of most models. Chunking them loses the links between sections.
+Methods
+We select salient sentences before generation. Salient sentences are central in the similarity graph of the document.
+The selection runs on the processor in milliseconds. It needs no model at all.
+Results
+Selected sentences cover the main findings. Abstracts generated from them score close to full inputs.'''
+
+
+def test_selection_fits_the_budget_in_document_order():
+    summarizer = ExtractiveSummarizer()
+    sentences = split_sentences(ARTICLE)[0]
+    for budget in (10, 25, 40):
+        result = summarizer.select(ARTICLE, budget)
+        chosen = [sentence for line in result.split('\n') for sentence in SENTENCE_BOUNDARY.split(line)]
+        # Sentences of a paragraph stay on one line, with a separator token between two of them
+        assert count_words(result) + len(chosen) - 1 <= budget
+        assert chosen == [sentence for sentence in sentences if sentence in chosen]
+
+
+def test_titles_are_not_candidates():
+    sentences, paragraphs, positions = split_sentences(ARTICLE)
+    assert 'Introduction' not in sentences and 'Methods' not in sentences
+    assert len(sentences) == 10
+    # Positions restart at every section
+    assert list(positions) == [0, 1, 2, 3, 0, 1, 2, 3, 0, 1]
+    assert list(paragraphs) == [1, 1, 2, 2, 4, 4, 5, 5, 7, 7]
+
+
+def test_hard_wrapped_lines_are_rejoined():
+    text = 'Extracted pages wrap\nlines in the middle of\na sentence. They end later.\n\nA second paragraph\nstarts here.'
+    assert split_sentences(text)[0] == [
+        'Extracted pages wrap lines in the middle of a sentence.', 'They end later.',
+        'A second paragraph starts here.']
+
+
+def test_near_duplicates_are_skipped_while_other_sentences_fit():
+    text = ('Attention models summarize scientific articles well. Attention models summarize scientific articles '
+            'very well. Chunking long inputs loses context between sections.')
+    result = ExtractiveSummarizer().select(text, 14)
+    assert 'Chunking long inputs loses context between sections.' in result
+    assert result.count('Attention models') == 1
+
+
+def test_textrank_favours_central_sentences():
+    similarity = np.array([[0, 1, 1], [1, 0, 0], [1, 0, 0]], dtype=float)
+    rank = textrank(similarity)
+    assert rank.sum() == pytest.approx(1.0)
+    assert rank[0] > rank[1] == pytest.approx(rank[2])
@@ -0,0 +1,127 @@
+import os
+
+import pytest
+
+from manifest import ExtractionManifest, hash_file
+
+
+def write(folder, name, content):
+    path = folder / name
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(content)
+    return path
+
+
+def extract_all(manifest, folder, shard='dataset.csv'):
+    """Records every pending file as extracted into shard, as an extraction run would."""
+    plan = manifest.plan(str(folder))
+    manifest.apply(plan)
+    manifest.record([(path, size, mtime_ns, hash_file(os.path.join(folder, path)), shard, True)
+                     for path, size, mtime_ns in plan.pending()])
+    return plan
+
+
+def snapshot(folder):
+    return {path.name: path.read_bytes() for path in sorted(folder.iterdir()) if path.is_file()}
+
+
+@pytest.fixture
+def articles(tmp_path):
+    folder = tmp_path / 'articles'
+    write(folder, 'a.xml', '<article>a</article>')
+    write(folder, 'nested/b.xml', '<article>b</article>')
+    return folder
+
+
+def test_read_only_manifest_leaves_the_file_system_untouched(tmp_path, articles):
+    path = str(tmp_path / 'dataset.csv.manifest.sqlite')
+    with ExtractionManifest(path) as manifest:
+        extract_all(manifest, articles)
+    write(articles, 'c.xml', '<article>c</article>')
+    before = snapshot(tmp_path)
+    with ExtractionManifest(path, read_only=True) as manifest:
+        plan = manifest.plan(str(articles))
+        assert (plan.new, plan.unchanged) == (1, 2)
+        with pytest.raises(Exception, match='readonly'):
+            manifest.record([('c.xml', 1, 1, 'hash', None, False)])
+    assert snapshot(tmp_path) == before
+
+
+def test_read_only_missing_manifest_is_empty(tmp_path, articles):
+    path = tmp_path / 'missing.sqlite'
+    with ExtractionManifest(str(path), read_only=True) as manifest:
+        assert manifest.is_empty()
+        assert manifest.plan(str(articles)).new == 2
+    assert not path.exists()
+
+
+def test_read_only_manifest_reads_a_log_left_open(tmp_path, articles):
+    path = str(tmp_path / 'dataset.csv.manifest.sqlite')
+    writer = ExtractionManifest(path)
+    extract_all(writer, articles)
+    # The writer is still open: its records are committed to the log, not yet to the database file
+    names = sorted(os.listdir(tmp_path))
+    assert os.path.exists(path + '-wal')
+    with ExtractionManifest(path, read_only=True) as manifest:
+        assert manifest.plan(str(articles)).unchanged == 2
+    assert sorted(os.listdir(tmp_path)) == names
+    writer.close()
+
+
+def test_plan_tells_new_changed_touched_and_deleted_files(tmp_path, articles):
+    path = str(tmp_path / 'dataset.csv.manifest.sqlite')
+    write(articles, 'c.xml', '<article>c</article>')
+    write(articles, 'd.xml', '<article>d</article>')
+    with ExtractionManifest(path) as manifest:
+        assert extract_all(manifest, articles).new == 4
+        write(articles, 'a.xml', '<article>a, edited</article>')
+        touched = articles / 'nested' / 'b.xml'
+        os.utime(touched, ns=(touched.stat().st_atime_ns, touched.stat().st_mtime_ns + 10**9))
+        (articles / 'c.xml').unlink()
+        write(articles, 'e.xml', '<article>e</article>')
+
+        plan = manifest.plan(str(articles))
+        counts = (plan.new, plan.changed, plan.touched, plan.unchanged, plan.deleted)
+        assert counts == (1, 1, 1, 1, 1)
+        assert dict(plan.drops) == {'dataset.csv': {'a.xml', 'c.xml'}}
+        assert [row[0] for row in plan.pending()] == ['a.xml', 'e.xml']
+        assert plan.report().startswith('new=1 changed=1 touched=1 unchanged=1 deleted=1')
+
+
+def test_apply_and_record_make_the_next_plan_empty(tmp_path, articles):
+    path = str(tmp_path / 'dataset.csv.manifest.sqlite')
+    with ExtractionManifest(path) as manifest:
+        extract_all(manifest, articles)
+        write(articles, 'a.xml', '<article>a, edited</article>')
+        (articles / 'nested' / 'b.xml').unlink()
+        extract_all(manifest, articles, shard='second.csv')
+        plan = manifest.plan(str(articles))
+        assert (plan.new, plan.changed, plan.touched, plan.deleted, plan.unchanged) == (0, 0, 0, 0, 1)
+        assert manifest.shard_counts() == {'second.csv': 1}
+
+
+def test_changed_files_stay_pending_until_recorded(tmp_path, articles):
+    path = str(tmp_path / 'dataset.csv.manifest.sqlite')
+    with ExtractionManifest(path) as manifest:
+        extract_all(manifest, articles)
+        write(articles, 'a.xml', '<article>a, edited</article>')
+        # An interrupted run: the plan is applied, the file is never recorded again
+        manifest.apply(manifest.plan(str(articles)))
+        plan = manifest.plan(str(articles))
+        assert plan.changed == 1 and not plan.drops
+        assert manifest.shard_counts() == {'dataset.csv': 1}
+
+
+def test_reruns_replace_the_rows_of_changed_files(tmp_path, articles):
+    from Cleaning_data import process_xml_files
+
+    output = str(tmp_path / 'dataset.csv')
+    write(articles, 'a.xml', '<article><abstract><p>Old abstract.</p></abstract><body><p>Body.</p></body></article>')
+    process_xml_files(str(articles), output)
+    write(articles, 'a.xml', '<article><abstract><p>New abstract.</p></abstract><body><p>Body.</p></body></article>')
+    dry_run = process_xml_files(str(articles), output, dry_run=True)
+    assert (dry_run.changed, dry_run.unchanged) == (1, 1)
+    process_xml_files(str(articles), output)
+    rows = (tmp_path / 'dataset.csv').read_text()
+    assert 'New abstract.' in rows and 'Old abstract.' not in rows
+    assert rows.count('"a.xml"') == 1 and rows.count('"nested/b.xml"') == 1
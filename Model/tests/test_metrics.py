@@ -0,0 +1,22 @@
+from inference.metrics import Registry
+
+
+def test_label_values_and_help_are_escaped():
+    registry = Registry()
+    registry.counter('requests_total', 'Requests\nby "model" \\ path', model='a"b\\c\nd').inc(2)
+    assert registry.render().splitlines() == [
+        '# HELP requests_total Requests\\nby "model" \\\\ path',
+        '# TYPE requests_total counter',
+        'requests_total{model="a\\"b\\\\c\\nd"} 2',
+    ]
+
+
+def test_histogram_lines_keep_the_escaped_labels():
+    registry = Registry()
+    registry.histogram('latency_seconds', buckets=(1.0,), model='say "hi"').observe(0.5)
+    assert registry.render().splitlines()[2:] == [
+        'latency_seconds_bucket{model="say \\"hi\\"",le="1.0"} 1',
+        'latency_seconds_bucket{model="say \\"hi\\"",le="+Inf"} 1',
+        'latency_seconds_sum{model="say \\"hi\\""} 0.5',
+        'latency_seconds_count{model="say \\"hi\\""} 1',
+    ]
@@ -0,0 +1,161 @@
+import json
+import time
+
+import pytest
+
+from inference.registry import ModelRegistry, ModelSpec, load_config
+from inference.runtime import STATE_CLOSED, STATE_FAILED, STATE_READY, ModelRuntime
+
+
+class FakeBackend:
+    encoder_cache = None
+
+    def __init__(self, memory_bytes):
+        self._memory_bytes = memory_bytes
+
+    def memory_bytes(self):
+        return self._memory_bytes
+
+    @staticmethod
+    def count_tokens(text):
+        return len(text.split())
+
+
+@pytest.fixture(autouse=True)
+def instant_loading(monkeypatch):
+    """Runtimes 'load' at once without a model; those of a path ending in 'broken' fail."""
+
+    def load(self):
+        if self.model_path.endswith('broken'):
+            self.state = STATE_FAILED
+            self._ready.set()
+            raise RuntimeError('cannot load')
+        self.backend = FakeBackend(self.encoder_cache_bytes)
+        self.state = STATE_READY
+        self._ready.set()
+
+    monkeypatch.setattr(ModelRuntime, 'load', load)
+
+
+def spec(name, **settings):
+    return ModelSpec(name, f'/models/{settings.pop("path", name)}', **settings)
+
+
+def loaded_registry(*specs, **kwargs):
+    registry = ModelRegistry(list(specs), poll_seconds=None, **kwargs)
+    registry.load()
+    return registry
+
+
+def test_failed_reload_keeps_every_model():
+    registry = loaded_registry(spec('large'), spec('small'))
+    runtimes = [entry.runtime for entry in registry.entries.values()]
+    # The only model left would not fit in the memory budget
+    huge = spec('huge', encoder_cache_bytes=10 ** 12)
+    registry.memory_budget = 10 ** 9
+    with pytest.raises(ValueError, match='No model left'):
+        registry.reload([huge])
+    assert list(registry.entries) == ['large', 'small']
+    assert all(runtime.state == STATE_READY for runtime in runtimes)
+    assert registry.route('text').name == 'large'
+
+
+def wait_for_swaps(registry, timeout=5):
+    deadline = time.monotonic() + timeout
+    while any(entry.pending is not None for entry in registry.entries.values()):
+        assert time.monotonic() < deadline, 'swap did not finish'
+        time.sleep(0.01)
+
+
+def test_config_paths_are_relative_to_the_config_and_defaults_fill_in(tmp_path):
+    config = tmp_path / 'models.json'
+    config.write_text(json.dumps({'models': [
+        {'name': 'large', 'path': 'large', 'max_batch_size': 4},
+        {'name': 'small', 'path': '/abs/small', 'max_input_tokens': 512, 'latency_ms': 40}]}))
+    large, small = load_config(str(config), defaults={'workers': 3, 'max_batch_size': 8})
+    assert large.path == str(tmp_path / 'large') and small.path == '/abs/small'
+    assert (large.workers, large.options['max_batch_size'], small.options['max_batch_size']) == (3, 4, 8)
+    assert (small.max_input_tokens, small.latency_ms) == (512, 40)
+
+
+@pytest.mark.parametrize('models, error', [
+    ([], 'non-empty "models" list'),
+    ([{'name': 'a'}], 'name and a path'),
+    ([{'name': 'a', 'path': 'a'}, {'name': 'a', 'path': 'b'}], 'Duplicate model name a'),
+    ([{'name': 'a', 'path': 'a', 'beams': 4}], 'Unknown option'),
+    ([{'name': 'a', 'path': 'a', 'max_input_tokens': 0}], 'must be positive'),
+])
+def test_invalid_configs_are_rejected(tmp_path, models, error):
+    config = tmp_path / 'models.json'
+    config.write_text(json.dumps({'models': models}))
+    with pytest.raises(ValueError, match=error):
+        load_config(str(config))
+
+
+def test_preferred_model_waits_until_one_is_loaded():
+    registry = ModelRegistry([spec('large'), spec('small')], poll_seconds=None)
+    assert registry.route('text').name == 'large'
+    registry.entries['small'].runtime.load()
+    assert registry.route('text').name == 'small'
+
+
+def test_routing_by_input_length():
+    registry = loaded_registry(spec('short', max_input_tokens=5), spec('long', max_input_tokens=50))
+    assert registry.route('a short text').name == 'short'
+    assert registry.route(' '.join(['word'] * 20)).name == 'long'
+    # Too long for every model: the one with the longest input window
+    assert registry.route(' '.join(['word'] * 100)).name == 'long'
+
+
+def test_routing_by_latency_budget():
+    registry = loaded_registry(spec('large', latency_ms=800), spec('medium', latency_ms=300),
+                               spec('small', latency_ms=100, workers=1))
+    assert registry.route('text').name == 'large'
+    assert registry.route('text', latency_budget_ms=500).name == 'medium'
+    assert registry.route('text', latency_budget_ms=50).name == 'small'
+    # Four requests queued for the single worker of small: medium is expected to answer first
+    backlog = {'large': 0, 'medium': 0, 'small': 4}.get
+    assert registry.route('text', latency_budget_ms=50, backlog=backlog).name == 'medium'
+
+
+def test_reload_adds_removes_and_swaps_models():
+    registry = loaded_registry(spec('large'), spec('medium'), spec('small', latency_ms=100))
+    large, medium = registry.entries['large'].runtime, registry.entries['medium'].runtime
+    result = registry.reload([spec('large', path='large-v2'), spec('small', latency_ms=50), spec('tiny')])
+    assert result == {'added': ['tiny'], 'swapped': ['large'], 'removed': ['medium'], 'rejected': {}}
+    wait_for_swaps(registry)
+    assert list(registry.entries) == ['large', 'small', 'tiny']
+    assert registry.entries['large'].runtime.model_path == '/models/large-v2'
+    assert large.state == medium.state == STATE_CLOSED
+    # Routing settings change without reloading the model
+    assert registry.entries['small'].spec.latency_ms == 50
+
+
+def test_models_that_failed_to_load_are_not_retried():
+    registry = loaded_registry(spec('large'))
+    current = registry.entries['large'].runtime
+    broken = spec('large', path='large-broken')
+    assert registry.reload([broken])['swapped'] == ['large']
+    wait_for_swaps(registry)
+    assert registry.entries['large'].runtime is current and current.state == STATE_READY
+    assert registry.reload([broken])['rejected'] == {'large': 'failed to load'}
+
+
+def test_models_beyond_the_memory_budget_are_rejected():
+    registry = loaded_registry(spec('large', encoder_cache_bytes=600), memory_budget=1000)
+    result = registry.reload([spec('large', encoder_cache_bytes=600), spec('extra', encoder_cache_bytes=600)])
+    assert result['rejected'] == {'extra': 'exceeds the memory budget'}
+    assert list(registry.entries) == ['large']
+    with pytest.raises(ValueError, match='memory budget'):
+        ModelRegistry([spec('a', encoder_cache_bytes=600), spec('b', encoder_cache_bytes=600)], memory_budget=1000)
+
+
+def test_swapped_runtime_closes_once_its_requests_are_done():
+    registry = loaded_registry(spec('large'))
+    entry = registry.entries['large']
+    previous = entry._acquire()
+    registry.reload([spec('large', path='large-v2')])
+    wait_for_swaps(registry)
+    assert entry.runtime is not previous and previous.state == STATE_READY
+    entry._release(previous)
+    assert previous.state == STATE_CLOSED
@@ -0,0 +1,51 @@
+import io
+import json
+
+import pytest
+
+from training_data import iter_json_array, iter_records
+
+RECORDS = [
+    {'Abstract': 'A short abstract.', 'Body': 'Body with "quotes", brackets ] [ and a comma, inside.'},
+    {'Abstract': 'Ünïcode ✓', 'Body': 'x' * 5000, 'Pages': [1, 2.5, None, True]},
+    12345678901234567890,
+    [],
+    {},
+]
+
+
+class CountingReader(io.StringIO):
+    """Remembers the largest read, to check the file is never read whole."""
+
+    largest = 0
+
+    def read(self, size=-1):
+        self.largest = max(self.largest, size if size >= 0 else float('inf'))
+        return super().read(size)
+
+
+@pytest.mark.parametrize('indent', [None, 4])
+@pytest.mark.parametrize('read_size', [1, 7, 1 << 20])
+def test_json_array_items_match_json_load(indent, read_size):
+    text = json.dumps(RECORDS, indent=indent, ensure_ascii=False)
+    file = CountingReader(text)
+    assert list(iter_json_array(file, read_size)) == RECORDS
+    assert file.largest == read_size
+
+
+@pytest.mark.parametrize('text', ['[]', '  [ \n ]  ', '[1]'])
+def test_json_array_edge_cases(text):
+    assert list(iter_json_array(io.StringIO(text), 1)) == json.loads(text)
+
+
+@pytest.mark.parametrize('text', ['', '{"Body": "x"}', '[1 2]', '[1,', '[{"Body": "x"'])
+def test_malformed_json_arrays_are_refused(text):
+    with pytest.raises(ValueError):
+        list(iter_json_array(io.StringIO(text), 3))
+
+
+def test_formatted_dataset_json_is_read_item_by_item(tmp_path, monkeypatch):
+    path = tmp_path / 'formatted_dataset.json'
+    path.write_text(json.dumps(RECORDS[:2], indent=4), encoding='utf-8')
+    monkeypatch.setattr(json, 'load', None)
+    assert list(iter_records(str(path))) == RECORDS[:2]
@@ -0,0 +1,292 @@
+import glob
+import hashlib
+import json
+import logging
+import os
+import shutil
+
+import pyarrow as pa
+from datasets import Dataset, DatasetDict, Features, Sequence, Value, load_from_disk
+from transformers import DataCollatorForSeq2Seq
+
+logger = logging.getLogger(__name__)
+
+# Name of the per-example token count column used by the length-grouped sampler
+LENGTH_COLUMN = 'length'
+
+# Shard files picked up when the dataset path is a directory
+SHARD_SUFFIXES = ('.jsonl', '.arrow')
+
+# Characters read at a time from a JSON array file
+JSON_READ_SIZE = 1 << 20
+
+# Token ids fit in int32 and masks in int8, halving the size of the cached Arrow files
+TOKENIZED_FEATURES = Features({
+    'input_ids': Sequence(Value('int32')),
+    'attention_mask': Sequence(Value('int8')),
+    'labels': Sequence(Value('int32')),
+    LENGTH_COLUMN: Value('int32'),
+})
+
+
+def tokenizer_fingerprint(tokenizer):
+    """
+    Hash of everything that affects the token ids produced by a tokenizer.
+
+    :param tokenizer: A Hugging Face tokenizer.
+    :return: A hex digest.
+    """
+    digest = hashlib.sha256()
+    if getattr(tokenizer, 'is_fast', False):
+        digest.update(tokenizer.backend_tokenizer.to_str().encode('utf-8'))
+    else:
+        digest.update(json.dumps(tokenizer.get_vocab(), sort_keys=True).encode('utf-8'))
+    digest.update(json.dumps(tokenizer.special_tokens_map, sort_keys=True).encode('utf-8'))
+    return digest.hexdigest()
+
+
+def find_shards(data_path):
+    """
+    Input files of a dataset, in a stable order.
+
+    :param data_path: A JSON, JSONL or Arrow file, a directory of .jsonl/.arrow shards
+        (e.g. the output of Cleaning_data_json.py --jsonl) or a glob pattern.
+    :return: A sorted list of file paths.
+    """
+    if os.path.isdir(data_path):
+        paths = [path for path in glob.glob(os.path.join(data_path, '**', '*'), recursive=True)
+                 if path.endswith(SHARD_SUFFIXES)]
+    elif glob.has_magic(data_path):
+        paths = glob.glob(data_path, recursive=True)
+    else:
+        paths = [data_path]
+    if not paths:
+        raise FileNotFoundError(f'No .jsonl or .arrow shards found in {data_path}')
+    return sorted(paths)
+
+
+def iter_json_array(file, read_size=JSON_READ_SIZE):
+    """
+    Yields the items of a top-level JSON array one at a time, reading the file in chunks.
+
+    Only the item being decoded and the rest of the current chunk are held in memory.
+
+    :param file: A text file holding a JSON array, such as formatted_dataset.json.
+    :param read_size: Characters read per chunk.
+    """
+    decoder = json.JSONDecoder()
+    buffer, position, eof = '', 0, False
+
+    def fill():
+        # Drops what was consumed and appends the next chunk; False at the end of the file
+        nonlocal buffer, position, eof
+        chunk = file.read(read_size)
+        buffer, position, eof = buffer[position:] + chunk, 0, not chunk
+        return not eof
+
+    def skip_whitespace():
+        nonlocal position
+        while True:
+            while position < len(buffer) and buffer[position].isspace():
+                position += 1
+            if position < len(buffer) or not fill():
+                return
+
+    skip_whitespace()
+    if buffer[position:position + 1] != '[':
+        raise ValueError(f'{getattr(file, "name", "Input")} does not hold a JSON array')
+    position += 1
+    skip_whitespace()
+    if buffer[position:position + 1] == ']':
+        return
+    while True:
+        try:
+            item, end = decoder.raw_decode(buffer, position)
+        except json.JSONDecodeError:
+            # The item continues in the next chunk
+            if not fill():
+                raise
+            continue
+        # A number at the end of the buffer may go on in the next chunk
+        if end == len(buffer) and not eof and fill():
+            continue
+        yield item
+        position = end
+        skip_whitespace()
+        separator = buffer[position:position + 1]
+        position += 1
+        if separator == ']':
+            return
+        if separator != ',':
+            raise json.JSONDecodeError("Expecting ',' delimiter", buffer, position - 1)
+        skip_whitespace()
+
+
+def iter_records(path):
+    """
+    Reads the records of one shard lazily, one JSONL line, JSON array item or Arrow record batch at a time.
+    """
+    if path.endswith('.arrow'):
+        source = pa.memory_map(path)
+        try:
+            reader = pa.ipc.open_file(source)
+            batches = (reader.get_batch(i) for i in range(reader.num_record_batches))
+        except pa.ArrowInvalid:
+            # datasets writes Arrow streams rather than files
+            source.seek(0)
+            batches = pa.ipc.open_stream(source)
+        for batch in batches:
+            yield from batch.select(['Abstract', 'Body']).to_pylist()
+    elif path.endswith('.json'):
+        with open(path, encoding='utf-8') as file:
+            yield from iter_json_array(file)
+    else:
+        with open(path, encoding='utf-8') as file:
+            for line in file:
+                if line.strip():
+                    yield json.loads(line)
+
+
+def split_of(record, test_size, seed=42):
+    """
+    Deterministic train/validation assignment of a record from a hash of its body.
+
+    A record keeps its split when the corpus grows or is re-sharded, and
+    duplicated articles always land in the same split.
+
+    :return: 'train' or 'validation'.
+    """
+    digest = hashlib.sha256(f'{seed}\0{record["Body"]}'.encode('utf-8')).digest()
+    return 'validation' if int.from_bytes(digest[:8], 'big') < test_size * 2 ** 64 else 'train'
+
+
+def dataset_fingerprint(data_path, tokenizer, **settings):
+    """
+    Cache key of a tokenized dataset: the source files identity, the tokenizer and the preprocessing settings.
+
+    :param data_path: Path to the source dataset file, or a list of shard paths.
+    :param tokenizer: The tokenizer used for preprocessing.
+    :param settings: Any other parameter that changes the tokenized output (lengths, split, seed).
+    :return: A short hex digest.
+    """
+    digest = hashlib.sha256()
+    for path in ([data_path] if isinstance(data_path, str) else data_path):
+        stat = os.stat(path)
+        digest.update(f'{os.path.abspath(path)}\0{stat.st_size}\0{stat.st_mtime_ns}\0'.encode('utf-8'))
+    digest.update(tokenizer_fingerprint(tokenizer).encode('utf-8'))
+    digest.update(json.dumps(settings, sort_keys=True).encode('utf-8'))
+    return digest.hexdigest()[:16]
+
+
+def make_preprocess_function(tokenizer, max_input_length=1024, max_target_length=150):
+    """
+    Builds a batched tokenization function that leaves padding to the data collator.
+
+    :param tokenizer: The tokenizer.
+    :param max_input_length: Truncation length of the article bodies.
+    :param max_target_length: Truncation length of the abstracts.
+    :return: A function suitable for datasets.map(batched=True).
+    """
+    def preprocess_function(examples):
+        model_inputs = tokenizer(examples['Body'], max_length=max_input_length, truncation=True)
+        targets = tokenizer(text_target=examples['Abstract'], max_length=max_target_length, truncation=True)
+        model_inputs['labels'] = targets['input_ids']
+        model_inputs[LENGTH_COLUMN] = [len(ids) for ids in model_inputs['input_ids']]
+        return model_inputs
+
+    return preprocess_function
+
+
+def generate_tokenized(paths, split, tokenizer, test_size=0.1, seed=42, max_input_length=1024,
+                       max_target_length=150, batch_size=256):
+    """
+    Yields the tokenized examples of one split, reading and tokenizing the shards batch by batch.
+
+    :param paths: Shard paths, see find_shards().
+    :param split: 'train' or 'validation', see split_of().
+    :param batch_size: Records tokenized per tokenizer call.
+    """
+    preprocess = make_preprocess_function(tokenizer, max_input_length, max_target_length)
+
+    def encode(batch):
+        encoded = preprocess(batch)
+        for i in range(len(encoded['input_ids'])):
+            yield {name: encoded[name][i] for name in TOKENIZED_FEATURES}
+
+    batch = {'Abstract': [], 'Body': []}
+    for path in paths:
+        for record in iter_records(path):
+            if not record.get('Abstract') or not record.get('Body') or split_of(record, test_size, seed) != split:
+                continue
+            batch['Abstract'].append(record['Abstract'])
+            batch['Body'].append(record['Body'])
+            if len(batch['Body']) >= batch_size:
+                yield from encode(batch)
+                batch = {'Abstract': [], 'Body': []}
+    if batch['Body']:
+        yield from encode(batch)
+
+
+def load_tokenized_datasets(data_path, tokenizer, cache_dir='./cache/tokenized', test_size=0.1, seed=42,
+                            max_input_length=1024, max_target_length=150, num_proc=None):
+    """
+    Returns the tokenized train/validation datasets, from the on-disk cache when possible.
+
+    On a cache miss the shards are streamed through the tokenizer and written
+    to Arrow files batch by batch, then saved under cache_dir; the corpus is
+    never held in memory, so peak RSS does not grow with it. Subsequent runs
+    with the same data, tokenizer and settings load the Arrow files directly.
+    Either way the returned datasets are memory-mapped, so the Trainer's
+    length-grouped sampler and mid-epoch resume work as with in-memory data.
+
+    :param data_path: A JSON, JSONL or Arrow file, a directory of shards or a glob pattern, see find_shards().
+    :param tokenizer: The tokenizer.
+    :param cache_dir: Root directory of the tokenized dataset cache.
+    :param test_size: Fraction of the data used for validation.
+    :param seed: Seed of the hash-based split.
+    :param max_input_length: Truncation length of the article bodies.
+    :param max_target_length: Truncation length of the abstracts.
+    :param num_proc: Processes tokenizing the shards in parallel, at most one per shard.
+    :return: A DatasetDict with 'train' and 'validation' splits.
+    """
+    paths = find_shards(data_path)
+    fingerprint = dataset_fingerprint(paths, tokenizer, test_size=test_size, seed=seed, split='hash',
+                                      max_input_length=max_input_length, max_target_length=max_target_length)
+    cache_path = os.path.join(cache_dir, fingerprint)
+    if os.path.isdir(cache_path):
+        logger.info("Loading tokenized dataset from cache: %s", cache_path)
+        return load_from_disk(cache_path)
+
+    logger.info("Tokenizing %d shard(s) from '%s'.", len(paths), data_path)
+    # Arrow files written by the generators, removed once the dataset is saved
+    build_dir = cache_path + '.build'
+    shutil.rmtree(build_dir, ignore_errors=True)
+    settings = {'tokenizer': tokenizer, 'test_size': test_size, 'seed': seed,
+                'max_input_length': max_input_length, 'max_target_length': max_target_length}
+    encoded_datasets = DatasetDict({
+        # The list of paths is split between the processes, one or more shards each
+        split: Dataset.from_generator(generate_tokenized, features=TOKENIZED_FEATURES, cache_dir=build_dir,
+                                      gen_kwargs={'paths': paths, 'split': split, **settings},
+                                      num_proc=min(num_proc, len(paths)) if num_proc else None)
+        for split in ('train', 'validation')
+    })
+    # Save to a temporary directory first so an interrupted run never leaves a half-written cache
+    tmp_path = cache_path + '.tmp'
+    shutil.rmtree(tmp_path, ignore_errors=True)
+    encoded_datasets.save_to_disk(tmp_path)
+    os.replace(tmp_path, cache_path)
+    shutil.rmtree(build_dir, ignore_errors=True)
+    logger.info("Tokenized dataset cached at %s (%d train, %d validation examples)", cache_path,
+                len(encoded_datasets['train']), len(encoded_datasets['validation']))
+    return load_from_disk(cache_path)
+
+
+def build_data_collator(tokenizer, model):
+    """
+    Pads each batch to its longest example and masks label padding with -100.
+
+    :param tokenizer: The tokenizer.
+    :param model: The model, used to build decoder_input_ids from the labels.
+    :return: A DataCollatorForSeq2Seq.
+    """
+    return DataCollatorForSeq2Seq(tokenizer, model=model, label_pad_token_id=-100, pad_to_multiple_of=8)
@@ -0,0 +1,127 @@
+"""
+Latency, throughput, memory and quality of the CPU inference backends.
+
+Runs the same fixed validation sample through each backend, each in its own
+process so resident memory is measured in isolation, and reports generated
+tokens/s, p50/p95 latency per batch, peak RSS and the ROUGE delta of every
+backend against the fp32 torch backend.
+
+    python benchmarks/bench_backends.py --model Model/results/model \\
+        --data Model/formatted_dataset.json --samples 50 --backends torch,int8,onnx
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import resource
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'Model'))
+
+
+def load_sample(data_path, samples, seed=42):
+    """Fixed sample of (body, abstract) pairs from a JSON or JSONL dataset."""
+    import pandas as pd
+
+    data = pd.read_json(data_path, lines=data_path.endswith('.jsonl'))
+    data = data.sample(n=min(samples, len(data)), random_state=seed)
+    return list(data['Body']), list(data['Abstract'])
+
+
+def percentile(values, q):
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, round(q / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def run_backend(name, model_path, texts, batch_size, threads, queue):
+    import torch
+    from inference.backends import load_backend
+
+    torch.set_num_threads(threads)
+    started = time.perf_counter()
+    backend = load_backend(name, model_path, device='cpu')
+    load_seconds = time.perf_counter() - started
+
+    backend.summarize(texts[:1])  # warm-up
+    latencies, outputs, generated_tokens = [], [], 0
+    for start in range(0, len(texts), batch_size):
+        batch = texts[start:start + batch_size]
+        started = time.perf_counter()
+        summaries = backend.summarize(batch)
+        latencies.append(time.perf_counter() - started)
+        outputs.extend(summaries)
+        generated_tokens += sum(backend.count_tokens(summary) for summary in summaries)
+
+    queue.put({
+        'backend': name,
+        'load_seconds': load_seconds,
+        'latencies': latencies,
+        'tokens_per_second': generated_tokens / sum(latencies),
+        'peak_rss_mb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+        'weights_mb': backend.memory_bytes() / 1e6,
+        'outputs': outputs,
+    })
+
+
+def rouge_scores(predictions, references):
+    from rouge_score import rouge_scorer
+
+    scorer = rouge_scorer.RougeScorer(['rouge1', 'rouge2', 'rougeL'], use_stemmer=True)
+    totals = {'rouge1': 0.0, 'rouge2': 0.0, 'rougeL': 0.0}
+    for prediction, reference in zip(predictions, references):
+        for key, score in scorer.score(reference, prediction).items():
+            totals[key] += score.fmeasure
+    return {key: value / len(predictions) for key, value in totals.items()}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--model', default='Model/results/model')
+    parser.add_argument('--data', default='Model/formatted_dataset.json')
+    parser.add_argument('--samples', type=int, default=50)
+    parser.add_argument('--batch-size', type=int, default=1)
+    parser.add_argument('--threads', type=int, default=os.cpu_count())
+    parser.add_argument('--backends', default='torch,int8,onnx')
+    parser.add_argument('--output', help='Write the full results as JSON to this file')
+    args = parser.parse_args()
+
+    texts, references = load_sample(args.data, args.samples)
+    names = args.backends.split(',')
+    if 'torch' not in names:
+        names.insert(0, 'torch')  # fp32 is the quality baseline
+
+    context = multiprocessing.get_context('spawn')
+    results = {}
+    for name in names:
+        queue = context.Queue()
+        process = context.Process(target=run_backend, args=(name, args.model, texts, args.batch_size, args.threads, queue))
+        process.start()
+        results[name] = queue.get()
+        process.join()
+
+    baseline = rouge_scores(results['torch']['outputs'], references)
+    print(f'{"backend":<8} {"tok/s":>8} {"p50 s":>8} {"p95 s":>8} {"RSS MB":>8} {"weights MB":>11} '
+          f'{"dR1":>7} {"dR2":>7} {"dRL":>7} {"RL vs fp32":>11}')
+    for name in names:
+        result = results[name]
+        scores = rouge_scores(result['outputs'], references)
+        agreement = rouge_scores(result['outputs'], results['torch']['outputs'])
+        result['rouge'] = scores
+        result['rouge_delta'] = {key: scores[key] - baseline[key] for key in scores}
+        result['rougeL_vs_fp32'] = agreement['rougeL']
+        result['p50'] = percentile(result['latencies'], 50)
+        result['p95'] = percentile(result['latencies'], 95)
+        print(f'{name:<8} {result["tokens_per_second"]:>8.1f} {result["p50"]:>8.3f} {result["p95"]:>8.3f} '
+              f'{result["peak_rss_mb"]:>8.0f} {result["weights_mb"]:>11.0f} '
+              f'{result["rouge_delta"]["rouge1"]:>+7.4f} {result["rouge_delta"]["rouge2"]:>+7.4f} '
+              f'{result["rouge_delta"]["rougeL"]:>+7.4f} {result["rougeL_vs_fp32"]:>11.4f}')
+
+    if args.output:
+        with open(args.output, 'w') as file:
+            json.dump(results, file, indent=4)
+
+
+if __name__ == '__main__':
+    main()
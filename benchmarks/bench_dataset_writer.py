@@ -0,0 +1,65 @@
+"""
+Rows/second of the extraction output sinks: the per-row append_to_csv path
+against the batched DatasetWriter writing CSV and Parquet.
+
+    python benchmarks/bench_dataset_writer.py --rows 20000 --batch-size 1000
+"""
+import argparse
+import os
+import random
+import string
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'Model'))
+
+from Cleaning_data import DatasetWriter, append_to_csv
+
+
+def make_rows(count, seed=0):
+    rng = random.Random(seed)
+    words = [''.join(rng.choices(string.ascii_lowercase, k=rng.randint(3, 10))) for _ in range(2000)]
+
+    def paragraph(n_words):
+        return ' '.join(rng.choices(words, k=n_words))
+
+    return [(paragraph(200), '\n'.join(paragraph(300) for _ in range(5))) for _ in range(count)]
+
+
+def bench_append_to_csv(rows, path):
+    for abstract_text, body_text in rows:
+        append_to_csv(abstract_text, body_text, path)
+
+
+def bench_writer(rows, path, file_format, batch_size):
+    with DatasetWriter(path, file_format, batch_size=batch_size) as writer:
+        for abstract_text, body_text in rows:
+            writer.write(abstract_text, body_text)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, default=20000)
+    parser.add_argument('--batch-size', type=int, default=1000)
+    args = parser.parse_args()
+
+    rows = make_rows(args.rows)
+    cases = [
+        ('append_to_csv (per row)', 'csv', lambda path: bench_append_to_csv(rows, path)),
+        ('DatasetWriter csv', 'csv', lambda path: bench_writer(rows, path, 'csv', args.batch_size)),
+        ('DatasetWriter parquet', 'parquet', lambda path: bench_writer(rows, path, 'parquet', args.batch_size)),
+    ]
+    print(f'{"sink":<26} {"rows/s":>12} {"seconds":>9} {"MB":>8}')
+    with tempfile.TemporaryDirectory() as tmp:
+        for name, extension, run in cases:
+            path = os.path.join(tmp, f'{name.split()[0]}-{extension}.{extension}')
+            started = time.perf_counter()
+            run(path)
+            elapsed = time.perf_counter() - started
+            size_mb = os.path.getsize(path) / 1e6
+            print(f'{name:<26} {len(rows) / elapsed:>12,.0f} {elapsed:>9.2f} {size_mb:>8.1f}')
+
+
+if __name__ == '__main__':
+    main()
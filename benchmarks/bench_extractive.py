@@ -0,0 +1,85 @@
+"""
+Quality against latency of extractive summaries, extractive pre-compression and pure BART.
+
+Runs the same fixed validation sample through:
+
+- extractive: the most salient sentences, up to --words words, without the model
+  (the "extractive" mode of /process_text),
+- bart: the model on the body truncated to its 1024-token window,
+- extractive+bart@N: the body condensed to its most salient sentences within N
+  tokens, then summarized by the model (PRECOMPRESS_TOKENS=N in the API),
+
+and reports p50/p95 latency per document and ROUGE-1/2/L against the abstracts.
+
+    python benchmarks/bench_extractive.py --model Model/results/model \\
+        --data Model/formatted_dataset.json --samples 50 --budgets 256,512,1022
+"""
+import argparse
+import os
+import tempfile
+import time
+
+from bench_backends import load_sample, rouge_scores
+from common import summarize_latencies, write_results
+from tiny_model import build_tiny_model
+
+
+def run(fn, texts):
+    """Applies fn to every text, returning the outputs and the latency of each call."""
+    fn(texts[0])  # warm-up
+    outputs, latencies = [], []
+    for text in texts:
+        started = time.perf_counter()
+        outputs.append(fn(text))
+        latencies.append(time.perf_counter() - started)
+    return outputs, latencies
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--model', help='Model directory (default: a tiny model built offline)')
+    parser.add_argument('--backend', default='torch')
+    parser.add_argument('--data', default='Model/formatted_dataset.json')
+    parser.add_argument('--samples', type=int, default=50)
+    parser.add_argument('--words', type=int, default=150, help='Length of the extractive-only summaries')
+    parser.add_argument('--budgets', default='512,1022', help='Comma-separated pre-compression budgets, in tokens')
+    parser.add_argument('--threads', type=int, default=os.cpu_count())
+    parser.add_argument('--output', help='Write the results as JSON to this file')
+    args = parser.parse_args()
+
+    import torch
+    from inference.backends import load_backend
+    from inference.extractive import ExtractiveSummarizer
+
+    torch.set_num_threads(args.threads)
+    texts, references = load_sample(args.data, args.samples)
+    with tempfile.TemporaryDirectory() as workdir:
+        model_path = os.path.abspath(args.model or build_tiny_model(os.path.join(workdir, 'tiny-bart')))
+        backend = load_backend(args.backend, model_path, device='cpu')
+
+    words = ExtractiveSummarizer()
+    tokens = ExtractiveSummarizer(backend.count_tokens)
+    runs = {
+        'extractive': lambda text: words.select(text, args.words),
+        'bart': lambda text: backend.summarize([text])[0],
+    }
+    for budget in map(int, args.budgets.split(',')):
+        runs[f'extractive+bart@{budget}'] = lambda text, budget=budget: backend.summarize([tokens.select(text, budget)])[0]
+
+    results = {}
+    print(f'{"run":<24} {"p50 ms":>9} {"p95 ms":>9} {"R1":>7} {"R2":>7} {"RL":>7}')
+    for name, fn in runs.items():
+        outputs, latencies = run(fn, texts)
+        result = summarize_latencies(latencies, unit='document')
+        result['rouge'] = rouge_scores(outputs, references)
+        results[name] = result
+        print(f'{name:<24} {result["p50"] * 1000:>9.1f} {result["p95"] * 1000:>9.1f} '
+              f'{result["rouge"]["rouge1"]:>7.4f} {result["rouge"]["rouge2"]:>7.4f} {result["rouge"]["rougeL"]:>7.4f}')
+
+    if args.output:
+        write_results(args.output, 'extractive', results, model=args.model or 'tiny', backend=args.backend,
+                      samples=len(texts), words=args.words)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,156 @@
+"""
+Listing and lookup latencies of the SQLite storage layer at scale.
+
+Fills a fresh database with --rows summaries (1M by default) through bulk
+inserts, then times, through the Flask test client or the same queries the API
+runs:
+
+- the first page and random deep pages of GET /summaries (keyset pagination),
+- the same deep pages fetched with LIMIT/OFFSET, for comparison,
+- GET /get_summary/<id> of random rows (loads the text body),
+- the persistent cache lookup by content hash,
+- rating a summary (a conditional UPDATE, a rollup upsert and a commit),
+- GET /stats over every day, next to the GROUP BY scan of the summaries it replaces.
+
+With --compact, the storage is then compacted (`flask compact`: the text
+bodies, inserted uncompressed, are compressed and the free pages released)
+and GET /get_summary/<id> is timed again, next to the database size before
+and after.
+
+    python benchmarks/bench_storage.py --rows 1000000 --output storage.json
+
+The database is kept in --workdir when given, and reused by later runs with
+the same number of rows.
+"""
+import argparse
+import hashlib
+import os
+import random
+import sys
+import tempfile
+import time
+import uuid
+from datetime import datetime, timedelta
+
+from common import API_DIR, print_results, summarize_latencies, time_calls, write_results
+
+SENTENCE = 'Transformers summarize long scientific articles into short and readable abstracts. '
+MODELS = ('bart-large', 'bart-base', 'extractive')
+
+
+def populate(api, rows, body_chars, chunk_size=20000):
+    """Bulk-inserts rows summaries with bodies of about body_chars characters."""
+    body = (SENTENCE * (body_chars // len(SENTENCE) + 1))[:body_chars]
+    started = datetime(2024, 1, 1)
+    for start in range(0, rows, chunk_size):
+        summaries, texts = [], []
+        for i in range(start, min(start + chunk_size, rows)):
+            id = str(uuid.uuid4())
+            # Two rows per second, so pagination has to break created_date ties by id
+            created = (started + timedelta(seconds=i // 2)).strftime('%Y-%m-%d %H:%M:%S.%f')
+            score = random.randint(0, 10) if i % 3 == 0 else None
+            text = f'{i} {body}'
+            summaries.append((id, f'{i} {body[:api.PREVIEW_LENGTH - 8]}', False, None, score, created, 30, 150,
+                              'done', hashlib.sha256(str(i).encode()).hexdigest(), MODELS[i % len(MODELS)],
+                              len(text)))
+            texts.append((id, text, body[:600]))
+        with api.db.engine.begin() as connection:
+            connection.exec_driver_sql(
+                'INSERT INTO summary_model (id, preview, is_file, file_path, score, created_date, minsize, maxsize, '
+                'status, content_hash, model, input_length) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)', summaries)
+            connection.exec_driver_sql('INSERT INTO summary_text (id, original_text, summarized) VALUES (?, ?, ?)', texts)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, default=1_000_000)
+    parser.add_argument('--body-chars', type=int, default=4000, help='Length of each original text')
+    parser.add_argument('--page-size', type=int, default=50)
+    parser.add_argument('--iterations', type=int, default=200)
+    parser.add_argument('--compact', action='store_true', help='Compact the database and time get_summary again')
+    parser.add_argument('--workdir', help='Directory of the database (default: a temporary directory)')
+    parser.add_argument('--output', help='Write the results as JSON to this file')
+    args = parser.parse_args()
+
+    workdir = os.path.abspath(args.workdir or tempfile.mkdtemp(prefix='bench-storage-'))
+    instance_path = os.path.join(workdir, f'instance-{args.rows}')
+    # The app must be configured before it is imported; it won't load the model
+    os.environ.update(INSTANCE_PATH=instance_path, PRELOAD_MODEL='0',
+                      SUMMARIZER_MODEL_PATH=os.environ.get('SUMMARIZER_MODEL_PATH', workdir))
+    sys.path.insert(0, API_DIR)
+    import app as api
+
+    random.seed(42)
+    client = api.app.test_client()
+    with api.app.app_context():
+        existing = api.db.session.query(api.SummaryModel.id).count()
+        if existing < args.rows:
+            started = time.perf_counter()
+            populate(api, args.rows - existing, args.body_chars)
+            print(f'Inserted {args.rows - existing} rows in {time.perf_counter() - started:.1f}s')
+            # The bulk inserts bypass rate_summary, so the rating rollups are rebuilt from the rows
+            started = time.perf_counter()
+            ratings, rollups = api.backfill_rating_rollups()
+            print(f'Rolled up {ratings} ratings into {rollups} rows in {time.perf_counter() - started:.1f}s')
+        ids = [row[0] for row in api.db.session.query(api.SummaryModel.id).all()]
+        positions = api.db.session.query(api.SummaryModel.created_date, api.SummaryModel.id).order_by(
+            api.SummaryModel.created_date.desc(), api.SummaryModel.id.desc())
+        deep_rows = [positions.offset(random.randrange(len(ids))).first() for _ in range(20)]
+        hashes = [row[0] for row in api.db.session.query(api.SummaryModel.content_hash).limit(10000).all()]
+        unrated = [row[0] for row in api.db.session.query(api.SummaryModel.id)
+                   .filter(api.SummaryModel.score.is_(None)).limit(args.iterations + 1).all()]
+        api.db.session.remove()
+
+    page = f'/summaries?limit={args.page_size}'
+    cursors = [api.encode_cursor(*row) for row in deep_rows]
+    offsets = [random.randrange(len(ids)) for _ in range(20)]
+
+    def list_offset():
+        # What an OFFSET-paginated listing would run for the same page
+        with api.app.app_context():
+            (api.db.session.query(*api.LIST_COLUMNS)
+             .order_by(api.SummaryModel.created_date.desc(), api.SummaryModel.id.desc())
+             .offset(random.choice(offsets)).limit(args.page_size).all())
+
+    def lookup_hash():
+        with api.app.app_context():
+            api.lookup_summary(random.choice(hashes))
+
+    def rate():
+        client.put(f'/rate_summary/{unrated.pop()}', json={'score': 5})
+
+    def scan_stats():
+        # What /stats would cost without the rollups
+        with api.app.app_context():
+            api.db.session.execute(api.scan_ratings()).all()
+
+    results = {
+        'list_first_page': summarize_latencies(time_calls(lambda: client.get(page), args.iterations), unit='page'),
+        'list_deep_page_keyset': summarize_latencies(
+            time_calls(lambda: client.get(f'{page}&cursor={random.choice(cursors)}'), args.iterations), unit='page'),
+        'list_deep_page_offset': summarize_latencies(time_calls(list_offset, max(1, args.iterations // 10)), unit='page'),
+        'get_summary': summarize_latencies(
+            time_calls(lambda: client.get(f'/get_summary/{random.choice(ids)}'), args.iterations), unit='row'),
+        'cache_lookup': summarize_latencies(time_calls(lookup_hash, args.iterations), unit='row'),
+        'rate_summary': summarize_latencies(time_calls(rate, args.iterations), unit='row'),
+        'stats_rollups': summarize_latencies(
+            time_calls(lambda: client.get(f'/stats?days={api.MAX_STATS_DAYS}'), args.iterations), unit='request'),
+        'stats_full_scan': summarize_latencies(time_calls(scan_stats, max(1, args.iterations // 10)), unit='request'),
+    }
+    compaction = None
+    if args.compact:
+        compaction = api.run_compaction(full=True)
+        results['get_summary_compacted'] = summarize_latencies(
+            time_calls(lambda: client.get(f'/get_summary/{random.choice(ids)}'), args.iterations), unit='row')
+    print_results(results)
+    print(f'Database: {os.path.getsize(os.path.join(instance_path, "app.db")) / 1e6:.0f} MB in {instance_path}')
+    if compaction:
+        print(f"Compaction: {compaction['database_bytes_before'] / 1e6:.0f} MB -> "
+              f"{compaction['database_bytes_after'] / 1e6:.0f} MB in {compaction['seconds']:.1f}s")
+    if args.output:
+        write_results(args.output, 'storage', results, rows=args.rows, body_chars=args.body_chars,
+                      page_size=args.page_size, compaction=compaction)
+
+
+if __name__ == '__main__':
+    main()
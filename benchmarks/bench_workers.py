@@ -0,0 +1,112 @@
+"""
+Throughput of the pre-forked server (API/gunicorn.conf.py) as the number of
+worker processes grows, and how much of the model memory the workers share.
+
+For each worker count a server is started against a temporary database, the
+given number of distinct texts is submitted concurrently to /process_text and
+every summary is polled until done.
+
+    python benchmarks/bench_workers.py --model Model/results/model --workers 1,2,4 --requests 64
+"""
+import argparse
+import os
+import signal
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from common import API_DIR, call, wait_ready
+
+
+def summarize_and_wait(base_url, text):
+    started = time.perf_counter()
+    _, created = call('POST', f'{base_url}/process_text', {'text': text, 'minsize': 30, 'maxsize': 150})
+    while True:
+        _, summary = call('GET', f'{base_url}/get_summary/{created["id"]}')
+        if summary['status'] in ('done', 'failed'):
+            return time.perf_counter() - started, summary['status']
+        time.sleep(0.05)
+
+
+def memory_of(pid):
+    """Rss and Pss in MB of a process, from /proc/<pid>/smaps_rollup."""
+    values = {}
+    with open(f'/proc/{pid}/smaps_rollup') as file:
+        for line in file:
+            key, _, rest = line.partition(':')
+            if key in ('Rss', 'Pss'):
+                values[key] = int(rest.split()[0]) / 1024
+    return values
+
+
+def worker_pids(master_pid):
+    pids = []
+    for entry in os.listdir('/proc'):
+        if entry.isdigit():
+            try:
+                with open(f'/proc/{entry}/stat') as file:
+                    if int(file.read().rsplit(')', 1)[1].split()[1]) == master_pid:
+                        pids.append(int(entry))
+            except (FileNotFoundError, IndexError, ValueError):
+                pass
+    return pids
+
+
+def run(worker_count, args, texts):
+    port = args.port + worker_count
+    base_url = f'http://127.0.0.1:{port}'
+    with tempfile.TemporaryDirectory() as instance_path:
+        env = dict(os.environ, WEB_WORKERS=str(worker_count), BIND=f'127.0.0.1:{port}', INSTANCE_PATH=instance_path,
+                   SUMMARIZER_MODEL_PATH=os.path.abspath(args.model), INFERENCE_BACKEND=args.backend)
+        server = subprocess.Popen([sys.executable, '-m', 'gunicorn', '-c', 'gunicorn.conf.py', 'app:app'],
+                                  cwd=API_DIR, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        try:
+            wait_ready(base_url, args.startup_timeout)
+            started = time.perf_counter()
+            with ThreadPoolExecutor(args.concurrency) as pool:
+                results = list(pool.map(lambda text: summarize_and_wait(base_url, text), texts))
+            elapsed = time.perf_counter() - started
+            memory = [memory_of(pid) for pid in worker_pids(server.pid)]
+        finally:
+            server.send_signal(signal.SIGTERM)
+            server.wait(timeout=30)
+
+    latencies = sorted(latency for latency, _ in results)
+    return {
+        'workers': worker_count,
+        'throughput': len(texts) / elapsed,
+        'p50': latencies[len(latencies) // 2],
+        'p95': latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))],
+        'failed': sum(status != 'done' for _, status in results),
+        'rss_mb': sum(m['Rss'] for m in memory),
+        'pss_mb': sum(m['Pss'] for m in memory),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--model', default='Model/results/model')
+    parser.add_argument('--backend', default='torch')
+    parser.add_argument('--workers', default='1,2,4')
+    parser.add_argument('--requests', type=int, default=64)
+    parser.add_argument('--concurrency', type=int, default=16)
+    parser.add_argument('--port', type=int, default=5100)
+    parser.add_argument('--startup-timeout', type=float, default=300)
+    args = parser.parse_args()
+
+    # Distinct texts so that the summary cache never answers
+    texts = [f'Sample {i}. ' + 'Transformers summarize long scientific articles into short abstracts. ' * 40
+             for i in range(args.requests)]
+    rows = [run(int(count), args, texts) for count in args.workers.split(',')]
+
+    print(f'{"workers":>7} {"req/s":>8} {"scaling":>8} {"p50 s":>8} {"p95 s":>8} {"failed":>7} '
+          f'{"RSS MB":>8} {"PSS MB":>8}')
+    for row in rows:
+        print(f'{row["workers"]:>7} {row["throughput"]:>8.2f} {row["throughput"] / rows[0]["throughput"]:>7.2f}x '
+              f'{row["p50"]:>8.3f} {row["p95"]:>8.3f} {row["failed"]:>7} {row["rss_mb"]:>8.0f} {row["pss_mb"]:>8.0f}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,104 @@
+"""Helpers shared by the benchmark scripts: timing, percentiles, result files and HTTP calls."""
+import json
+import os
+import platform
+import sys
+import time
+import urllib.error
+import urllib.request
+from datetime import datetime, timezone
+
+REPO_ROOT = os.path.abspath(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+API_DIR = os.path.join(REPO_ROOT, 'API')
+MODEL_DIR = os.path.join(REPO_ROOT, 'Model')
+
+
+def percentile(values, q):
+    """Nearest-rank percentile of a list of numbers."""
+    ordered = sorted(values)
+    if not ordered:
+        return None
+    index = min(len(ordered) - 1, max(0, round(q / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def summarize_latencies(latencies, elapsed=None, errors=0, unit='op'):
+    """
+    Standard result entry: throughput, p50/p95/p99 latency in seconds and error rate.
+
+    :param latencies: Latencies of the successful operations, in seconds.
+    :param elapsed: Wall time of the run; defaults to the sum of the latencies (sequential runs).
+    :param errors: Number of failed operations.
+    :param unit: What one operation is, e.g. 'request' or 'batch'.
+    """
+    total = len(latencies) + errors
+    elapsed = elapsed if elapsed is not None else sum(latencies)
+    return {
+        'unit': unit,
+        'count': total,
+        'throughput': len(latencies) / elapsed if elapsed else 0.0,
+        'p50': percentile(latencies, 50),
+        'p95': percentile(latencies, 95),
+        'p99': percentile(latencies, 99),
+        'error_rate': errors / total if total else 0.0,
+    }
+
+
+def time_calls(fn, iterations, warmup=1):
+    """Runs fn sequentially and returns the latency of each call."""
+    for _ in range(warmup):
+        fn()
+    latencies = []
+    for _ in range(iterations):
+        started = time.perf_counter()
+        fn()
+        latencies.append(time.perf_counter() - started)
+    return latencies
+
+
+def write_results(path, suite, results, **metadata):
+    """Writes a machine-readable result file that compare.py understands."""
+    document = {
+        'suite': suite,
+        'created': datetime.now(timezone.utc).isoformat(),
+        'environment': {
+            'python': sys.version.split()[0],
+            'platform': platform.platform(),
+            'cpus': os.cpu_count(),
+        },
+        'metadata': metadata,
+        'results': results,
+    }
+    with open(path, 'w') as file:
+        json.dump(document, file, indent=4)
+
+
+def print_results(results):
+    print(f'{"benchmark":<28} {"count":>6} {"ops/s":>10} {"p50 ms":>9} {"p95 ms":>9} {"p99 ms":>9} {"errors":>7}')
+    for name, result in results.items():
+        p50, p95, p99 = (result[key] * 1000 if result[key] is not None else float('nan') for key in ('p50', 'p95', 'p99'))
+        print(f'{name:<28} {result["count"]:>6} {result["throughput"]:>10.2f} {p50:>9.2f} {p95:>9.2f} {p99:>9.2f} '
+              f'{result["error_rate"]:>7.1%}')
+
+
+def call(method, url, body=None, timeout=60):
+    """JSON HTTP call returning (status, decoded body); HTTP errors are returned, not raised."""
+    data = json.dumps(body).encode('utf-8') if body is not None else None
+    request = urllib.request.Request(url, data=data, method=method, headers={'Content-Type': 'application/json'})
+    try:
+        with urllib.request.urlopen(request, timeout=timeout) as response:
+            return response.status, json.loads(response.read())
+    except urllib.error.HTTPError as e:
+        return e.code, json.loads(e.read() or b'null')
+
+
+def wait_ready(base_url, timeout):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            if call('GET', f'{base_url}/readyz')[0] == 200:
+                return
+        except (urllib.error.URLError, ConnectionError):
+            pass
+        time.sleep(0.5)
+    raise RuntimeError(f'Server at {base_url} not ready after {timeout}s')
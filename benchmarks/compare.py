@@ -0,0 +1,64 @@
+"""
+Compares two benchmark result files written by micro.py or loadgen.py and
+flags regressions: throughput drops or p50/p95/p99 latency increases beyond
+the threshold, and error-rate increases. Exits with status 1 on regression.
+
+    python benchmarks/compare.py baseline.json candidate.json --threshold 0.10
+"""
+import argparse
+import json
+import sys
+
+HIGHER_IS_BETTER = ('throughput',)
+LOWER_IS_BETTER = ('p50', 'p95', 'p99')
+
+
+def compare(baseline, candidate, threshold, error_threshold):
+    """
+    :return: A list of (benchmark, metric, baseline, candidate, relative change, regressed) rows.
+    """
+    rows = []
+    for name, base in baseline['results'].items():
+        current = candidate['results'].get(name)
+        if current is None:
+            continue
+        for metric in HIGHER_IS_BETTER + LOWER_IS_BETTER:
+            if not base.get(metric) or current.get(metric) is None:
+                continue
+            change = (current[metric] - base[metric]) / base[metric]
+            regressed = change < -threshold if metric in HIGHER_IS_BETTER else change > threshold
+            rows.append((name, metric, base[metric], current[metric], change, regressed))
+        error_change = current['error_rate'] - base['error_rate']
+        rows.append((name, 'error_rate', base['error_rate'], current['error_rate'], error_change,
+                     error_change > error_threshold))
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('baseline')
+    parser.add_argument('candidate')
+    parser.add_argument('--threshold', type=float, default=0.10, help='Relative change tolerated (0.10 = 10%%)')
+    parser.add_argument('--error-threshold', type=float, default=0.01, help='Absolute error-rate increase tolerated')
+    args = parser.parse_args()
+
+    with open(args.baseline) as file:
+        baseline = json.load(file)
+    with open(args.candidate) as file:
+        candidate = json.load(file)
+    if baseline['suite'] != candidate['suite']:
+        sys.exit(f"Cannot compare a '{baseline['suite']}' run with a '{candidate['suite']}' run")
+
+    rows = compare(baseline, candidate, args.threshold, args.error_threshold)
+    print(f'{"benchmark":<28} {"metric":<11} {"baseline":>12} {"candidate":>12} {"change":>9}')
+    for name, metric, base, current, change, regressed in rows:
+        flag = '  REGRESSION' if regressed else ''
+        print(f'{name:<28} {metric:<11} {base:>12.4g} {current:>12.4g} {change:>+9.1%}{flag}')
+
+    regressions = sum(row[-1] for row in rows)
+    print(f'\n{regressions} regression(s) beyond {args.threshold:.0%}')
+    sys.exit(1 if regressions else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,160 @@
+"""
+Load generator for the API: each virtual user submits a text to /process_text,
+polls /get_summary until the summary is done and rates it with /rate_summary.
+
+Runs against an existing instance (--url) or starts a local gunicorn server
+with a temporary database and a tiny offline model (--local).
+
+    python benchmarks/loadgen.py --local --concurrency 8 --duration 30 --output load.json
+    python benchmarks/loadgen.py --url http://localhost:5000 --concurrency 32 --requests 500
+"""
+import argparse
+import os
+import random
+import signal
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+
+from common import API_DIR, call, print_results, summarize_latencies, wait_ready, write_results
+from tiny_model import build_tiny_model
+
+SENTENCE = 'Transformers summarize long scientific articles into short and readable abstracts. '
+
+
+class Recorder:
+    """Thread-safe per-endpoint latency and error collection."""
+
+    def __init__(self):
+        self.latencies = defaultdict(list)
+        self.errors = defaultdict(int)
+        self._lock = threading.Lock()
+
+    def timed_call(self, name, method, url, body=None, ok=(200,)):
+        started = time.perf_counter()
+        try:
+            status, data = call(method, url, body)
+        except Exception:
+            status, data = None, None
+        elapsed = time.perf_counter() - started
+        with self._lock:
+            if status in ok:
+                self.latencies[name].append(elapsed)
+            else:
+                self.errors[name] += 1
+        return status, data
+
+    def record(self, name, latency=None):
+        with self._lock:
+            if latency is None:
+                self.errors[name] += 1
+            else:
+                self.latencies[name].append(latency)
+
+
+def virtual_user(base_url, recorder, texts, stop, args):
+    rng = random.Random()
+    while not stop():
+        text = rng.choice(texts) if rng.random() >= args.unique_ratio else f'{rng.random()} {rng.choice(texts)}'
+        started = time.perf_counter()
+        status, created = recorder.timed_call('process_text', 'POST', f'{base_url}/process_text',
+                                              {'text': text, 'minsize': 30, 'maxsize': 150}, ok=(201, 202))
+        if status not in (201, 202):
+            recorder.record('summary_e2e')
+            continue
+
+        summary = created
+        deadline = time.monotonic() + args.job_timeout
+        while summary.get('status') not in ('done', 'failed') and time.monotonic() < deadline:
+            time.sleep(args.poll_interval)
+            status, summary = recorder.timed_call('get_summary', 'GET', f'{base_url}/get_summary/{created["id"]}')
+            summary = summary if status == 200 else {}
+        if summary.get('status') != 'done':
+            recorder.record('summary_e2e')
+            continue
+        recorder.record('summary_e2e', time.perf_counter() - started)
+
+        recorder.timed_call('rate_summary', 'PUT', f'{base_url}/rate_summary/{created["id"]}',
+                            {'score': rng.randint(0, 10)})
+
+
+def start_local_server(args, workdir):
+    model_path = os.path.abspath(args.model or build_tiny_model(os.path.join(workdir, 'tiny-bart')))
+    env = dict(os.environ, WEB_WORKERS=str(args.workers), BIND=f'127.0.0.1:{args.port}',
+               INSTANCE_PATH=os.path.join(workdir, 'instance'), SUMMARIZER_MODEL_PATH=model_path)
+    return subprocess.Popen([sys.executable, '-m', 'gunicorn', '-c', 'gunicorn.conf.py', 'app:app'],
+                            cwd=API_DIR, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+
+def run_load(base_url, args):
+    texts = [f'Document {i}. ' + SENTENCE * args.text_sentences for i in range(args.distinct_texts)]
+    recorder = Recorder()
+    started = time.perf_counter()
+    issued = iter(range(args.requests)) if args.requests else None
+    issued_lock = threading.Lock()
+
+    def stop():
+        if issued is not None:
+            with issued_lock:
+                return next(issued, None) is None
+        return time.perf_counter() - started >= args.duration
+
+    with ThreadPoolExecutor(args.concurrency) as pool:
+        for _ in range(args.concurrency):
+            pool.submit(virtual_user, base_url, recorder, texts, stop, args)
+    elapsed = time.perf_counter() - started
+
+    names = sorted(set(recorder.latencies) | set(recorder.errors))
+    return {
+        name: summarize_latencies(recorder.latencies[name], elapsed=elapsed, errors=recorder.errors[name],
+                                  unit='request')
+        for name in names
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    target = parser.add_mutually_exclusive_group(required=True)
+    target.add_argument('--url', help='Base URL of a running instance')
+    target.add_argument('--local', action='store_true', help='Start a local server for the run')
+    parser.add_argument('--model', help='Model for --local (default: a tiny model built offline)')
+    parser.add_argument('--workers', type=int, default=1, help='gunicorn workers for --local')
+    parser.add_argument('--port', type=int, default=5050)
+    parser.add_argument('--concurrency', type=int, default=8)
+    parser.add_argument('--duration', type=float, default=30, help='Seconds to run (ignored with --requests)')
+    parser.add_argument('--requests', type=int, help='Number of summaries to request instead of a duration')
+    parser.add_argument('--distinct-texts', type=int, default=50)
+    parser.add_argument('--unique-ratio', type=float, default=0.5,
+                        help='Fraction of requests made unique so they bypass the summary cache')
+    parser.add_argument('--text-sentences', type=int, default=40)
+    parser.add_argument('--poll-interval', type=float, default=0.1)
+    parser.add_argument('--job-timeout', type=float, default=120)
+    parser.add_argument('--output', help='Write the results as JSON to this file')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as workdir:
+        server = None
+        base_url = args.url
+        if args.local:
+            server = start_local_server(args, workdir)
+            base_url = f'http://127.0.0.1:{args.port}'
+        try:
+            wait_ready(base_url, timeout=300)
+            results = run_load(base_url, args)
+        finally:
+            if server is not None:
+                server.send_signal(signal.SIGTERM)
+                server.wait(timeout=30)
+
+    print_results(results)
+    if args.output:
+        write_results(args.output, 'load', results, url=args.url or 'local', concurrency=args.concurrency,
+                      workers=args.workers, unique_ratio=args.unique_ratio)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,124 @@
+"""
+Microbenchmarks of the hot paths: tokenization, generate and decode through
+the inference backend, the XML extraction functions and the SQLite commit of a
+SummaryModel row. Runs offline against a tiny local model by default.
+
+    python benchmarks/micro.py --output micro.json
+    python benchmarks/micro.py --model Model/results/model --iterations 20 --output micro-bart.json
+"""
+import argparse
+import os
+import sys
+import tempfile
+import xml.etree.ElementTree as ET
+
+from common import API_DIR, MODEL_DIR, print_results, summarize_latencies, time_calls, write_results
+from tiny_model import build_tiny_model
+
+sys.path.insert(0, MODEL_DIR)
+
+SENTENCE = 'Transformers summarize long scientific articles into short and readable abstracts. '
+
+
+def sample_article(paragraphs=40):
+    sections = ''.join(
+        f'<sec><title>Section {i}</title><p>{SENTENCE * 8}<italic>term</italic> {SENTENCE * 4}</p></sec>'
+        for i in range(paragraphs)
+    )
+    return (f'<article><front><article-meta><abstract><p>{SENTENCE * 5}</p></abstract></article-meta></front>'
+            f'<body>{sections}</body><back><ref-list>{"<ref>Reference</ref>" * 50}</ref-list></back></article>')
+
+
+def bench_inference(model_path, backend_name, batch_size, iterations):
+    import torch
+    from inference.backends import DEFAULT_GENERATION, load_backend
+
+    backend = load_backend(backend_name, model_path, device='cpu')
+    texts = [f'Document {i}. ' + SENTENCE * 60 for i in range(batch_size)]
+    inputs = backend.tokenize(texts)
+    with torch.inference_mode():
+        summary_ids = backend.model.generate(inputs['input_ids'], attention_mask=inputs['attention_mask'],
+                                             **DEFAULT_GENERATION)
+
+    def generate():
+        with torch.inference_mode():
+            backend.model.generate(inputs['input_ids'], attention_mask=inputs['attention_mask'], **DEFAULT_GENERATION)
+
+    return {
+        'tokenize': summarize_latencies(time_calls(lambda: backend.tokenize(texts), iterations * 10), unit='batch'),
+        'generate': summarize_latencies(time_calls(generate, iterations), unit='batch'),
+        'decode': summarize_latencies(
+            time_calls(lambda: backend.tokenizer.batch_decode(summary_ids, skip_special_tokens=True), iterations * 10),
+            unit='batch'),
+    }
+
+
+def bench_extraction(iterations, workdir):
+    import Cleaning_data_json
+
+    path = os.path.join(workdir, 'article.xml')
+    with open(path, 'w') as file:
+        file.write(sample_article())
+    body = ET.parse(path).getroot().find('.//body')
+
+    def parse_tree():
+        root = ET.parse(path).getroot()
+        Cleaning_data_json.extract_text_with_spaces_and_newlines(root.find('.//abstract'))
+        Cleaning_data_json.extract_text_with_spaces_and_newlines(root.find('.//body'))
+
+    return {
+        'extract_text': summarize_latencies(
+            time_calls(lambda: Cleaning_data_json.extract_text_with_spaces_and_newlines(body), iterations * 10),
+            unit='section'),
+        'parse_article_etree': summarize_latencies(time_calls(parse_tree, iterations * 10), unit='file'),
+        'parse_article_iterparse': summarize_latencies(
+            time_calls(lambda: Cleaning_data_json.parse_article(path), iterations * 10), unit='file'),
+    }
+
+
+def bench_db_commit(model_path, iterations, workdir):
+    # The app must be configured before it is imported; it won't load the model
+    os.environ.update(INSTANCE_PATH=workdir, PRELOAD_MODEL='0', SUMMARIZER_MODEL_PATH=model_path)
+    sys.path.insert(0, API_DIR)
+    import app as api
+
+    text = SENTENCE * 200
+
+    def commit():
+        api.db.session.add(api.SummaryModel(original_text=text, minsize=30, maxsize=150, is_file=False,
+                                            summarized=text[:500], status='done'))
+        api.db.session.commit()
+
+    with api.app.app_context():
+        return {'db_commit': summarize_latencies(time_calls(commit, iterations * 10), unit='row')}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--model', help='Model directory (default: a tiny model built offline)')
+    parser.add_argument('--backend', default='torch')
+    parser.add_argument('--batch-size', type=int, default=4)
+    parser.add_argument('--iterations', type=int, default=10)
+    parser.add_argument('--only', help='Comma-separated groups to run: inference,extraction,db')
+    parser.add_argument('--output', help='Write the results as JSON to this file')
+    args = parser.parse_args()
+
+    groups = set((args.only or 'inference,extraction,db').split(','))
+    with tempfile.TemporaryDirectory() as workdir:
+        model_path = os.path.abspath(args.model or build_tiny_model(os.path.join(workdir, 'tiny-bart')))
+        results = {}
+        if 'inference' in groups:
+            results.update(bench_inference(model_path, args.backend, args.batch_size, args.iterations))
+        if 'extraction' in groups:
+            results.update(bench_extraction(args.iterations, workdir))
+        if 'db' in groups:
+            results.update(bench_db_commit(model_path, args.iterations, workdir))
+
+    print_results(results)
+    if args.output:
+        write_results(args.output, 'micro', results, model=args.model or 'tiny', backend=args.backend,
+                      batch_size=args.batch_size)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,51 @@
+"""
+Builds a tiny, randomly initialized BART model and byte-level tokenizer on
+disk, without any download, so the benchmarks can run offline. Its summaries
+are gibberish; only the code paths and their relative costs are realistic.
+
+    python benchmarks/tiny_model.py /tmp/tiny-bart
+"""
+import argparse
+import json
+import os
+
+
+def build_tiny_model(output_dir, d_model=64, layers=2, heads=4):
+    """
+    Saves a tiny BartForConditionalGeneration with its tokenizer to output_dir.
+
+    :return: output_dir
+    """
+    from transformers import BartConfig, BartForConditionalGeneration, BartTokenizerFast
+    from transformers.models.gpt2.tokenization_gpt2 import bytes_to_unicode
+
+    os.makedirs(output_dir, exist_ok=True)
+    if os.path.exists(os.path.join(output_dir, 'model.safetensors')):
+        return output_dir
+
+    # Byte-level vocabulary without merges: every byte is one token
+    tokens = ['<s>', '<pad>', '</s>', '<unk>'] + list(bytes_to_unicode().values()) + ['<mask>']
+    vocab_path = os.path.join(output_dir, 'vocab.json')
+    merges_path = os.path.join(output_dir, 'merges.txt')
+    with open(vocab_path, 'w') as file:
+        json.dump({token: i for i, token in enumerate(tokens)}, file)
+    with open(merges_path, 'w') as file:
+        file.write('#version: 0.2\n')
+    tokenizer = BartTokenizerFast(vocab_file=vocab_path, merges_file=merges_path)
+
+    config = BartConfig(
+        vocab_size=len(tokens), d_model=d_model, encoder_layers=layers, decoder_layers=layers,
+        encoder_attention_heads=heads, decoder_attention_heads=heads,
+        encoder_ffn_dim=d_model * 4, decoder_ffn_dim=d_model * 4, max_position_embeddings=1024,
+        pad_token_id=1, bos_token_id=0, eos_token_id=2, decoder_start_token_id=2,
+    )
+    BartForConditionalGeneration(config).save_pretrained(output_dir)
+    tokenizer.save_pretrained(output_dir)
+    return output_dir
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('output_dir')
+    args = parser.parse_args()
+    print(build_tiny_model(args.output_dir))
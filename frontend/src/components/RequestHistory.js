@@ -1,18 +1,44 @@
 import React, { useEffect, useState } from 'react';
+import { Link as RouterLink } from 'react-router-dom';
 import {
-  Container, Box, Typography, CssBaseline, List, ListItem, Link
+  Container, Box, Typography, CssBaseline, List, ListItem, ListItemText, Link, Button, CircularProgress
 } from '@mui/material';
 import Header from '../components/Header'; // Import the Header component
 
 const backendUrl = 'http://5.10.248.171:5000'; // Your backend URL
+const PAGE_SIZE = 20;
 
 const RequestHistory = () => {
   const [history, setHistory] = useState([]);
+  const [nextCursor, setNextCursor] = useState(null);
+  const [loading, setLoading] = useState(false);
+  const [error, setError] = useState('');
+
+  // Fetch one page of summaries, newest first, continuing after the given cursor
+  const loadPage = async (cursor) => {
+    setLoading(true);
+    try {
+      const params = new URLSearchParams({ limit: PAGE_SIZE });
+      if (cursor) {
+        params.set('cursor', cursor);
+      }
+      const response = await fetch(`${backendUrl}/summaries?${params}`);
+      if (!response.ok) {
+        throw new Error('Failed to load the request history');
+      }
+      const data = await response.json();
+      setHistory((previous) => (cursor ? [...previous, ...data.summaries] : data.summaries));
+      setNextCursor(data.next_cursor);
+      setError('');
+    } catch (err) {
+      setError(err.message);
+    } finally {
+      setLoading(false);
+    }
+  };
 
   useEffect(() => {
-    // Retrieve history from local storage
-    const savedHistory = JSON.parse(localStorage.getItem('resultIds')) || [];
-    setHistory(savedHistory);
+    loadPage(null);
   }, []);
 
   return (
@@ -39,19 +65,36 @@ const RequestHistory = () => {
         <Typography variant="h4" gutterBottom>
           Request History
         </Typography>
-        <List>
+        {error && (
+          <Typography variant="body1" color="error">
+            {error}
+          </Typography>
+        )}
+        <List sx={{ width: '100%' }}>
           {history.length > 0 ? (
-            history.map((id, index) => (
-              <ListItem key={index}>
-                <Link href={`${backendUrl}/get_summary/${id}`} target="_blank" rel="noopener noreferrer">
-                  View Summary for Request ID: {id}
-                </Link>
+            history.map((summary) => (
+              <ListItem key={summary.id} divider>
+                <ListItemText
+                  primary={
+                    <Link component={RouterLink} to={`/result/${summary.id}`}>
+                      {summary.preview || summary.id}
+                    </Link>
+                  }
+                  secondary={`${new Date(`${summary.created_date}Z`).toLocaleString()} · ${summary.status}`
+                    + (summary.score !== null ? ` · rated ${summary.score}` : '')}
+                />
               </ListItem>
             ))
           ) : (
-            <Typography variant="body1">No history available.</Typography>
+            !loading && <Typography variant="body1">No history available.</Typography>
           )}
         </List>
+        {loading && <CircularProgress />}
+        {nextCursor && !loading && (
+          <Button variant="outlined" onClick={() => loadPage(nextCursor)}>
+            Load more
+          </Button>
+        )}
       </Box>
       <footer
         style={{
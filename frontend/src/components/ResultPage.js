@@ -7,6 +7,7 @@ import Header from './Header'; // Assuming you have this component available
 
 //const backendUrl = process.env.REACT_APP_BACKEND_URL;
 const backendUrl = 'http://5.10.248.171:5000';
+const POLL_INTERVAL_MS = 1500;
 function ResultPage() {
   const { id } = useParams();
   const [rating, setRating] = useState(0);
@@ -14,22 +15,44 @@ function ResultPage() {
   const [error, setError] = useState(null);
 
   useEffect(() => {
+    // Set on unmount: a response still in flight must neither update state nor poll again
+    let cancelled = false;
+    let timer = null;
     const fetchResult = async () => {
       try {
         const response = await fetch(`${backendUrl}/get_summary/${id}`);
+        if (cancelled) {
+          return;
+        }
         if (!response.ok) {
           throw new Error('Summary not found');
         }
         const data = await response.json();
+        if (cancelled) {
+          return;
+        }
         setResult(data);
         setRating(data.score || 0);  // Set initial rating if already rated
+        if (data.status === 'queued' || data.status === 'running') {
+          // Summaries are computed in the background, poll until the job finishes
+          timer = setTimeout(fetchResult, POLL_INTERVAL_MS);
+        } else if (data.status === 'failed') {
+          setError('The summarization failed. Please try again.');
+        }
       } catch (error) {
+        if (cancelled) {
+          return;
+        }
         console.error('Error fetching result:', error);
         setError('Failed to fetch the summary.');
       }
     };
 
     fetchResult();
+    return () => {
+      cancelled = true;
+      clearTimeout(timer);
+    };
   }, [id]);
 
   const handleRating = async (newRating) => {
@@ -83,7 +106,14 @@ function ResultPage() {
               </Typography>
             )} */}
             <Typography variant="h6" sx={{ mt: 2 }}>Summarized Text:</Typography>
-            <Typography variant="body1" paragraph>{result.summarized}</Typography>
+            {result.status === 'done' ? (
+              <Typography variant="body1" paragraph>{result.summarized}</Typography>
+            ) : result.status !== 'failed' && (
+              <Box sx={{ display: 'flex', alignItems: 'center', gap: 2 }}>
+                <CircularProgress size={24} />
+                <Typography variant="body1">Summarizing ({result.status})...</Typography>
+              </Box>
+            )}
             {/* <Typography variant="h6">Score:</Typography>
             <Typography variant="body1">
               {result.score !== null ? result.score : 'Not rated yet'}
@@ -13,6 +13,9 @@ const SummarizePage = () => {
   const [maxSize, setMaxSize] = useState(75);
   const [isFileInput, setIsFileInput] = useState(false);
   const [selectedFile, setSelectedFile] = useState(null);
+  const [streamedText, setStreamedText] = useState('');
+  const [isStreaming, setIsStreaming] = useState(false);
+  const [resultId, setResultId] = useState(null);
 
   const handleInputChange = (event) => {
     setInputText(event.target.value);
@@ -41,37 +44,96 @@ const SummarizePage = () => {
   };
 
   const handleSubmit = () => {
-    const url = isFileInput && selectedFile ? `${backendUrl}/process_file` : `${backendUrl}/process_text`;
-
-    const requestBody = {
-      is_file: isFileInput,
-      minsize: minSize,
-      maxsize: maxSize,
-    };
-
     if (isFileInput && selectedFile) {
-      // Convert the file to a base64 string
-      const reader = new FileReader();
-      reader.onloadend = () => {
-        requestBody.file = reader.result.split(',')[1]; // Base64 encoded file
-        sendRequest(requestBody, url);
-      };
-      reader.readAsDataURL(selectedFile);
+      // Upload the file as multipart form data, the browser streams it from disk
+      const formData = new FormData();
+      formData.append('file', selectedFile);
+      formData.append('minsize', minSize);
+      formData.append('maxsize', maxSize);
+      sendRequest(formData, `${backendUrl}/process_file`);
     } else {
-      requestBody.text = inputText;
-      sendRequest(requestBody, url);
+      streamRequest({
+        text: inputText,
+        minsize: minSize,
+        maxsize: maxSize,
+      });
+    }
+  };
+
+  // Remember a finished request so it can be found again from the result page
+  const storeResultId = (id) => {
+    const storedIds = JSON.parse(localStorage.getItem('resultIds')) || [];
+    storedIds.push(id);
+    localStorage.setItem('resultIds', JSON.stringify(storedIds));
+  };
+
+  // Summarize text through the Server-Sent Events endpoint, showing the summary while it is generated
+  const streamRequest = async (body) => {
+    setStreamedText('');
+    setResultId(null);
+    setIsStreaming(true);
+    try {
+      const response = await fetch(`${backendUrl}/process_text_stream`, {
+        method: 'POST',
+        headers: {
+          'Content-Type': 'application/json',
+        },
+        body: JSON.stringify(body),
+      });
+      if (!response.ok) {
+        throw new Error('Network response was not ok.');
+      }
+
+      const reader = response.body.getReader();
+      const decoder = new TextDecoder();
+      let buffer = '';
+      for (;;) {
+        const { value, done } = await reader.read();
+        if (done) {
+          break;
+        }
+        buffer += decoder.decode(value, { stream: true });
+        const events = buffer.split('\n\n');
+        buffer = events.pop(); // keep the incomplete event for the next read
+        for (const rawEvent of events) {
+          let eventName = 'message';
+          let data = '';
+          for (const line of rawEvent.split('\n')) {
+            if (line.startsWith('event: ')) {
+              eventName = line.slice(7);
+            } else if (line.startsWith('data: ')) {
+              data += line.slice(6);
+            }
+          }
+          const payload = JSON.parse(data);
+          if (eventName === 'token') {
+            setStreamedText((previous) => previous + payload.text);
+          } else if (eventName === 'done') {
+            setStreamedText(payload.summarized);
+            setResultId(payload.id);
+            storeResultId(payload.id);
+          } else if (eventName === 'error') {
+            throw new Error(payload.error);
+          }
+        }
+      }
+    } catch (error) {
+      console.error('Error:', error);
+      alert('An error occurred. Please check the console for details.');
+    } finally {
+      setIsStreaming(false);
     }
   };
 
   const sendRequest = (body, url) => {
     fetch(url, {
       method: 'POST',
-      headers: {
-        'Content-Type': 'application/json',
-      },
-      body: JSON.stringify(body),
+      body,
     })
       .then((response) => {
+        if (response.status === 413) {
+          throw new Error('The file is too large.');
+        }
         if (!response.ok) {
           throw new Error('Network response was not ok.');
         }
@@ -82,9 +144,7 @@ const SummarizePage = () => {
         const { id } = data;
         if (id) {
           // Store the result ID in local storage
-          const storedIds = JSON.parse(localStorage.getItem('resultIds')) || [];
-          storedIds.push(id);
-          localStorage.setItem('resultIds', JSON.stringify(storedIds));
+          storeResultId(id);
 
           // Redirect to the result page
           window.location.href = `/result/${id}`;
@@ -165,9 +225,24 @@ const SummarizePage = () => {
           <Typography variant="body1">Max Size Value: {maxSize}</Typography>
         </Box>
 
-        <Button variant="contained" color="primary" onClick={handleSubmit}>
+        <Button variant="contained" color="primary" onClick={handleSubmit} disabled={isStreaming}>
           Send Request
         </Button>
+
+        {(isStreaming || streamedText) && (
+          <Box mt={3} sx={{ width: '100%' }}>
+            <Typography variant="h6">Summary</Typography>
+            <Typography variant="body1" sx={{ whiteSpace: 'pre-wrap' }}>
+              {streamedText}
+              {isStreaming && '▍'}
+            </Typography>
+            {resultId && (
+              <Button sx={{ mt: 2 }} variant="outlined" href={`/result/${resultId}`}>
+                Rate this summary
+              </Button>
+            )}
+          </Box>
+        )}
       </Box>
       <footer
         style={{